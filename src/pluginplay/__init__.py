@@ -1,3 +1,9 @@
 from .module_manager import ModuleManager
 from .module import Module
 from .property_type import PropertyType
+from .cache import Cache
+from .budget import MemoryBudget
+from .result_store import ResultStore
+from .scheduler import Scheduler, ProcessScheduler
+from .stats import ModuleStats
+from .call_graph import CallGraph
@@ -0,0 +1,139 @@
+import threading
+import weakref
+
+class MemoryBudget:
+    """A limit on the bytes held by a group of Caches, taken together.
+
+    Per-Cache limits (see the Cache class) bound each Module on its own, but
+    with hundreds of Modules the sum of those limits says little about the
+    memory actually used. A MemoryBudget is shared by the Caches of many
+    Modules (e.g., every Module in a ModuleManager, see
+    ``ModuleManager.set_memory_budget``) and keeps the total below
+    ``max_bytes``.
+
+    When adding a result pushes the total over the budget, results are
+    evicted from any of the Caches, cheapest first. The price of evicting a
+    result is the time it took to compute (what it would cost to compute it
+    again) per byte it frees, so large results which were quick to compute go
+    first and small, expensive ones are kept.
+    """
+
+    def __init__(self, max_bytes):
+        """Creates a budget which no Cache uses yet.
+
+        :param max_bytes: The maximum number of bytes (as estimated by
+                          ``cache.sizeof``) the Caches may hold in total.
+        :type max_bytes: int
+        """
+
+        self._max_bytes = max_bytes
+        self._nbytes    = 0
+
+        # Map from id of a Cache using the budget to the bytes it holds
+        self._held      = {}
+        self._caches    = weakref.WeakValueDictionary()
+        self._lock      = threading.Lock()
+        self._evicting  = threading.Lock()
+
+
+    def max_bytes(self):
+        """The maximum number of bytes the Caches may hold in total.
+
+        :rtype: int
+        """
+
+        return self._max_bytes
+
+
+    def nbytes(self):
+        """The number of bytes the Caches currently hold in total.
+
+        :rtype: int
+        """
+
+        return self._nbytes
+
+
+    def add(self, cache):
+        """Makes ``cache`` count against (and evictable by) the budget.
+
+        Results ``cache`` already holds are counted, which may evict some.
+
+        :param cache: The Cache.
+        :type cache: Cache
+        """
+
+        with self._lock:
+            if id(cache) in self._held:
+                return
+            self._caches[id(cache)] = cache
+            self._held[id(cache)] = 0
+            weakref.finalize(cache, self.__forget, id(cache))
+        self.update(cache)
+
+
+    def remove(self, cache):
+        """Stops counting ``cache`` against the budget.
+
+        :param cache: The Cache.
+        :type cache: Cache
+        """
+
+        self.__forget(id(cache))
+
+
+    def __forget(self, cache_id):
+        """Code factorization for dropping a Cache (which may be gone)."""
+
+        with self._lock:
+            self._caches.pop(cache_id, None)
+            self._nbytes -= self._held.pop(cache_id, 0)
+
+
+    def update(self, cache):
+        """Records how many bytes ``cache`` holds now, evicting results if
+        the budget is exceeded.
+
+        Caches call this after their contents change.
+
+        :param cache: The Cache whose contents changed.
+        :type cache: Cache
+        """
+
+        with self._lock:
+            if id(cache) not in self._held:
+                return
+            nbytes = cache.nbytes()
+            self._nbytes += nbytes - self._held[id(cache)]
+            self._held[id(cache)] = nbytes
+            over = self._nbytes > self._max_bytes
+        if over:
+            self.__evict()
+
+
+    def __evict(self):
+        """Code factorization for bringing the total back under the budget.
+
+        Only one thread evicts at a time; others carry on, since the
+        evicting thread accounts for their additions too.
+        """
+
+        if not self._evicting.acquire(blocking=False):
+            return
+        try:
+            candidates = []
+            for cache in list(self._caches.values()):
+                for key, cost, nbytes in cache.costs():
+                    candidates.append((cost / max(nbytes, 1), cache, key))
+            candidates.sort(key=lambda c : c[0])
+
+            for _, cache, key in candidates:
+                if self._nbytes <= self._max_bytes:
+                    break
+                cache.discard(key)
+        finally:
+            self._evicting.release()
+
+
+    def __repr__(self):
+        return 'MemoryBudget(%d of %d bytes)' % (self._nbytes, self._max_bytes)
@@ -0,0 +1,482 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import sys
+import threading
+import time
+
+def sizeof(obj):
+    """Estimates the number of bytes an object (and what it holds) occupies.
+
+    Python does not provide a way to determine the memory footprint of an
+    object graph. This function walks containers (dicts, lists, tuples, sets)
+    and the ``__dict__`` of instances, summing ``sys.getsizeof`` for each
+    distinct object it finds. Memory views are charged for the memory their
+    buffer spans. The result is an estimate, but it is good enough for
+    enforcing memory budgets.
+
+    :param obj: The object whose size is being estimated.
+
+    :return: The estimated size of ``obj`` in bytes.
+    :rtype: int
+    """
+
+    seen = set()
+    stack = [obj]
+    rv = 0
+    while len(stack):
+        x = stack.pop()
+        if id(x) in seen:
+            continue
+        seen.add(id(x))
+
+        if isinstance(x, (str, bytes, bytearray, int, float, complex, bool)):
+            rv += sys.getsizeof(x)
+            continue
+
+        if isinstance(x, memoryview):
+            rv += sys.getsizeof(x) + x.nbytes
+            continue
+
+        rv += sys.getsizeof(x)
+        if isinstance(x, dict):
+            stack.extend(x.keys())
+            stack.extend(x.values())
+        elif isinstance(x, (list, tuple, set, frozenset)):
+            stack.extend(x)
+        elif hasattr(x, '__dict__') and not isinstance(x, type):
+            stack.append(vars(x))
+    return rv
+
+
+class _Entry:
+    """The bookkeeping associated with a cached value.
+
+    ``nbytes`` is None until the size of the value is needed (see
+    ``Cache.put``).
+    """
+
+    __slots__ = ('value', 'nbytes', 'hits', 'time', 'tag', 'cost')
+
+    def __init__(self, value, nbytes, time, tag, cost):
+        self.value  = value
+        self.nbytes = nbytes
+        self.hits   = 0
+        self.time   = time
+        self.tag    = tag
+        self.cost   = cost
+
+
+class Cache(MutableMapping):
+    """A bounded, size-aware map from memoization keys to results.
+
+    Module instances store the results they have computed in a cache. Left
+    unchecked the cache can grow without bound. The Cache class behaves like a
+    dictionary, but can be configured to keep its contents below a maximum
+    number of entries and/or a maximum number of bytes (as estimated by
+    ``sizeof``). When adding an entry would exceed either limit, entries are
+    evicted according to the eviction policy:
+
+    - ``'lru'`` -- the least recently used entry is evicted first,
+    - ``'lfu'`` -- the least frequently used entry is evicted first (ties are
+      broken by recency), and
+    - ``'ttl'`` -- the oldest entry is evicted first.
+
+    Independent of the policy, if ``ttl`` is set, entries older than ``ttl``
+    seconds are treated as absent and are dropped when encountered.
+
+    Entries may be tagged when they are added (see ``put``), and all of the
+    entries with a given tag can be dropped at once (see ``invalidate``).
+    Modules tag their results with the fingerprint of the state they were
+    computed for.
+
+    A Cache may also count against a MemoryBudget shared with other Caches
+    (see the ``budget`` module), in which case its entries may be evicted to
+    keep the Caches' total size in check. Entries record what they cost to
+    compute so that the budget can favor evicting the ones which are cheapest
+    to recompute.
+
+    By default a Cache is unbounded, which mirrors the behavior of a plain
+    dictionary. Caches may be used from multiple threads. Estimating the size
+    of a value is not free, so a Cache without a byte limit or a budget only
+    does so when asked (e.g., by ``nbytes``).
+    """
+
+    _policies = ('lru', 'lfu', 'ttl')
+
+    def __init__(self, policy='lru', max_entries=None, max_bytes=None,
+                 ttl=None, budget=None):
+        """Creates an empty cache with the provided configuration.
+
+        :param policy: How entries are selected for eviction. Must be one of
+                       ``'lru'``, ``'lfu'``, or ``'ttl'``.
+        :type policy: str
+        :param max_entries: The maximum number of entries the cache may hold,
+                            or None for no limit.
+        :type max_entries: int
+        :param max_bytes: The maximum number of bytes the cached values may
+                          occupy, or None for no limit.
+        :type max_bytes: int
+        :param ttl: How long (in seconds) entries remain valid, or None if
+                    they do not expire.
+        :type ttl: float
+        :param budget: A budget shared with other caches, or None.
+        :type budget: MemoryBudget
+
+        :raises ValueError: If ``policy`` is not a recognized policy.
+        :raises ValueError: If ``policy`` is ``'ttl'``, but ``ttl`` is not set.
+        """
+
+        if policy not in self._policies:
+            raise ValueError("Unrecognized eviction policy: %s" % policy)
+        if policy == 'ttl' and ttl == None:
+            raise ValueError("The 'ttl' policy requires a ttl.")
+
+        self._policy      = policy
+        self._max_entries = max_entries
+        self._max_bytes   = max_bytes
+        self._ttl         = ttl
+        self._data        = OrderedDict()
+        self._nbytes      = 0
+        self._unmeasured  = 0
+        self._tags        = {}
+        self._lock        = threading.RLock()
+        self._budget      = None
+        if budget != None:
+            self.set_budget(budget)
+
+
+    def config(self):
+        """Returns the configuration of the cache.
+
+        The returned dictionary can be forwarded to the ctor to make an empty
+        cache with the same configuration.
+
+        :return: The kwargs this cache was configured with.
+        :rtype: dict(str, obj)
+        """
+
+        return {'policy' : self._policy,
+                'max_entries' : self._max_entries,
+                'max_bytes' : self._max_bytes,
+                'ttl' : self._ttl,
+                'budget' : self._budget}
+
+
+    def budget(self):
+        """The MemoryBudget the cache counts against.
+
+        :return: The budget, or None if the cache only has its own limits.
+        :rtype: MemoryBudget
+        """
+
+        return self._budget
+
+
+    def set_budget(self, budget):
+        """Makes the cache count against ``budget`` instead of its current
+        budget.
+
+        :param budget: The new budget, or None to only use the cache's own
+                       limits.
+        :type budget: MemoryBudget
+        """
+
+        if self._budget is budget:
+            return
+        if self._budget != None:
+            self._budget.remove(self)
+        self._budget = budget
+        if budget != None:
+            budget.add(self)
+
+
+    def nbytes(self):
+        """The estimated number of bytes held by the cached values.
+
+        :return: The sum of the estimated sizes of the cached values.
+        :rtype: int
+        """
+
+        with self._lock:
+            if self._unmeasured:
+                for entry in self._data.values():
+                    self.__measure(entry)
+            return self._nbytes
+
+
+    def __measures(self):
+        """Determines if values need to be measured when they are added."""
+
+        return self._max_bytes != None or self._budget != None
+
+
+    def __measure(self, entry):
+        """Code factorization for (lazily) estimating the size of an entry.
+
+        Must be called while holding the lock.
+        """
+
+        if entry.nbytes == None:
+            entry.nbytes = sizeof(entry.value)
+            self._nbytes += entry.nbytes
+            self._unmeasured -= 1
+        return entry.nbytes
+
+
+    def __expired(self, entry):
+        """Code factorization for determining if an entry has timed out."""
+
+        return self._ttl != None and time.monotonic() - entry.time > self._ttl
+
+
+    def __remove(self, key):
+        """Code factorization for dropping an entry and its bookkeeping."""
+
+        entry = self._data.pop(key)
+        if entry.nbytes == None:
+            self._unmeasured -= 1
+        else:
+            self._nbytes -= entry.nbytes
+        if entry.tag != None:
+            keys = self._tags[entry.tag]
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._tags[entry.tag]
+
+
+    def __victim(self):
+        """Selects the key of the entry which should be evicted next."""
+
+        if self._policy == 'lfu':
+            return min(self._data.items(), key=lambda kv: kv[1].hits)[0]
+        return next(iter(self._data))
+
+
+    def __charge(self):
+        """Code factorization for telling the budget the size changed.
+
+        Must be called without holding the lock, since the budget may evict
+        entries from other caches.
+        """
+
+        if self._budget != None:
+            self._budget.update(self)
+
+
+    def __over_budget(self, nentries, nbytes):
+        """Determines if the cache would exceed its limits."""
+
+        if self._max_entries != None and nentries > self._max_entries:
+            return True
+        return self._max_bytes != None and nbytes > self._max_bytes
+
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._data[key]
+            expired = self.__expired(entry)
+            if expired:
+                self.__remove(key)
+            else:
+                entry.hits += 1
+                if self._policy != 'ttl':
+                    self._data.move_to_end(key)
+                return entry.value
+        self.__charge()
+        raise KeyError(key)
+
+
+    def get(self, key, default=None):
+        """Looks up an entry, counting it as a use.
+
+        Unlike checking ``key in cache`` and then reading ``cache[key]``, the
+        lookup is a single step, so an entry which expires or is evicted (by
+        another thread, or by a shared MemoryBudget) in between can not cause
+        a KeyError.
+
+        :param key: The key of the entry.
+        :param default: What to return if there is no (valid) entry.
+
+        :return: The cached value, or ``default``.
+        """
+
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+
+    def put(self, key, value, tag=None, cost=0.0):
+        """Adds an entry, optionally tagging it.
+
+        This is ``cache[key] = value``, except that the entry can be tagged
+        and its cost recorded.
+
+        :param key: The key to store ``value`` under.
+        :param value: The value to cache.
+        :param tag: A hashable label for the entry (e.g., the fingerprint of
+                    the state it was computed for), or None.
+        :param cost: What it took to compute ``value`` (e.g., in seconds).
+                     When a budget is exceeded, entries with the lowest cost
+                     per byte are evicted first.
+        :type cost: float
+        """
+
+        # Without a byte limit (or budget) sizes are only estimated on demand
+        nbytes = sizeof(value) if self.__measures() else None
+        size = 0 if nbytes == None else nbytes
+
+        with self._lock:
+            if key in self._data:
+                self.__remove(key)
+
+            # Values which can never fit are simply not cached
+            if not self.__over_budget(1, size):
+                while len(self._data) and self.__over_budget(
+                        len(self._data) + 1, self._nbytes + size):
+                    self.__remove(self.__victim())
+
+                self._data[key] = _Entry(value, nbytes, time.monotonic(), tag,
+                                         cost)
+                if nbytes == None:
+                    self._unmeasured += 1
+                else:
+                    self._nbytes += nbytes
+                if tag != None:
+                    self._tags.setdefault(tag, set()).add(key)
+        self.__charge()
+
+
+    def tag(self, key, *default):
+        """The tag the entry under ``key`` was added with.
+
+        :param key: The key of the entry.
+        :param default: Optionally, what to return if there is no entry under
+                        ``key``, rather than raising.
+
+        :return: The tag, or None if the entry is not tagged.
+
+        :raises KeyError: If there is no entry under ``key`` and no
+                          ``default`` was given.
+        """
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry != None:
+                return entry.tag
+            if len(default):
+                return default[0]
+            raise KeyError(key)
+
+
+    def invalidate(self, tag):
+        """Removes every entry added with the tag ``tag``.
+
+        :param tag: The tag of the entries to remove.
+
+        :return: The number of entries removed.
+        :rtype: int
+        """
+
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for k in keys:
+                self.__remove(k)
+        self.__charge()
+        return len(keys)
+
+
+    def costs(self):
+        """Lists what each entry cost to compute and how large it is.
+
+        :return: A (key, cost, number of bytes) tuple per entry.
+        :rtype: list(tuple)
+        """
+
+        with self._lock:
+            return [(k, e.cost, self.__measure(e))
+                    for k, e in self._data.items()]
+
+
+    def discard(self, key):
+        """Removes the entry under ``key``, if there is one.
+
+        :param key: The key of the entry to remove.
+
+        :return: The number of bytes freed.
+        :rtype: int
+        """
+
+        nbytes = 0
+        with self._lock:
+            entry = self._data.get(key)
+            if entry != None:
+                nbytes = self.__measure(entry)
+                self.__remove(key)
+        self.__charge()
+        return nbytes
+
+
+    def __delitem__(self, key):
+        with self._lock:
+            self.__remove(key)
+        self.__charge()
+
+
+    def __contains__(self, key):
+        # Overridden so that membership tests do not count as uses
+        with self._lock:
+            entry = self._data.get(key)
+            if entry == None:
+                return False
+            expired = self.__expired(entry)
+            if expired:
+                self.__remove(key)
+        if expired:
+            self.__charge()
+        return not expired
+
+
+    def __iter__(self):
+        with self._lock:
+            keys = list(self._data)
+        return iter([k for k in keys if k in self])
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def clear(self):
+        """Removes all entries, but keeps the configuration."""
+
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            self._unmeasured = 0
+            self._tags.clear()
+        self.__charge()
+
+
+    def __getstate__(self):
+        # Locks can not be copied or pickled, so a fresh one is made. Budgets
+        # are not carried along either, they belong to this process.
+        state = dict(self.__dict__)
+        del state['_lock']
+        state['_budget'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+
+    def __repr__(self):
+        return 'Cache(%s, %d entries, %d bytes)' % (self._policy,
+                                                    len(self._data),
+                                                    self.nbytes())
@@ -0,0 +1,306 @@
+class CallGraph:
+    """An index of which Module calls which, in terms of module keys.
+
+    The call graph is implicit in the submodules bound to each Module. Walking
+    the Modules to recover it is expensive for large graphs, so the
+    ModuleManager maintains this index instead. The nodes are the module keys
+    and there is an edge from ``key`` to ``sub_key`` for every callback point
+    of the Module under ``key`` which is bound to the Module under
+    ``sub_key``. Edges are determined by identity: a callback point bound to
+    a Module which is not in the ModuleManager (e.g., one bound directly with
+    ``Module.change_submod``) has no edge, and gains one if that Module is
+    added later.
+
+    The index is updated incrementally by the ModuleManager as Modules are
+    added, erased, renamed, and rebound. Changes made directly to a Module
+    (e.g., ``Module.change_submod``) are not seen until ``refresh`` is called
+    for its key.
+    """
+
+    def __init__(self):
+        """Creates an empty call graph."""
+
+        # Map from key to the map from callback point to the key bound there
+        self._submods = {}
+
+        # Map from key to the set of (key, callback point) binding it
+        self._callers = {}
+
+        # Map from key to the Module stored under it
+        self._modules = {}
+
+        # Map from the id of a registered Module to the keys it is under
+        self._keys = {}
+
+        # Map from the id of an unregistered Module to the points binding it
+        self._unresolved = {}
+
+        # Map from a point bound to an unregistered Module to the Module's id
+        self._pending = {}
+
+
+    def __contains__(self, key):
+        return key in self._modules
+
+
+    def __len__(self):
+        return len(self._modules)
+
+
+    def __key_of(self, mod):
+        """Code factorization for the key of a (possibly unregistered) Module.
+
+        :return: The key ``mod`` is registered under, or None.
+        """
+
+        keys = None if mod == None else self._keys.get(id(mod))
+        return None if keys == None else keys[0]
+
+
+    def __bind(self, key, cb_name, mod):
+        """Code factorization for recording that ``key`` calls ``mod``."""
+
+        sub_key = self.__key_of(mod)
+        self._submods[key][cb_name] = sub_key
+        if sub_key != None:
+            self._callers[sub_key].add((key, cb_name))
+        elif mod != None:
+            self.__defer(id(mod), [(key, cb_name)])
+
+
+    def __defer(self, mod_id, points):
+        """Code factorization for points bound to an unregistered Module."""
+
+        self._unresolved.setdefault(mod_id, set()).update(points)
+        for p in points:
+            self._pending[p] = mod_id
+
+
+    def __unbind(self, key, cb_name):
+        """Code factorization for forgetting the edge at a callback point."""
+
+        sub_key = self._submods[key].get(cb_name)
+        if sub_key != None:
+            self._callers[sub_key].discard((key, cb_name))
+
+        mod_id = self._pending.pop((key, cb_name), None)
+        if mod_id != None:
+            self._unresolved[mod_id].discard((key, cb_name))
+            if len(self._unresolved[mod_id]) == 0:
+                del self._unresolved[mod_id]
+
+
+    def add(self, key, mod):
+        """Adds the Module ``mod`` as the node ``key``.
+
+        :param key: The module key of ``mod``.
+        :type key: str
+        :param mod: The Module.
+        :type mod: Module
+        """
+
+        self._modules[key] = mod
+        self._submods[key] = {}
+        self._callers[key] = set()
+        keys = self._keys.setdefault(id(mod), [])
+        keys.append(key)
+        if len(keys) == 1:
+            for point in self._unresolved.pop(id(mod), set()):
+                del self._pending[point]
+                self._submods[point[0]][point[1]] = key
+                self._callers[key].add(point)
+
+        for (cb_name, _), v in mod._state['submods'].items():
+            self.__bind(key, cb_name, v)
+
+
+    def remove(self, key):
+        """Removes the node ``key``.
+
+        Callback points bound to the removed Module remain bound to it (see
+        ``ModuleManager.erase``), so they lose their edge but will regain it
+        if the Module is added again.
+
+        :param key: The module key to remove.
+        :type key: str
+        """
+
+        if key not in self._modules:
+            return
+
+        for cb_name in list(self._submods[key]):
+            self.__unbind(key, cb_name)
+        mod = self._modules.pop(key)
+        del self._submods[key]
+
+        callers = self._callers.pop(key)
+        keys = self._keys[id(mod)]
+        was_first = keys[0] == key
+        keys.remove(key)
+        if not was_first:
+            return
+
+        # Another key may hold the same Module, otherwise the callers wait
+        # for the Module to be added again
+        new_key = keys[0] if len(keys) else None
+        for caller, cb_name in callers:
+            self._submods[caller][cb_name] = new_key
+        if new_key != None:
+            self._callers[new_key].update(callers)
+        else:
+            del self._keys[id(mod)]
+            if len(callers):
+                self.__defer(id(mod), callers)
+
+
+    def refresh(self, key):
+        """Re-reads the submodules of the Module under ``key``.
+
+        :param key: The module key whose edges may have changed.
+        :type key: str
+
+        :raises KeyError: If ``key`` is not in the graph.
+        """
+
+        for cb_name in list(self._submods[key]):
+            self.__unbind(key, cb_name)
+        self._submods[key] = {}
+        for (cb_name, _), v in self._modules[key]._state['submods'].items():
+            self.__bind(key, cb_name, v)
+
+
+    def set_submod(self, key, cb_name, sub_key):
+        """Records that the callback point ``cb_name`` of ``key`` now calls
+        ``sub_key``.
+
+        :param key: The module key of the caller.
+        :type key: str
+        :param cb_name: The callback point.
+        :type cb_name: str
+        :param sub_key: The module key of the callee.
+        :type sub_key: str
+        """
+
+        self.__unbind(key, cb_name)
+        self.__bind(key, cb_name, self._modules[sub_key])
+
+
+    def would_cycle(self, key, sub_key):
+        """Determines if binding ``sub_key`` to a callback point of ``key``
+        would create a cycle.
+
+        :return: True if ``key`` is ``sub_key`` or can be reached from it.
+        :rtype: bool
+        """
+
+        return key == sub_key or key in self.descendants(sub_key)
+
+
+    def submods(self, key):
+        """The keys bound to each callback point of ``key``.
+
+        :param key: The module key of the caller.
+        :type key: str
+
+        :return: A map from callback point to the key of the Module bound
+                 there (None if unbound or the Module is not registered).
+        :rtype: dict(str, str)
+
+        :raises KeyError: If ``key`` is not in the graph.
+        """
+
+        return dict(self._submods[key])
+
+
+    def callers(self, key):
+        """The callback points which call ``key`` (its reverse dependencies).
+
+        :param key: The module key of the callee.
+        :type key: str
+
+        :return: The (module key, callback point) pairs bound to ``key``.
+        :rtype: set((str, str))
+
+        :raises KeyError: If ``key`` is not in the graph.
+        """
+
+        return set(self._callers[key])
+
+
+    def descendants(self, key):
+        """Every key which ``key`` calls, directly or indirectly.
+
+        :rtype: set(str)
+
+        :raises KeyError: If ``key`` is not in the graph.
+        """
+
+        return self.__reachable(key, lambda k : self._submods[k].values())
+
+
+    def ancestors(self, key):
+        """Every key which calls ``key``, directly or indirectly.
+
+        These are the Modules whose results depend on ``key``.
+
+        :rtype: set(str)
+
+        :raises KeyError: If ``key`` is not in the graph.
+        """
+
+        return self.__reachable(key,
+                                lambda k : [c for c, _ in self._callers[k]])
+
+
+    def __reachable(self, key, neighbors):
+        """Code factorization for the nodes reachable from ``key``."""
+
+        rv = set()
+        stack = list(neighbors(key))
+        while len(stack):
+            k = stack.pop()
+            if k == None or k in rv:
+                continue
+            rv.add(k)
+            stack.extend(neighbors(k))
+        return rv
+
+
+    def topological_order(self):
+        """Orders the keys so that every key comes after the keys it calls.
+
+        :return: The module keys, submodules first.
+        :rtype: list(str)
+
+        :raises RuntimeError: If the graph contains a cycle.
+        """
+
+        remaining = {k : len(set(v for v in s.values() if v != None))
+                     for k, s in self._submods.items()}
+        ready = [k for k, n in remaining.items() if n == 0]
+        rv = []
+        while len(ready):
+            k = ready.pop()
+            rv.append(k)
+            for caller in set(c for c, _ in self._callers[k]):
+                remaining[caller] -= 1
+                if remaining[caller] == 0:
+                    ready.append(caller)
+
+        if len(rv) != len(self._modules):
+            raise RuntimeError("The call graph contains a cycle.")
+        return rv
+
+
+    def shared(self):
+        """Finds the Modules called from more than one callback point.
+
+        Each such Module is the root of a subgraph shared by all of its
+        callers (e.g., a single area provider used by several consumers).
+
+        :return: A map from the keys of the shared Modules to the callback
+                 points calling them.
+        :rtype: dict(str, set((str, str)))
+        """
+
+        return {k : set(v) for k, v in self._callers.items() if len(v) > 1}
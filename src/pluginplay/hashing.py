@@ -0,0 +1,225 @@
+import hashlib
+import struct
+
+# Map from type to the function used to reduce instances of that type
+_hashers = {}
+
+_pack_len = struct.Struct('<Q').pack
+
+# Builtin types whose subclasses are fingerprinted like the builtin
+_builtins = (dict, tuple, list, frozenset, set, str, bytes, int, float,
+             complex)
+
+def register_hasher(cls, fxn):
+    """Teaches ``fingerprint`` how to handle instances of ``cls``.
+
+    Out of the box ``fingerprint`` understands the builtin scalar types, the
+    builtin containers (and subclasses of either, such as namedtuples,
+    ``OrderedDict``, and ``IntEnum``), and objects supporting the buffer
+    protocol (e.g., NumPy arrays). Instances of any other type must be reduced
+    to something ``fingerprint`` understands. The reduction is done by
+    ``fxn``, which is called with the instance and should return an object
+    which captures all of the instance's state relevant to a Module
+    (typically a tuple or a dict of the instance's members). The fingerprint
+    of the instance is then the fingerprint of that return combined with the
+    qualified name of ``cls``.
+
+    Registrations apply to subclasses of ``cls`` as well, unless a subclass
+    has its own registration.
+
+    :param cls: The type being registered.
+    :type cls: type
+    :param fxn: The function used to reduce instances of ``cls``.
+    :type fxn: callable
+    """
+
+    _hashers[cls] = fxn
+
+
+def _find_hasher(cls):
+    """Code factorization for looking up the reduction for ``cls``."""
+
+    for base in cls.__mro__:
+        if base in _hashers:
+            return _hashers[base]
+    return None
+
+
+def _type_name(cls):
+    """Code factorization for the process-independent name of a type."""
+
+    return (cls.__module__ + '.' + cls.__qualname__).encode()
+
+
+def _write(h, tag, data):
+    """Feeds a tagged, length-prefixed record into the hasher ``h``.
+
+    Tagging each record with the kind of object it came from, and prefixing
+    it with its length, ensures that different objects can not be made to
+    produce the same stream of bytes (e.g., ``['ab']`` vs. ``['a', 'b']``).
+    """
+
+    # Small records (the common case) are fed to the hasher in one go
+    if len(data) < 256:
+        h.update(tag + _pack_len(len(data)) + data)
+    else:
+        h.update(tag)
+        h.update(_pack_len(len(data)))
+        h.update(data)
+
+
+def _digest(obj, active):
+    """Code factorization for the raw fingerprint of a nested object."""
+
+    h = hashlib.blake2b(digest_size=32)
+    _update(h, obj, active)
+    return h.digest()
+
+
+def _enter(obj, active):
+    """Code factorization for starting to visit the members of ``obj``.
+
+    :param active: The ids of the objects whose members are being visited.
+    :type active: set(int)
+
+    :raises TypeError: If ``obj`` is already being visited, i.e., it
+                       (indirectly) contains itself.
+    """
+
+    if id(obj) in active:
+        raise TypeError("Can not fingerprint an object of type %s which "
+                        "contains itself." % type(obj).__qualname__)
+    active.add(id(obj))
+
+
+def _update_buffer(h, obj):
+    """Feeds an object supporting the buffer protocol into ``h``.
+
+    The hasher reads the object's memory directly, so (C-contiguous) buffers
+    are hashed without making a copy.
+
+    :return: True if ``obj`` was hashed and False if it does not support the
+             buffer protocol (or its buffer holds Python objects).
+    """
+
+    try:
+        view = memoryview(obj)
+    except TypeError:
+        return False
+
+    # Buffers of Python objects hold addresses, which are not stable
+    if 'O' in view.format:
+        return False
+
+    header = b'%s|%s|%d|%r' % (_type_name(type(obj)), view.format.encode(),
+                               view.itemsize, view.shape)
+    _write(h, b'M', header)
+    h.update(struct.pack('<Q', view.nbytes))
+    if view.c_contiguous:
+        h.update(view)
+    else:
+        h.update(view.tobytes())
+    return True
+
+
+def _update(h, obj, active):
+    """Feeds ``obj`` into the hasher ``h``.
+
+    :param active: The ids of the containers being visited (see ``_enter``).
+    :type active: set(int)
+
+    :raises TypeError: If ``obj`` (or something it contains) is of a type
+                       which can not be fingerprinted, or contains itself.
+    """
+
+    cls = type(obj)
+    if obj is None:
+        _write(h, b'N', b'')
+    elif cls is bool:
+        _write(h, b'?', b'1' if obj else b'0')
+    elif cls is int:
+        _write(h, b'I', str(obj).encode())
+    elif cls is float:
+        _write(h, b'F', struct.pack('<d', obj))
+    elif cls is complex:
+        _write(h, b'C', struct.pack('<dd', obj.real, obj.imag))
+    elif cls is str:
+        _write(h, b'S', obj.encode('utf-8', 'surrogatepass'))
+    elif cls is bytes:
+        _write(h, b'Y', obj)
+    elif cls is tuple or cls is list:
+        _write(h, b'T' if cls is tuple else b'L', str(len(obj)).encode())
+        _enter(obj, active)
+        for x in obj:
+            _update(h, x, active)
+        active.discard(id(obj))
+    elif cls is dict and all(type(k) is str for k in obj):
+        # Dictionaries compare equal regardless of insertion order. String
+        # keys (e.g., inputs) can simply be visited in sorted order.
+        _write(h, b'd', str(len(obj)).encode())
+        _enter(obj, active)
+        for k in sorted(obj):
+            _write(h, b'S', k.encode('utf-8', 'surrogatepass'))
+            _update(h, obj[k], active)
+        active.discard(id(obj))
+    elif cls is dict:
+        _enter(obj, active)
+        items = sorted(_digest(k, active) + _digest(v, active)
+                       for k, v in obj.items())
+        active.discard(id(obj))
+        _write(h, b'D', str(len(items)).encode())
+        for x in items:
+            h.update(x)
+    elif cls is set or cls is frozenset:
+        items = sorted(_digest(x, active) for x in obj)
+        _write(h, b'E', str(len(items)).encode())
+        for x in items:
+            h.update(x)
+    else:
+        fxn = _find_hasher(cls)
+        if fxn == None and isinstance(obj, _builtins):
+            # e.g., namedtuples are their tuple of values, tagged by type
+            fxn = next(b for b in _builtins if isinstance(obj, b))
+        if fxn != None:
+            _write(h, b'R', _type_name(cls))
+            _enter(obj, active)
+            _update(h, fxn(obj), active)
+            active.discard(id(obj))
+        elif not _update_buffer(h, obj):
+            raise TypeError("Can not fingerprint an object of type %s. "
+                            "Use register_hasher to add support for it." %
+                            cls.__qualname__)
+
+
+def fingerprint(obj):
+    """Computes a stable, collision-resistant fingerprint of ``obj``.
+
+    Module inputs are frequently of types which can not be used as dictionary
+    keys (lists, dicts, arrays, etc.). This function reduces such values to a
+    fixed-length string suitable for use as a key. Unlike ``hash``, the
+    fingerprint does not depend on the process which computed it, which
+    makes it suitable for keys which are persisted or shared among processes.
+    Equal dictionaries and sets have the same fingerprint regardless of their
+    iteration order.
+
+    The fingerprint is a BLAKE2b digest of a canonical, type-tagged
+    serialization of ``obj``. Objects supporting the buffer protocol are
+    hashed directly from their memory, without being copied. Support for
+    additional types can be added with ``register_hasher``.
+
+    :param obj: The object to fingerprint.
+
+    :return: The hex digest fingerprinting ``obj``.
+    :rtype: str
+
+    :raises TypeError: If ``obj`` (or something it contains) is of a type
+                       which can not be fingerprinted, if ``obj`` contains
+                       itself, or if it is nested too deeply.
+    """
+
+    h = hashlib.blake2b(digest_size=32)
+    try:
+        _update(h, obj, set())
+    except RecursionError:
+        raise TypeError("Can not fingerprint an object nested this deeply.")
+    return h.hexdigest()
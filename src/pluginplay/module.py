@@ -1,4 +1,112 @@
-from copy import deepcopy
+from copy import copy
+from .cache import Cache
+from .hashing import fingerprint
+from .scheduler import completed_future
+from .stats import ModuleStats, begin_call, end_call
+from types import MappingProxyType
+import asyncio
+import contextvars
+import inspect
+import pickle
+import queue
+import threading
+import time
+import weakref
+
+# Results computed during the current top-level call (see Module.run)
+_request_results = contextvars.ContextVar('pluginplay_request_results',
+                                          default=None)
+
+# Returned by ResultStore.get when it has no results under a key
+_not_stored = object()
+
+def _begin_request():
+    """Starts a table of request-scoped results, unless one is active.
+
+    :return: The token needed to end the request, or None if this call is
+             nested in an active request.
+    """
+
+    if _request_results.get() != None:
+        return None
+    return _request_results.set({})
+
+
+def _end_request(token):
+    """Ends the request started by ``_begin_request`` (if any)."""
+
+    if token != None:
+        _request_results.reset(token)
+
+
+def _collect(chunks):
+    """Gathers the chunks yielded by a generator callback into one result.
+
+    :param chunks: The dictionaries yielded by the callback.
+    :type chunks: iterable(dict(str, obj))
+
+    :return: A map from each result to the list of its values, in the order
+             they were yielded.
+    :rtype: dict(str, list)
+    """
+
+    rv = {}
+    for chunk in chunks:
+        for k, v in chunk.items():
+            rv.setdefault(k, []).append(v)
+    return rv
+
+
+def _buffered(chunks, size):
+    """Produces ``chunks`` in a background thread, at most ``size`` ahead.
+
+    The producer blocks once ``size`` chunks are waiting to be consumed, so
+    a slow consumer throttles the producer. Errors raised by the producer are
+    raised to the consumer. If the consumer stops early, the producer stops
+    after the chunk it is working on.
+
+    :param chunks: The chunks to produce.
+    :type chunks: generator
+    :param size: The maximum number of chunks produced ahead of the consumer.
+    :type size: int
+    """
+
+    q = queue.Queue(size)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if not put((chunk, None)):
+                    break
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+        finally:
+            chunks.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            chunk, error = q.get()
+            if chunk is done:
+                if error != None:
+                    raise error
+                return
+            yield chunk
+    finally:
+        stop.set()
+
 
 class Module:
     """ Encapsulates a user-supplied function.
@@ -16,6 +124,11 @@ class Module:
     #. Manipulation of most of the Module's state is done through the
        ModuleManager
 
+    Locking a Module only freezes its state (the callback, bound inputs, and
+    submodules). How the Module runs (its cache policy, result store,
+    scheduler, and memory budget) is not part of the state, so it can be
+    changed even if the Module is locked.
+
     Keep in mind the real implementation is written in C++ and exposed to
     Python, whereas this implementation here is simply meant to provide a
     working implementation of the real API. The point being the API and design
@@ -77,6 +190,186 @@ class Module:
         return len(nr['Inputs']) == 0
 
 
+    def __own_fingerprint(self):
+        """Code factorization for fingerprinting the Module's own state.
+
+        The Module's own state is the type of the Module, the callback, and the
+        bound inputs (submodules are handled by ``__state_fingerprint``). The
+        callback is identified by its name. If the callback has no name, the
+        address of the callback is used instead, which is only meaningful
+        within the current process. Once the Module is locked its own state
+        can no longer change, so the fingerprint is computed once and reused.
+
+        :return: The fingerprint and whether the fingerprint is stable (i.e.,
+                 the same in every process).
+        :rtype: (str, bool)
+
+        :raises TypeError: If a bound input can not be fingerprinted.
+        """
+
+        if self._own_fp != None:
+            return self._own_fp
+
+        name = self._state['callback_name']
+        stable = name != None
+        ident = name if stable else id(self._state['callback'])
+        fp = fingerprint((type(self).__module__, type(self).__qualname__,
+                          ident, self._state['inputs']))
+        if self.locked():
+            self._own_fp = (fp, stable)
+        return (fp, stable)
+
+
+    def __state_fingerprint(self):
+        """Code factorization for fingerprinting the state of the Module.
+
+        Memoized results are only valid for the state the Module had when they
+        were computed. This function fingerprints the pieces of the state which
+        influence the results: the Module's own state and (recursively) the
+        state of the bound submodules.
+
+        If the Module and every Module it (recursively) calls are locked, the
+        state can no longer change, so the fingerprint is computed once and
+        reused by every call. The cached fingerprint is dropped if the state
+        of the Module, or of a Module it (recursively) calls, is changed
+        anyway (see ``__drop_state_fingerprints``).
+
+        :return: The fingerprint and whether the fingerprint is stable (i.e.,
+                 the same in every process).
+        :rtype: (str, bool)
+
+        :raises TypeError: If a bound input can not be fingerprinted.
+        """
+
+        if self._state_fp != None:
+            return self._state_fp
+
+        own_fp, stable = self.__own_fingerprint()
+        fixed = self.locked()
+        submods = {}
+        for (cb_name, _), v in self._state['submods'].items():
+            if v is None:
+                submods[cb_name] = None
+                fixed = False
+                continue
+            submods[cb_name], sub_stable = v.__state_fingerprint()
+            stable = stable and sub_stable
+            fixed = fixed and v._state_fp != None
+        rv = (fingerprint((own_fp, submods)), stable)
+        self._state_fp = rv if fixed else None
+        return rv
+
+
+    def __drop_state_fingerprints(self):
+        """Code factorization for dropping the fingerprints a change affects.
+
+        The fingerprint of a Module's state covers the Modules it calls, so
+        when the state of this Module changes, the fingerprints cached by it
+        and by the Modules (recursively) calling it are dropped. The
+        fingerprints of every other Module are kept.
+        """
+
+        stack = [self]
+        seen = set()
+        while len(stack):
+            mod = stack.pop()
+            if id(mod) in seen:
+                continue
+            seen.add(id(mod))
+            mod._state_fp = None
+            stack.extend(mod._callers.values())
+
+
+    def __add_caller(self, caller):
+        """Code factorization for recording that ``caller`` binds this Module.
+
+        Callers are held weakly, so being bound as a submodule does not keep
+        the caller alive.
+        """
+
+        self._callers[id(caller)] = caller
+
+
+    def __register_with_submods(self):
+        """Code factorization for recording this Module as a caller of each of
+        its submodules."""
+
+        for v in self._state['submods'].values():
+            if v is not None:
+                v.__add_caller(self)
+
+
+    def __memo_key(self, inputs, nested):
+        """Computes the key the results for ``inputs`` are cached under.
+
+        The key covers the call-site inputs as well as the state of the Module
+        (which includes the bound inputs and the bound submodules). Together
+        these determine the full set of inputs the callback will see. The same
+        key is used for the in-memory cache and, if it is stable, for the
+        persistent store.
+
+        If memoization is off, the results are instead shared within the
+        current top-level call (unless that is off too). In that case the
+        table of the request is used as the cache. The state of the Modules
+        can not change during a request, so the key is just the Module's
+        identity and the call-site inputs. The table holds on to the Module
+        next to its results (see ``__save``), so its identity can not be
+        reused by another Module while the request lasts. Such keys are not
+        stable, so the results are not persisted. A call which starts the
+        request can not find anything in its table, so it is not memoized at
+        all.
+
+        :param inputs: The call-site inputs.
+        :type inputs: dict(str, obj)
+        :param nested: Whether the call is made within an enclosing request.
+        :type nested: bool
+
+        :return: The key to memoize the call under, whether that key is
+                 stable, the table to memoize the call in, and the fingerprint
+                 of the Module's state (which results are tagged with, see
+                 ``invalidate_cache``), or (None, False, None, None) if the
+                 call can not be memoized (either memoization is off or some
+                 input can not be fingerprinted).
+        :rtype: (str, bool, dict, str)
+        """
+
+        try:
+            if self._is_memoizable:
+                state_fp, stable = self.__state_fingerprint()
+                return (fingerprint((inputs, state_fp)), stable, self._cache,
+                        state_fp)
+            if nested and self._share_in_request:
+                return ((id(self), fingerprint(inputs)), False,
+                        _request_results.get(), None)
+        except TypeError:
+            pass
+        return (None, False, None, None)
+
+
+    def __defaults(self):
+        """Code factorization for the merged table of default inputs.
+
+        The default inputs are the bound inputs, overridden by the defaults of
+        the property types' inputs. Since the table can not change once the
+        Module is locked, it is built once at that point and reused by every
+        call. For unlocked Modules a new table is built each time.
+
+        :return: The default value of every input the Module recognizes.
+        :rtype: dict(str, obj)
+        """
+
+        if self._defaults != None:
+            return self._defaults
+
+        rv = dict(self._state['inputs'])
+        for pt in self._state['property_types']:
+            for r in pt.inputs():
+                rv[r[0]] = r[1]
+        if self.locked():
+            self._defaults = rv
+        return rv
+
+
     def __init__(self, **kwargs):
         r""" Creates a Module instance initialized with the provided state
 
@@ -89,7 +382,13 @@ class Module:
         :Keyword Arguments:
            - *callback_name* (``str``) -- A distinguishing name for the wrapped
              callback.
-           - *callback* (``callable``) -- The actual callback to wrap.
+           - *callback* (``callable``) -- The actual callback to wrap. May be
+             a coroutine function (see ``run_async``) or a generator function
+             (see ``run_stream``).
+           - *batch_callback* (``callable``) -- An optional, vectorized version
+             of the callback used by ``run_batch``. It has the same signature
+             as the callback, but the call-site inputs are columns and so are
+             the returned results.
            - *citations* (``[str]``) -- What sources users of this module should
              cite and/or give credit to.
            - *description* (``str``) -- A detailed description of what the
@@ -111,15 +410,50 @@ class Module:
         self._unlocked = True
 
         # Used to memoize calls to the module
-        self._cache = {}
+        self._cache = Cache()
+
+        # Optional on-disk tier behind the cache
+        self._store = None
+
+        # Fingerprint of the Module's own state (set once the Module locks)
+        self._own_fp = None
+
+        # Fingerprint of the Module's state, submodules included (set once
+        # the Module and its submodules lock)
+        self._state_fp = None
+
+        # The Modules which bind this one as a submodule (by id, held weakly)
+        self._callers = weakref.WeakValueDictionary()
+
+        # Merged table of default inputs (set once the Module locks)
+        self._defaults = None
+
+        # Sets of call-site inputs the locked Module is known to be ready for
+        self._ready_for = set()
+
+        # Used to run submitted calls concurrently (None means run inline)
+        self._scheduler = None
+
+        # Name of the factory which made the Module (see registry.py)
+        self._factory = None
+
+        # Runtime statistics (see stats.py)
+        self._stats = ModuleStats()
 
         # Flag indicating whether memoization is possible
         self._is_memoizable = True
 
+        # Flag indicating whether results may be shared within a request
+        self._share_in_request = True
+
+        # Parts of the state (and the cache) shared with copies of the Module
+        self._shared = set()
+
         # In the real PluginPlay this is a class wrapping the user's class.
         # Here we just put the main pieces of that class's state into a dict
         self._state = {'callback_name' : None,
                        'callback' : None,
+                       'batch_callback' : None,
                        'citations' : [],
                        'description' : None,
                        'inputs' : {},
@@ -132,27 +466,87 @@ class Module:
         for k in self._state.keys():
             if k in kwargs:
                 self._state[k] = kwargs[k]
+        self.__register_with_submods()
+
+
+    def __getstate__(self):
+        # Copies do not inherit the callers of the original. Copies of the
+        # callers register themselves instead (see __setstate__).
+        state = dict(self.__dict__)
+        del state['_callers']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._callers = weakref.WeakValueDictionary()
+        self.__register_with_submods()
 
 
     def unlocked_copy(self):
-        """Makes a deepcopy of the current module, which can be modified.
+        """Makes a copy of the current module, which can be modified.
 
         Once a Module instance starts running its state can no longer be
         modified. Sometimes a user wants to run the same instance again, but
         with slightly different state. This function can be used to create a
-        deep copy (*i.e.*, not aliased to the present instance) which can be
-        modified.
-
-        :return: A deepcopy of the current instance, except that the copy is
+        copy which can be modified without affecting the present instance.
+
+        The copy is copy-on-write: it shares the bound inputs, the submodules,
+        and the cache with the present instance until ``change_input`` or
+        ``change_submod`` modifies them, at which point the copy gets its own
+        (shallow) copy of the modified table. The submodules themselves are
+        shared, not copied; to modify one, bind a copy of it with
+        ``change_submod``. Since cached results are keyed by the state they
+        were computed for, the copy can reuse the results of the present
+        instance until it is first changed, at which point it starts a new,
+        empty cache with the same configuration (even if nothing had been
+        cached yet).
+
+        :return: A copy of the current instance, except that the copy is
                  unlocked.
         :rtype: Module
         """
 
-        rv = deepcopy(self)
+        rv = copy(self)
+        rv._state = dict(self._state)
         rv._unlocked = True
+        rv._own_fp = None
+        rv._state_fp = None
+        rv._defaults = None
+        rv._ready_for = set()
+        rv._stats = ModuleStats()
+        self._shared = set(['inputs', 'submods', 'cache'])
+        rv._shared = set(self._shared)
         return rv
 
 
+    def __unshare(self, part):
+        """Code factorization for copying a shared table before modifying it.
+
+        :param part: The member of the state about to be modified.
+        :type part: str
+        """
+
+        if part in self._shared:
+            self._state[part] = dict(self._state[part])
+            self._shared.discard(part)
+
+
+    def __new_cache(self):
+        """Code factorization for detaching from a shared cache.
+
+        :return: True if the cache was shared (and has been replaced by an
+                 empty one with the same configuration) and False otherwise.
+        :rtype: bool
+        """
+
+        if 'cache' not in self._shared:
+            return False
+        self._cache = Cache(**self._cache.config())
+        self._shared.discard('cache')
+        return True
+
+
     def has_module(self):
         """Determines if the current Module actually wraps a callable.
 
@@ -215,16 +609,18 @@ class Module:
 
         self.__assert_has_module()
 
+        # Values may not compare to None sensibly (e.g., NumPy arrays compare
+        # elementwise), so "is None" is needed here
         rv = {'Inputs' : set(), 'Submodules' : set()}
         for pt in self._state['property_types']:
             for (k,v) in pt.inputs():
-                if v == None:
+                if v is None:
                     rv['Inputs'].add(k)
         for k,v in self._state['inputs'].items():
-            if v == None:
+            if v is None:
                 rv['Inputs'].add(k)
         for k,v in self._state['submods'].items():
-            if v == None:
+            if v is None:
                 rv['Submodules'].add(k[0])
             elif not v.ready(k[1]):
                 rv['Submodules'].add(k[0])
@@ -259,7 +655,15 @@ class Module:
         :raises RuntimeError: If the instance does not wrap a callback.
         """
 
-        return self.__ready(prop_type.inputs())
+        # Like __prepare, locked Modules remember what they are ready for
+        keys = frozenset(k for k, _ in prop_type.inputs())
+        if self.locked() and keys in self._ready_for:
+            return True
+
+        rv = self.__ready(prop_type.inputs())
+        if rv and self.locked():
+            self._ready_for.add(keys)
+        return rv
 
 
     def reset_cache(self):
@@ -269,10 +673,195 @@ class Module:
         instances keep track of all of the results they have computed. These
         results are stored in an internal cache. It is sometimes the case that
         these caches can fill up with large temporary intermediates. This
-        function wipes out the cache associated with this Module.
+        function wipes out the cache associated with this Module. The cache's
+        configuration (see ``set_cache_policy``) is left alone. A cache shared
+        with a copy of the Module is left to the copy.
         """
 
-        self._cache = {}
+        if not self.__new_cache():
+            self._cache.clear()
+
+
+    def state_fingerprint(self):
+        """Fingerprints the state the Module's results depend on.
+
+        The state is the Module's own state (type, callback, and bound inputs)
+        together with the state of every submodule it calls. Cached results
+        are tagged with the fingerprint of the state they were computed for,
+        which makes it possible to invalidate them precisely with
+        ``invalidate_cache`` once the state changes.
+
+        :return: The fingerprint, or None if a bound input can not be
+                 fingerprinted.
+        :rtype: str
+        """
+
+        try:
+            return self.__state_fingerprint()[0]
+        except TypeError:
+            return None
+
+
+    def invalidate_cache(self, state_fp):
+        """Forgets the results computed for a particular state.
+
+        Unlike ``reset_cache``, results computed for other states are kept.
+        ``change_input`` and ``change_submod`` call this for the state the
+        Module had before the change. Modules calling this one are not known
+        to it; ``ModuleManager.change_input`` and
+        ``ModuleManager.change_submod`` invalidate their results too. If the
+        cache is shared with a copy of the Module (see ``unlocked_copy``),
+        the copy keeps it and this Module starts a new, empty cache instead.
+
+        :param state_fp: The fingerprint of the state (see
+                         ``state_fingerprint``).
+        :type state_fp: str
+
+        :return: The number of results forgotten.
+        :rtype: int
+        """
+
+        n = len(self._cache)
+        if self.__new_cache():
+            return n
+        return self._cache.invalidate(state_fp)
+
+
+    def __old_state(self):
+        """Code factorization for the state to invalidate after a change.
+
+        :return: The fingerprint of the current state, or None if there is
+                 nothing cached to invalidate (including if the cache is
+                 shared, see ``__forget_old_state``).
+        """
+
+        if 'cache' in self._shared or len(self._cache) == 0:
+            return None
+        return self.state_fingerprint()
+
+
+    def __forget_old_state(self, old_fp):
+        """Code factorization for forgetting results after a change.
+
+        A Module sharing its cache with a copy (see ``unlocked_copy``) starts
+        a new cache when it is first changed, so results for its new state
+        never land in the cache of the other Module. Otherwise the results
+        cached for the previous state are forgotten.
+
+        :param old_fp: The result of ``__old_state``, from before the change.
+        :type old_fp: str
+        """
+
+        if self.__new_cache() or old_fp == None:
+            return
+        if old_fp != self.state_fingerprint():
+            self._cache.invalidate(old_fp)
+
+
+    def stats(self):
+        """Provides the runtime statistics the Module has collected.
+
+        Every call to the Module is counted and timed, which makes it possible
+        to tell which Modules (and which of their callback points) a slow
+        program spends its time in. See the ModuleStats class for what the
+        individual statistics mean.
+
+        :return: A snapshot of the statistics (see ``ModuleStats.as_dict``).
+        :rtype: dict
+        """
+
+        return self._stats.as_dict()
+
+
+    def reset_stats(self):
+        """Forgets the runtime statistics the Module has collected."""
+
+        self._stats.reset()
+
+
+    def set_cache_policy(self, policy='lru', max_entries=None, max_bytes=None,
+                         ttl=None):
+        """Configures how many results the Module may cache.
+
+        By default the cache of a Module is unbounded. This function replaces
+        the cache with one that is bounded by ``max_entries`` and/or
+        ``max_bytes`` and evicts results according to ``policy`` (see the
+        documentation of the Cache class for the available policies). Results
+        which are already cached are carried over, subject to the new limits.
+
+        :param policy: The eviction policy, one of ``'lru'``, ``'lfu'``, or
+                       ``'ttl'``.
+        :type policy: str
+        :param max_entries: Maximum number of cached results, or None.
+        :type max_entries: int
+        :param max_bytes: Maximum (estimated) bytes of cached results, or None.
+        :type max_bytes: int
+        :param ttl: Seconds before a cached result expires, or None.
+        :type ttl: float
+
+        :raises RuntimeError: If the instance does not wrap a callback.
+        :raises ValueError: If the policy is not valid.
+        """
+
+        self.__assert_has_module()
+        new_cache = Cache(policy, max_entries, max_bytes, ttl,
+                          self._cache.budget())
+        for k, cost, _ in self._cache.costs():
+            v = self._cache.get(k)
+            if v != None:
+                new_cache.put(k, v, self._cache.tag(k, None), cost)
+        self._cache = new_cache
+        self._shared.discard('cache')
+
+
+    def set_result_store(self, store):
+        """Attaches a persistent store behind the Module's cache.
+
+        When a store is attached, results which miss in the in-memory cache are
+        looked up in ``store`` before the callback is invoked, and newly
+        computed results are written to it. Results are stored under a
+        fingerprint of the callback name, the bound inputs, the fingerprints of
+        the submodules, and the call's inputs. Modules (or submodules) without
+        a callback name, and calls whose inputs can not be fingerprinted,
+        bypass the store.
+
+        :param store: The store to use, or None to detach the current store.
+        :type store: ResultStore
+
+        :raises RuntimeError: If the instance does not wrap a callback.
+        """
+
+        self.__assert_has_module()
+        self._store = store
+
+
+    def set_scheduler(self, scheduler):
+        """Sets the Scheduler which runs calls submitted to this Module.
+
+        Calls made through ``submit_as`` are handed to ``scheduler``.
+
+        :param scheduler: The scheduler to use, or None to run submitted calls
+                          immediately in the submitting thread.
+        :type scheduler: Scheduler
+        """
+
+        self._scheduler = scheduler
+
+
+    def set_memory_budget(self, budget):
+        """Makes the Module's cached results count against ``budget``.
+
+        A budget is typically shared by many Modules (see
+        ``ModuleManager.set_memory_budget``). When their cached results
+        exceed it, results are evicted from any of their caches, starting
+        with those which were quickest to compute per byte. The Module's own
+        cache limits (see ``set_cache_policy``) continue to apply.
+
+        :param budget: The budget, or None to only use the cache's own limits.
+        :type budget: MemoryBudget
+        """
+
+        self._cache.set_budget(budget)
 
 
     def is_memoizable(self):
@@ -319,11 +908,47 @@ class Module:
         self._is_memoizable = True
 
 
+    def turn_off_request_sharing(self):
+        """Makes the Module run for every call, even within a single request.
+
+        When memoization is off, calls made with the same inputs during a
+        single top-level call (e.g., by several Modules sharing this one as a
+        submodule) still share their results. This function turns that off
+        too, which is needed if the callback is not deterministic (e.g., it
+        draws random numbers).
+
+        :raises RuntimeError: If the instance does not wrap a callback
+        """
+
+        self.__assert_has_module()
+        self._share_in_request = False
+
+
+    def turn_on_request_sharing(self):
+        """Shares the results of identical calls within a single request.
+
+        This is the default. It only matters when memoization is off (see
+        ``turn_off_request_sharing``).
+
+        :raises RuntimeError: If the instance does not wrap a callback.
+        """
+
+        self.__assert_has_module()
+        self._share_in_request = True
+
+
     def lock(self):
         """When a Module is locked its state can no longer be changed.
 
-        Calling this function will lock the Module. Once locked all attempts to
-        change the Module through the public API will raise exceptions.
+        Calling this function will lock the Module and (recursively) its
+        submodules. Once locked all attempts to change the Module through the
+        public API will raise exceptions. Locking also builds the table of
+        default inputs which every call is merged into. Since the state of a
+        locked tree of Modules can not change, its fingerprint (see
+        ``state_fingerprint``) is computed once and reused by every call.
+
+        To change a submodule of a locked Module, bind an unlocked copy of it
+        (see ``unlocked_copy``) to an unlocked copy of the Module.
 
         :raises RuntimeError: If the instance does not wrap a callback.
         :raises RuntimeError: If any submodule is not ready to run.
@@ -332,10 +957,26 @@ class Module:
         self.__assert_has_module()
 
         for k, v in self._state['submods'].items():
-            if v == None or not v.ready(k[1]):
+            if v is None or not v.ready(k[1]):
                 raise RuntimeError(k[0] + " is not ready!")
 
         self._unlocked = False
+        self.__defaults()
+        self.__lock_submods()
+
+
+    def __lock_submods(self):
+        """Code factorization for locking the submodules of a locked Module.
+
+        ``lock`` has already checked that the submodules are ready, so they
+        are locked without checking them again.
+        """
+
+        for v in self._state['submods'].values():
+            if not v.locked():
+                v._unlocked = False
+                v.__defaults()
+                v.__lock_submods()
 
 
     def results(self):
@@ -344,22 +985,21 @@ class Module:
         For the real PluginPlay, the underlying implementation is in C++ and
         uses getters/setters. This function will return the results that the
         Module can compute (both those specific to the Module and those from a
-        property type). The return will be a deep copy to avoid aliasing the
-        internal state.
+        property type). The return is immutable, so it can not be used to
+        modify the internal state.
 
         :return: The set of result names/descriptions which this Module can
                  compute.
-        :rtype: set(str)
+        :rtype: frozenset(str)
 
         :raises RuntimeError: If the instance does not wrap a callback.
         """
 
         self.__assert_has_module()
-        rv = deepcopy(self._state['results'])
+        rv = set(self._state['results'])
         for pt in self._state['property_types']:
-            for r in pt.results():
-                rv.add(r)
-        return rv
+            rv.update(pt.results())
+        return frozenset(rv)
 
     def inputs(self):
         """Read-only accessor for viewing the inputs to the Module.
@@ -367,22 +1007,20 @@ class Module:
         For the real PluginPlay, the underlying implementation is in C++ and
         uses getters/setters. This function will return the set of inputs that
         the Module requires (both those specific to the Module and those from a
-        property type). The return will be a deep copy to avoid aliasing the
-        internal state.
+        property type). The return is a read-only view; the values themselves
+        are not copied and must not be modified. Once the Module is locked the
+        view is of the table of default inputs built by ``lock``, so calling
+        this function does not copy anything.
 
         :return: The set of input names/descriptions (and their default values,
                  if set) which this Module recognizes.
-        :rtype: dict(str, obj)
+        :rtype: mappingproxy(str, obj)
 
         :raises RuntimeError: If the instance does not wrap a callback.
         """
 
         self.__assert_has_module()
-        rv = deepcopy(self._state['inputs'])
-        for pt in self._state['property_types']:
-            for r in pt.inputs():
-                rv[r[0]] = r[1]
-        return rv
+        return MappingProxyType(self.__defaults())
 
 
     def submods(self):
@@ -392,18 +1030,19 @@ class Module:
         For the real PluginPlay, the underlying implementation is in C++ and
         uses getters/setters. This function will return the names of the
         callback points, as well as the modules bound to those callback points.
+        The return is a read-only view; the submodules are not copied.
 
         :return: The set of submodule callback points (and the modules currently
                  bound to those points) that this Module recognizes.
-        :rtype: dict(str, Module)
+        :rtype: mappingproxy(str, Module)
 
         :raises RuntimeError: If the instance does not wrap a callback.
         """
         self.__assert_has_module()
         rv = {}
         for k,v in self._state['submods'].items():
-            rv[k[0]] = deepcopy(v)
-        return rv
+            rv[k[0]] = v
+        return MappingProxyType(rv)
 
 
     def property_types(self):
@@ -415,13 +1054,13 @@ class Module:
         developer.
 
         :return: The set of PropertyTypes that the module satisfies
-        :rtype: set(PropertyType)
+        :rtype: frozenset(PropertyType)
 
         :rasies RuntimeError: If the instance does not wrap a callback
         """
 
         self.__assert_has_module()
-        return deepcopy(self._state['property_types'])
+        return frozenset(self._state['property_types'])
 
     def description(self):
         """Provides the description of the module.
@@ -465,7 +1104,8 @@ class Module:
         arguments (defined as part of one or more PropertyTypes) and those which
         are specific to the Module. This function can only be used to change the
         module-specific ones (in the real implementation it can change all the
-        inputs).
+        inputs). Results cached for the previous value are forgotten (see
+        ``invalidate_cache``).
 
         :raises RuntimeError: If the Module does not wrap a callback.
         :raises RuntimeError: If the Module is locked.
@@ -477,7 +1117,14 @@ class Module:
         if key not in self.inputs():
             raise KeyError(key + " is not a valid input for this Module.")
 
+        old_fp = self.__old_state()
+        self.__unshare('inputs')
         self._state['inputs'][key] = value
+        self._own_fp = None
+        self._defaults = None
+        self._ready_for = set()
+        self.__drop_state_fingerprints()
+        self.__forget_old_state(old_fp)
 
     def change_submod(self, key, new_mod):
         """Changes the submodule this module will call.
@@ -485,7 +1132,8 @@ class Module:
         The actual implementation of a Module can define multiple callback
         points. Before the module can be run there must be a Module assigned to
         each of those callback points. This function allows the user to change
-        what Module is called at a specified callback point.
+        what Module is called at a specified callback point. Results cached
+        for the previous submodule are forgotten (see ``invalidate_cache``).
 
         :raises RuntimeError: If the Module does not wrap a callback
         :raises RuntimeError: If the Module is locked
@@ -498,9 +1146,22 @@ class Module:
         if key not in self.submods():
             raise KeyError(key + " is not a predefined callback point.")
 
-        for k, _ in self._state['submods'].items():
+        old_fp = self.__old_state()
+        self.__unshare('submods')
+        old_mods = []
+        for k, v in self._state['submods'].items():
             if k[0] == key:
+                old_mods.append(v)
                 self._state['submods'][k] = new_mod
+        bound = set(id(v) for v in self._state['submods'].values())
+        for v in old_mods:
+            if v is not None and id(v) not in bound:
+                v._callers.pop(id(self), None)
+        if new_mod is not None:
+            new_mod.__add_caller(self)
+        self._ready_for = set()
+        self.__drop_state_fingerprints()
+        self.__forget_old_state(old_fp)
 
 
     def run_as(self, prop_type, *args):
@@ -525,6 +1186,213 @@ class Module:
         rv = self.run(inputs)
         return prop_type.unwrap_results(rv)
 
+    def __prepare(self, inputs):
+        """Code factorization for checking the Module can run and locking it.
+
+        Determining if a Module is ready walks the entire tree of submodules.
+        Once a Module is locked its state can not change, so the outcome of
+        the check only depends on which inputs are provided at the call site.
+        Locked Modules therefore remember the sets of call-site inputs they
+        have been found ready for and skip both the check and the lock for
+        those sets.
+
+        :param inputs: The call-site inputs (only the keys are used).
+        :type inputs: dict(str, obj)
+
+        :raises RuntimeError: If the Module does not wrap a callable.
+        :raises RuntimeError: If the Module is not ready
+        """
+
+        keys = frozenset(inputs)
+        if self.locked() and keys in self._ready_for:
+            return
+
+        self.__assert_has_module()
+        if not self.__ready(inputs):
+            raise RuntimeError("Module is not ready")
+        if not self.locked():
+            self.lock()
+        self._ready_for.add(keys)
+
+
+    def __lookup(self, inputs, nested):
+        """Code factorization for looking up previously computed results.
+
+        :param inputs: The call-site inputs.
+        :type inputs: dict(str, obj)
+        :param nested: Whether the call is made within an enclosing request.
+        :type nested: bool
+
+        :return: The results (None on a miss), the cache and the key to store
+                 new results under in it, the key to store them under in the
+                 ResultStore (None means do not store them), and the tag of
+                 the results (the fingerprint of the Module's state).
+        :rtype: (dict(str, obj), Cache, str, str, str)
+        """
+
+        key, stable, cache, tag = self.__memo_key(inputs, nested)
+        rv = None if key == None else cache.get(key)
+        if rv != None:
+            if cache is not self._cache:
+                rv = rv[1]
+            return (dict(rv), cache, key, None, tag)
+
+        fp = key if stable and self._store != None else None
+        rv = _not_stored if fp == None else self._store.get(fp, _not_stored)
+        if rv is not _not_stored:
+            self.__save(cache, key, None, rv, tag)
+            return (rv, cache, key, None, tag)
+
+        return (None, cache, key, fp, tag)
+
+
+    def __save(self, cache, key, fp, rv, tag, cost=0.0):
+        """Code factorization for recording newly computed results.
+
+        :param cache: The cache to record the results in.
+        :type cache: Cache
+        :param key: The key for the cache (None means do not cache).
+        :type key: str
+        :param fp: The key for the ResultStore (None means do not store).
+        :type fp: str
+        :param rv: The results to record.
+        :type rv: dict(str, obj)
+        :param tag: The fingerprint of the Module's state.
+        :type tag: str
+        :param cost: The time it took to compute the results.
+        :type cost: float
+        """
+
+        # Only dictionaries of results are recorded (e.g., a callback for a
+        # property type without results may simply return None)
+        if not isinstance(rv, dict):
+            return
+        if key != None:
+            if cache is self._cache:
+                cache.put(key, dict(rv), tag, cost)
+            else:
+                # Request tables are keyed on the Module's address, so the
+                # Module is kept alive until the request ends
+                cache[key] = (self, dict(rv))
+        if fp != None:
+            # Results which can not be pickled simply are not persisted
+            try:
+                self._store[fp] = rv
+            except (pickle.PicklingError, TypeError, AttributeError):
+                pass
+
+
+    def __call(self, defaults, inputs, call, nested):
+        """Code factorization for running an already validated Module.
+
+        This function implements the memoized call to the callback. It assumes
+        that the Module has been validated (and locked) by ``__prepare``. If
+        the callback is a coroutine function, the coroutine is run to
+        completion on a new event loop.
+
+        :param defaults: The inputs bound to the Module.
+        :type defaults: dict(str, obj)
+        :param inputs: The call-site inputs.
+        :type inputs: dict(str, obj)
+        :param call: The statistics bookkeeping for the call (see
+                     ``stats.begin_call``).
+        :type call: _Call
+        :param nested: Whether the call is made within an enclosing request.
+        :type nested: bool
+
+        :return: The results of the call.
+        :rtype: dict(str, obj)
+
+        :raises RuntimeError: If the callback is a coroutine function and this
+                              thread is already running an event loop (use
+                              ``run_async`` instead).
+        """
+
+        rv, cache, key, fp, tag = self.__lookup(inputs, nested)
+        if rv != None:
+            call.hit = True
+            return rv
+
+        all_inputs = dict(defaults)
+        all_inputs.update(inputs)
+        subs = self._state['submods']
+        start = time.perf_counter()
+        try:
+            rv = self._state['callback'](all_inputs, subs)
+
+            if inspect.isawaitable(rv):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    rv = asyncio.run(rv)
+                else:
+                    rv.close()
+                    raise RuntimeError("Coroutine callbacks can not be run "
+                                       "synchronously from an event loop. Use "
+                                       "run_async.")
+            if inspect.isgenerator(rv):
+                rv = _collect(rv)
+        finally:
+            elapsed = time.perf_counter() - start
+            call.callback_time += elapsed
+
+        self.__save(cache, key, fp, rv, tag, elapsed)
+        return rv
+
+
+    def __timed_call(self, defaults, inputs):
+        """Code factorization for ``__call`` when it is the entire call.
+
+        Wraps ``__call`` in the bookkeeping for the Module's statistics and
+        the request-scoped results. This is used when the validation has
+        already been done for the call (e.g., by ``run_batch``).
+        """
+
+        request = _begin_request()
+        call, token = begin_call(self)
+        try:
+            return self.__call(defaults, inputs, call, request == None)
+        finally:
+            end_call(call, token)
+            _end_request(request)
+
+
+    async def __call_async(self, defaults, inputs, call, nested):
+        """Code factorization for asynchronously running a validated Module.
+
+        This is the asynchronous analog of ``__call``. Coroutine callbacks are
+        awaited. Synchronous callbacks are run in a worker thread so they do
+        not block the event loop.
+        """
+
+        rv, cache, key, fp, tag = self.__lookup(inputs, nested)
+        if rv != None:
+            call.hit = True
+            return rv
+
+        all_inputs = dict(defaults)
+        all_inputs.update(inputs)
+        subs = self._state['submods']
+        callback = self._state['callback']
+
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(callback):
+                rv = await callback(all_inputs, subs)
+            else:
+                rv = await asyncio.to_thread(callback, all_inputs, subs)
+                if inspect.isawaitable(rv):
+                    rv = await rv
+                if inspect.isgenerator(rv):
+                    rv = await asyncio.to_thread(_collect, rv)
+        finally:
+            elapsed = time.perf_counter() - start
+            call.callback_time += elapsed
+
+        self.__save(cache, key, fp, rv, tag, elapsed)
+        return rv
+
+
     def run(self, inputs):
         """This call actually runs the Module with the provided inputs.
 
@@ -532,7 +1400,28 @@ class Module:
         has input parameter values bound to ``Module._state['inputs']`` and
         submodules bound to ``Module._state['submods']``. The actual call to the
         submodule is given ``Module._state['submods']`` and the union of
-        ``inputs`` with ``Module._state['inputs']``.
+        ``inputs`` with ``Module._state['inputs']``. The union is a shallow
+        copy of the default-input table built when the Module locked, so the
+        cost of preparing a call does not depend on the size of the bound
+        inputs. Callbacks must therefore not modify the values of their inputs.
+
+        If the Module is memoizable the results are stored in ``_cache`` under
+        a key built from the merged inputs and the state of the bound
+        submodules (see the ``hashing`` module). Subsequent calls with the same
+        key return the stored results without invoking the callback. Calls
+        whose inputs can not be fingerprinted are simply not memoized. If a
+        ResultStore is attached, it is consulted on a cache miss and updated
+        after the callback runs.
+
+        If the callback is a generator function, the dictionaries it yields
+        are gathered so that each result maps to the list of its values, in
+        the order they were yielded (see ``run_stream`` to consume them as
+        they are produced instead).
+
+        A call which is not made from within another Module's callback starts
+        a request, which lasts until the call returns. Within a request,
+        Modules with memoization off still share the results of identical
+        calls (see ``turn_off_request_sharing``).
 
         :param inputs: The positional arguments given to the Module, wrapped in
                        a dictionary.
@@ -547,16 +1436,362 @@ class Module:
         :raises BaseException: If the callable raises an error
         """
 
-        self.__assert_has_module
+        request = _begin_request()
+        call, token = begin_call(self)
+        try:
+            self.__prepare(inputs)
+            return self.__call(self.__defaults(), inputs, call,
+                               request == None)
+        finally:
+            end_call(call, token)
+            _end_request(request)
 
-        all_inputs = self.inputs()
-        all_inputs.update(inputs)
-        if not self.__ready(inputs):
-            raise RuntimeError("Module is not ready")
 
-        self.lock()
-        subs = self._state['submods']
-        return self._state['callback'](all_inputs, subs)
+    def run_as_stream(self, prop_type, *args, buffer=0):
+        r"""Calls the wrapped callable as the specified property type and
+           provides the results as they are produced.
+
+        This is the streaming analog of ``run_as`` (see ``run_stream``). Each
+        chunk yielded by the callback must contain all of the results of
+        ``prop_type`` (e.g., a block of rows of each of them); use
+        ``run_stream`` for callbacks which yield subsets of the results.
+
+        :param prop_type: The PropertyType the callable should be run as.
+        :type prop_type: PropertyType
+        :param \*args: The positional arguments to be forwarded to the callable.
+        :param buffer: See ``run_stream``.
+        :type buffer: int
+
+        :return: A generator over the result(s) specified by ``prop_type``,
+                 one item per chunk. Closing it stops the callback, as for
+                 ``run_stream``.
+        :rtype: generator
+
+        :raises RuntimeError: If the module does not wrap a callable.
+        :raises RuntimeError: If the module is not ready
+        :raises RuntimeError: If the module does not satisfy ``prop_type``
+        """
+
+        if prop_type not in self._state['property_types']:
+            raise RuntimeError('Does not satisfy property type')
+
+        inputs = {}
+        prop_type.wrap_inputs(inputs, *args)
+        chunks = self.run_stream(inputs, buffer)
+        return (prop_type.unwrap_results(c) for c in chunks)
+
+
+    def run_stream(self, inputs, buffer=0):
+        """Runs the Module and provides its results as they are produced.
+
+        Callbacks which are generator functions may yield their results in
+        chunks: each yielded item is a dictionary of (some of) the results.
+        This function returns an iterator over those dictionaries, so the
+        caller can process each chunk as soon as it is produced, and neither
+        the Module nor the caller has to hold all of the results at once.
+
+        By default the callback only runs while the caller asks for the next
+        chunk, so it can never get ahead of the caller. If ``buffer`` is
+        positive the callback instead runs in a background thread, which may
+        get up to ``buffer`` chunks ahead before it waits for the caller.
+
+        Streamed results are not memoized. Callbacks which are not generator
+        functions are run (and memoized) as by ``run`` and their results are
+        provided as a single chunk. The call is validated when this function
+        is called; the callback starts when the first chunk is requested.
+        Time the caller spends between chunks is not charged to the Module's
+        statistics.
+
+        :param inputs: The positional arguments given to the Module, wrapped in
+                       a dictionary.
+        :type inputs: {str, obj}
+        :param buffer: How many chunks the callback may produce ahead of the
+                       caller. 0 means the callback only runs on demand.
+        :type buffer: int
+
+        :return: An iterator over the chunks of results.
+        :rtype: iterator(dict(str, obj))
+
+        :raises RuntimeError: If the Module does not wrap a callable.
+        :raises RuntimeError: If the Module is not ready
+        :raises BaseException: If the callable raises an error (raised when
+                               the chunk is requested)
+        """
+
+        self.__prepare(inputs)
+        chunks = self.__stream(contextvars.copy_context(), inputs)
+        return _buffered(chunks, buffer) if buffer > 0 else chunks
+
+
+    def __open_stream(self, defaults, inputs):
+        """Code factorization for starting a streamed call.
+
+        Runs in the context of the stream (see ``__stream``).
+
+        :return: The request token, the bookkeeping for the call and its
+                 token, and the iterator over the chunks.
+        """
+
+        request = _begin_request()
+        call, token = begin_call(self)
+        try:
+            callback = self._state['callback']
+            if not inspect.isgeneratorfunction(callback):
+                return (request, call, token,
+                        iter([self.__call(defaults, inputs, call,
+                                          request == None)]))
+
+            all_inputs = dict(defaults)
+            all_inputs.update(inputs)
+            chunks = callback(all_inputs, self._state['submods'])
+            return (request, call, token, chunks)
+        except BaseException:
+            end_call(call, token)
+            _end_request(request)
+            raise
+
+
+    def __stream(self, ctx, inputs):
+        """Code factorization for the generator behind ``run_stream``.
+
+        The callback, and the bookkeeping of the call, run in ``ctx`` (a copy
+        of the caller's context), rather than in whatever context the chunks
+        are requested from. This keeps the call from leaking into the
+        caller's code between chunks and allows the chunks to be produced in
+        another thread.
+        """
+
+        request, call, token, chunks = ctx.run(self.__open_stream,
+                                               self.__defaults(), inputs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = ctx.run(next, chunks, None)
+                finally:
+                    call.callback_time += time.perf_counter() - start
+                if chunk == None:
+                    return
+
+                paused = time.perf_counter()
+                yield chunk
+                call.start += time.perf_counter() - paused
+        finally:
+            if inspect.isgenerator(chunks):
+                ctx.run(chunks.close)
+            ctx.run(end_call, call, token)
+            ctx.run(_end_request, request)
+
+
+    def submit_as(self, prop_type, *args):
+        r"""Schedules a call to the Module as the specified property type.
+
+        This is the asynchronous analog of ``run_as``. Rather than waiting for
+        the call to finish, this function returns a future for its results.
+        Callbacks can use it to run independent submodules concurrently. The
+        call is run by the Module's Scheduler (see ``set_scheduler``); if the
+        Module does not have a Scheduler the call is run immediately.
+
+        :param prop_type: The PropertyType the callable should be run as.
+        :type prop_type: PropertyType
+        :param \*args: The positional arguments to be forwarded to the callable.
+
+        :return: A future for the result(s) specified by ``prop_type``. Errors
+                 raised by the call are raised when the result is requested.
+        :rtype: concurrent.futures.Future
+        """
+
+        if self._scheduler == None:
+            return completed_future(self.run_as, prop_type, *args)
+        return self._scheduler.submit_as(self, prop_type, *args)
+
+
+    async def run_as_async(self, prop_type, *args):
+        r"""Calls the wrapped callable as the specified property type from
+           asyncio code.
+
+        This is the coroutine analog of ``run_as``. See ``run_async`` for how
+        the callback is run.
+
+        :param prop_type: The PropertyType the callable should be run as.
+        :type prop_type: PropertyType
+        :param \*args: The positional arguments to be forwarded to the callable.
+
+        :return: The result(s) specified by ``prop_type``.
+
+        :raises RuntimeError: If the module does not wrap a callable.
+        :raises RuntimeError: If the module is not ready
+        :raises RuntimeError: If the module does not satisfy ``prop_type``
+        """
+
+        if prop_type not in self._state['property_types']:
+            raise RuntimeError('Does not satisfy property type')
+
+        inputs = {}
+        prop_type.wrap_inputs(inputs, *args)
+        rv = await self.run_async(inputs)
+        return prop_type.unwrap_results(rv)
+
+
+    async def run_async(self, inputs):
+        """Runs the Module with the provided inputs from asyncio code.
+
+        This is the coroutine analog of ``run``. Validation and memoization
+        are the same as for ``run``. The callback may be a coroutine function,
+        in which case it is awaited; it can in turn await its submodules via
+        ``run_as_async``. Synchronous callbacks are run in a worker thread so
+        that they do not block the event loop.
+
+        :param inputs: The positional arguments given to the Module, wrapped in
+                       a dictionary.
+        :type inputs: {str, obj}
+
+        :return: A dictionary whose keys are the names of the results and whose
+                 values are the values of the respective result.
+        :rtype: {str, obj}
+
+        :raises RuntimeError: If the Module does not wrap a callable.
+        :raises RuntimeError: If the Module is not ready
+        :raises BaseException: If the callable raises an error
+        """
+
+        request = _begin_request()
+        call, token = begin_call(self)
+        try:
+            self.__prepare(inputs)
+            return await self.__call_async(self.__defaults(), inputs, call,
+                                           request == None)
+        finally:
+            end_call(call, token)
+            _end_request(request)
+
+
+    def run_as_batch(self, prop_type, batch):
+        """Calls the wrapped callable as ``prop_type`` for many sets of inputs.
+
+        This is the batched analog of ``run_as``. ``batch`` can either be a
+        sequence whose elements are the positional arguments for one call, or
+        a dictionary mapping the names of the inputs of ``prop_type`` to
+        columns (sequences, or NumPy arrays) of values. See ``run_batch`` for
+        how the calls are made.
+
+        :param prop_type: The PropertyType the callable should be run as.
+        :type prop_type: PropertyType
+        :param batch: The arguments for each call, either row-wise or
+                      column-wise.
+        :type batch: list(tuple) or dict(str, sequence)
+
+        :return: If ``batch`` is row-wise, a list whose i-th element is what
+                 ``run_as`` would return for the i-th row. If ``batch`` is
+                 column-wise, what ``run_as`` would return except that each
+                 result is a column.
+
+        :raises RuntimeError: If the module does not wrap a callable.
+        :raises RuntimeError: If the module is not ready
+        :raises RuntimeError: If the module does not satisfy ``prop_type``
+        """
+
+        if prop_type not in self._state['property_types']:
+            raise RuntimeError('Does not satisfy property type')
+
+        if isinstance(batch, dict):
+            return prop_type.unwrap_results(self.run_batch(batch))
+
+        rows = []
+        for args in batch:
+            inputs = {}
+            prop_type.wrap_inputs(inputs, *args)
+            rows.append(inputs)
+        return [prop_type.unwrap_results(rv) for rv in self.run_batch(rows)]
+
+
+    def run_batch(self, batch):
+        """Runs the Module for many sets of inputs.
+
+        Calling ``run`` in a loop repeats the validation, locking, and input
+        merging for every call. This function does that work once for the
+        entire batch. ``batch`` can be given row-wise (a list of input
+        dictionaries, each of which could be passed to ``run``) or column-wise
+        (a dictionary from input names to equal-length columns of values).
+
+        If the Module was given a ``batch_callback`` it is called once for the
+        entire batch. The batch callback receives the bound inputs, with the
+        call-site inputs replaced by columns (column-wise batches are
+        forwarded as is, e.g., NumPy arrays stay NumPy arrays), and must
+        return a dictionary from result names to columns. Calls made through
+        the batch callback are not memoized. Without a batch callback each row
+        is run (and memoized) as ``run`` would.
+
+        :param batch: The inputs for each call, either row-wise or column-wise.
+        :type batch: list(dict(str, obj)) or dict(str, sequence)
+
+        :return: For a row-wise batch, a list whose i-th element is the results
+                 of the i-th row. For a column-wise batch, a dictionary from
+                 result names to columns of results.
+        :rtype: list(dict(str, obj)) or dict(str, sequence)
+
+        :raises RuntimeError: If the Module does not wrap a callable.
+        :raises RuntimeError: If the Module is not ready
+        :raises ValueError: If the columns of a column-wise batch differ in
+                            length.
+        :raises BaseException: If the callable raises an error
+        """
+
+        columnar = isinstance(batch, dict)
+        if columnar:
+            lengths = set(len(col) for col in batch.values())
+            if len(lengths) > 1:
+                raise ValueError("Columns must all have the same length.")
+            n = lengths.pop() if len(lengths) else 0
+            self.__prepare(batch)
+        else:
+            self.__assert_has_module()
+            if len(batch) == 0:
+                return []
+
+            # Rows with the same keys have the same readiness
+            checked = set()
+            for inputs in batch:
+                keys = frozenset(inputs)
+                if keys not in checked:
+                    self.__prepare(inputs)
+                    checked.add(keys)
+
+        defaults = self.__defaults()
+        batch_callback = self._state['batch_callback']
+
+        if batch_callback != None:
+            columns = batch
+            if not columnar:
+                n = len(batch)
+                columns = {}
+                for i, inputs in enumerate(batch):
+                    for k, v in inputs.items():
+                        columns.setdefault(k, [None] * n)[i] = v
+            all_inputs = dict(defaults)
+            all_inputs.update(columns)
+            request = _begin_request()
+            call, token = begin_call(self)
+            start = time.perf_counter()
+            try:
+                rv = batch_callback(all_inputs, self._state['submods'])
+            finally:
+                call.callback_time += time.perf_counter() - start
+                end_call(call, token, n)
+                _end_request(request)
+            if columnar:
+                return rv
+            return [{k : v[i] for k, v in rv.items()} for i in range(n)]
+
+        if not columnar:
+            return [self.__timed_call(defaults, inputs) for inputs in batch]
+
+        rv = {}
+        for i in range(n):
+            inputs = {k : col[i] for k, col in batch.items()}
+            for k, v in self.__timed_call(defaults, inputs).items():
+                rv.setdefault(k, []).append(v)
+        return rv
 
 
     def __eq__(self, rhs):
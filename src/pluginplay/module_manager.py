@@ -1,4 +1,10 @@
-from copy import deepcopy
+from .budget import MemoryBudget
+from .cache import sizeof
+from .call_graph import CallGraph
+from .registry import build_modules, describe_modules, resolve_factory
+from . import plugins
+import itertools
+import pickle
 class ModuleManager:
     """Manages the Module instances known to PluginPlay.
 
@@ -28,10 +34,59 @@ class ModuleManager:
         :raises KeyError: If ``key`` is already assigned to a module.
         """
 
-        if key in self._modules.keys():
+        if key in self._modules.keys() or key in self._lazy:
             raise KeyError('Module key: %s is already in use.' % key)
 
 
+    def __load(self, key):
+        """Code factorization for making a lazily registered Module.
+
+        :raises KeyError: If the factory can not be found.
+        :raises ImportError: If the factory can not be imported.
+        """
+
+        factory = self._lazy[key]
+        if isinstance(factory, str):
+            mod = resolve_factory(factory)()
+            mod._factory = factory
+        else:
+            mod = factory()
+        del self._lazy[key]
+        self.add_module(key, mod)
+
+        # Plugin Modules call other Modules of the plugin, by key
+        if isinstance(factory, (plugins.PluginModule, plugins.PluginFactory)):
+            for cb_name, sub_key in factory.submods().items():
+                self.change_submod(key, cb_name, sub_key)
+
+
+    def __lazy_spec(self, key):
+        """Code factorization for describing the factory of a lazy Module.
+
+        Names, and the factories made by ``load_plugins``, are recorded as
+        they are. Other callables are recorded by their import path.
+
+        :raises RuntimeError: If the factory is a callable which can not be
+                              imported by name (e.g., a lambda or a closure).
+        """
+
+        factory = self._lazy[key]
+        if isinstance(factory, (str, plugins.PluginModule,
+                                plugins.PluginFactory)):
+            return factory
+
+        name = '%s:%s' % (getattr(factory, '__module__', None),
+                          getattr(factory, '__qualname__', None))
+        try:
+            if resolve_factory(name) is factory:
+                return name
+        except (KeyError, ImportError, AttributeError):
+            pass
+        raise RuntimeError("Can not describe the factory of the lazily added "
+                           "Module %s. Add it with the name of its factory "
+                           "instead." % key)
+
+
     def __init__(self):
         """Creates a new, empty ModuleManager.
 
@@ -41,6 +96,18 @@ class ModuleManager:
         """
         self._modules = {}
 
+        # Modules which have not been made yet (key to factory)
+        self._lazy = {}
+
+        # Index of which module key calls which
+        self._graph = CallGraph()
+
+        # Scheduler given to every Module added to this ModuleManager
+        self._scheduler = None
+
+        # MemoryBudget shared by the caches of every Module
+        self._budget = None
+
     def __contains__(self, key):
         """Determines if there is a module registered under a key.
 
@@ -48,11 +115,23 @@ class ModuleManager:
         :type key: str
 
         :return: True if this instance contains a Module registered under
-                 ``key`` and False otherwise.
+                 ``key`` (possibly lazily) and False otherwise.
         :rtype: bool
         """
 
-        return key in self._modules.keys()
+        return key in self._modules.keys() or key in self._lazy
+
+
+    def keys(self):
+        """Lists the module keys, including those of lazily added Modules.
+
+        Listing the keys does not make any lazily added Module.
+
+        :return: The keys of all of the Modules in the ModuleManager.
+        :rtype: list(str)
+        """
+
+        return list(self._modules.keys()) + list(self._lazy.keys())
 
 
     def add_module(self, key, mod):
@@ -71,6 +150,75 @@ class ModuleManager:
 
         self.__assert_key_is_free(key)
         self._modules[key] = mod
+        self._graph.add(key, mod)
+        if self._scheduler != None:
+            mod.set_scheduler(self._scheduler)
+        if self._budget != None:
+            mod.set_memory_budget(self._budget)
+
+
+    def add_lazy_module(self, key, factory):
+        """Registers a Module under ``key`` without making it yet.
+
+        Plugins with many Modules pay for importing and constructing all of
+        them when they are added with ``add_module``. This function instead
+        records how to make the Module. The Module is made (and added as if
+        by ``add_module``) the first time it is needed, i.e., when it is
+        retrieved, run, copied, configured, or bound as a submodule.
+
+        :param key: The name to store the module under.
+        :type key: str
+        :param factory: A callable taking no arguments which returns the
+                        Module, or the name of one (a name registered with
+                        ``registry.register_factory`` or an import path like
+                        ``'package.module:ModuleClass'``). Names are only
+                        resolved (and imported) when the Module is made.
+        :type factory: callable or str
+
+        :raises KeyError: If ``key`` is already in use.
+        """
+
+        self.__assert_key_is_free(key)
+        self._lazy[key] = factory
+
+
+    def load_plugins(self, group=plugins.ENTRY_POINT_GROUP, cache_path=None):
+        """Lazily registers the Modules of every installed plugin collection.
+
+        The installed plugins are found through their entry points and
+        described by the cached manifest (see ``plugins.discover``), so no
+        plugin code is imported unless the installed plugins changed. Each
+        Module is added with ``add_lazy_module``, under the key its plugin
+        uses. Modules with a factory name are made from it and then given the
+        configuration their plugin gave them (see ``plugins.PluginModule``),
+        including the submodules, which are bound by key. The others are
+        copied from a scratch ModuleManager the plugin is loaded into (see
+        ``plugins.PluginFactory``), and their submodules which the plugin
+        added under a key are bound by key as well.
+
+        :param group: The entry point group to search.
+        :type group: str
+        :param cache_path: Where the manifest is cached. If None,
+                           ``plugins.default_cache_path()`` is used.
+        :type cache_path: str
+
+        :return: The manifest, which can be used to list and filter the
+                 available Modules without making them.
+        :rtype: dict
+
+        :raises KeyError: If a plugin uses a key which is already in use.
+        """
+
+        manifest = plugins.discover(group, cache_path)
+        for desc in manifest['plugins'].values():
+            for key, mod in desc['modules'].items():
+                if mod['factory'] == None or mod['config'] == None:
+                    factory = plugins.PluginFactory(desc['entry_point'], key)
+                else:
+                    factory = plugins.PluginModule(mod['factory'],
+                                                   mod['config'])
+                self.add_lazy_module(key, factory)
+        return manifest
 
 
     def __getitem__(self, key):
@@ -88,17 +236,21 @@ class ModuleManager:
         :raises KeyError: If no module is registered under ``key``.
         """
 
+        if key in self._lazy:
+            self.__load(key)
         self.__assert_has_key(key)
         return self._modules[key]
 
     def copy_module(self, old_key, new_key):
-        """Deep copies the specified module.
+        """Copies the specified module.
 
         If two different callback points are set to the same module key they
         will alias eachother (chaning the inputs or submods for one, will also
         change them for the other). Sometimes we don't want that. This function
-        will create a deep copy of a module breaking the aliasing. The resulting
-        module will be unlocked, allowing the user to change the inputs.
+        will create a copy of a module breaking the aliasing. The resulting
+        module will be unlocked, allowing the user to change the inputs. The
+        copy is copy-on-write (see ``Module.unlocked_copy``): it calls the
+        same submodules as the original and only copies what is changed.
 
         :param old_key: The key of the module being deep copied.
         :type old_key: str
@@ -109,9 +261,16 @@ class ModuleManager:
         :raises KeyError: If there is already a module under ``new_key``
         """
 
-        self.__assert_has_key(old_key)
         self.__assert_key_is_free(new_key)
+
+        # A copy of a Module which has not been made is a fresh Module
+        if old_key in self._lazy:
+            self._lazy[new_key] = self._lazy[old_key]
+            return
+
+        self.__assert_has_key(old_key)
         self._modules[new_key] = self._modules[old_key].unlocked_copy()
+        self._graph.add(new_key, self._modules[new_key])
 
 
     def erase(self, key):
@@ -126,6 +285,8 @@ class ModuleManager:
         """
         if key in self._modules.keys():
             del self._modules[key]
+            self._graph.remove(key)
+        self._lazy.pop(key, None)
 
 
     def rename_module(self, old_key, new_key):
@@ -144,16 +305,30 @@ class ModuleManager:
         :raises KeyError: If there is already a Module under ``new_key``.
         """
 
-        self.copy_module(old_key, new_key)
-        self.erase(old_key)
+        self.__assert_key_is_free(new_key)
+        if old_key in self._lazy:
+            self._lazy[new_key] = self._lazy.pop(old_key)
+            return
+
+        # The Module itself is moved, so callers stay bound to it
+        self.__assert_has_key(old_key)
+        mod = self._modules.pop(old_key)
+        self._graph.remove(old_key)
+        self._modules[new_key] = mod
+        self._graph.add(new_key, mod)
 
 
     def change_input(self, mod_key, opt_key, value):
         """Wraps the process of changing a Module's input value.
 
         This function makes it easier to change the input of a module directly
-        through the ModuleManager. It ultimately just wraps getting the module
-        and then calling ``change_input`` on the Module.
+        through the ModuleManager. It ultimately wraps getting the module and
+        then calling ``change_input`` on the Module. Results cached by the
+        Module for its previous state are forgotten. The Modules calling it
+        keep the results cached for their previous states, but since results
+        are keyed by the fingerprints of the submodules too, those results
+        can no longer be returned; they are simply evicted like any other
+        unused results.
 
         :param mod_key: The key of the Module whose input is being changed.
         :type mod_key: str
@@ -164,8 +339,7 @@ class ModuleManager:
         :raises KeyError: If there is no Module under ``mod_key``.
         :raises KeyError: If there is no input under ``opt_key``.
         """
-        self.__assert_has_key(mod_key)
-        self._modules[mod_key].change_input(opt_key, value)
+        self[mod_key].change_input(opt_key, value)
 
 
     def change_submod(self, mod_key, callback_key, submod_key):
@@ -174,7 +348,8 @@ class ModuleManager:
         Modules define callback points. Users can change which modules are
         called at those callback points by using this function. Unlike going
         directly through the Module, using the ModuleManager to swap out
-        submodules can be done purely with keys.
+        submodules can be done purely with keys. Like ``change_input``, the
+        results cached for the previous state of the Module are forgotten.
 
         :param mod_key: The key for the module whose submodule will be changed.
         :type mod_key: str
@@ -187,12 +362,225 @@ class ModuleManager:
         :raises KeyError: If ``mod_key`` is not a valid module key.
         :raises KeyError: If ``callback_key`` is not a valid callback point
         :raises KeyError: If ``submod_key`` is not a valid module key.
+        :raises RuntimeError: If the Module under ``submod_key`` calls (directly
+                              or indirectly) the Module under ``mod_key``,
+                              i.e., the change would create a cycle.
         """
 
-        self.__assert_has_key(mod_key)
-        self.__assert_has_key(submod_key)
-        new_submod = self._modules[submod_key]
-        self._modules[mod_key].change_submod(callback_key, new_submod)
+        mod = self[mod_key]
+        new_submod = self[submod_key]
+        if self._graph.would_cycle(mod_key, submod_key):
+            raise RuntimeError("Calling %s from %s would create a cycle." %
+                               (submod_key, mod_key))
+        mod.change_submod(callback_key, new_submod)
+        self._graph.set_submod(mod_key, callback_key, submod_key)
+
+    def call_graph(self):
+        """Provides the index of which Module calls which.
+
+        The index is kept up to date as Modules are added, erased, renamed,
+        and rebound through the ModuleManager. It can be used to order the
+        Modules topologically, to find the Modules depending on a Module, and
+        to find shared submodules. See the CallGraph class for details.
+
+        :return: The call graph of the Modules in this ModuleManager.
+        :rtype: CallGraph
+        """
+
+        return self._graph
+
+    def snapshot(self):
+        """Describes the configuration of the ModuleManager.
+
+        The description records, for every module key, how to make the
+        Module (its factory), the inputs bound to it, and which Module is
+        bound to each of its callback points. Modules are described once (by
+        id, see ``registry.module_spec``) and keys refer to those
+        descriptions, so aliasing is preserved: keys holding the same Module,
+        and callback points bound to the same Module, still share one Module
+        after ``restore``. Lazily added Modules which have not been made are
+        recorded by their factories, without making them. Factories which
+        were given as callables are recorded by their import path (e.g.,
+        ``'package.module:make_module'``).
+
+        :return: A picklable description of the configuration.
+        :rtype: dict
+
+        :raises RuntimeError: If the factory of any of the Modules, including
+                              the lazily added ones, can not be determined.
+        """
+
+        modules = {}
+        describe_modules(self._modules.values(), modules)
+        return {'modules' : modules,
+                'keys' : {k : id(v) for k, v in self._modules.items()},
+                'lazy' : {k : self.__lazy_spec(k) for k in self._lazy}}
+
+    def restore(self, snapshot):
+        """Replaces the configuration with the one described by ``snapshot``.
+
+        The Modules are made and wired up in one pass, rather than by
+        replaying the ``add_module``, ``change_input``, and ``change_submod``
+        calls which made the configuration.
+
+        :param snapshot: A description made by ``snapshot``.
+        :type snapshot: dict
+        """
+
+        built = build_modules(snapshot['modules'])
+        self._modules = {k : built[v] for k, v in snapshot['keys'].items()}
+        self._lazy = dict(snapshot['lazy'])
+        self._graph = CallGraph()
+        for k, mod in self._modules.items():
+            self._graph.add(k, mod)
+            if self._scheduler != None:
+                mod.set_scheduler(self._scheduler)
+            if self._budget != None:
+                mod.set_memory_budget(self._budget)
+
+    def save(self, path):
+        """Writes the configuration (see ``snapshot``) to the file ``path``.
+
+        :param path: The file to write.
+        :type path: str
+        """
+
+        with open(path, 'wb') as f:
+            pickle.dump(self.snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        """Restores the configuration saved to the file ``path``.
+
+        :param path: A file written by ``save``.
+        :type path: str
+        """
+
+        with open(path, 'rb') as f:
+            self.restore(pickle.load(f))
+
+    def set_cache_policy(self, mod_key, policy='lru', max_entries=None,
+                         max_bytes=None, ttl=None):
+        """Configures the result cache of a Module.
+
+        This function makes it possible to bound the memory used by the
+        results a Module caches, by specifying the Module by key. It ultimately
+        just wraps getting the module and then calling ``set_cache_policy`` on
+        the Module.
+
+        :param mod_key: The key of the Module whose cache is being configured.
+        :type mod_key: str
+        :param policy: The eviction policy, one of ``'lru'``, ``'lfu'``, or
+                       ``'ttl'``.
+        :type policy: str
+        :param max_entries: Maximum number of cached results, or None.
+        :type max_entries: int
+        :param max_bytes: Maximum (estimated) bytes of cached results, or None.
+        :type max_bytes: int
+        :param ttl: Seconds before a cached result expires, or None.
+        :type ttl: float
+
+        :raises KeyError: If there is no Module under ``mod_key``.
+        :raises ValueError: If the policy is not valid.
+        """
+
+        self[mod_key].set_cache_policy(policy, max_entries, max_bytes, ttl)
+
+    def set_result_store(self, mod_key, store):
+        """Attaches a persistent result store to a Module.
+
+        This function wraps getting the module and then calling
+        ``set_result_store`` on the Module. The same store can be attached to
+        any number of Modules.
+
+        :param mod_key: The key of the Module the store is attached to.
+        :type mod_key: str
+        :param store: The store to attach, or None to detach the current one.
+        :type store: ResultStore
+
+        :raises KeyError: If there is no Module under ``mod_key``.
+        """
+
+        self[mod_key].set_result_store(store)
+
+    def set_scheduler(self, scheduler):
+        """Sets the Scheduler used by every Module in the ModuleManager.
+
+        The scheduler is given to all Modules currently in the ModuleManager,
+        as well as to any Modules added later. Callbacks can then submit their
+        submodule calls (see ``Module.submit_as``) and have independent calls
+        run concurrently.
+
+        :param scheduler: The scheduler to use, or None to run submitted calls
+                          immediately.
+        :type scheduler: Scheduler
+        """
+
+        self._scheduler = scheduler
+        for mod in self._modules.values():
+            mod.set_scheduler(scheduler)
+
+    def set_memory_budget(self, max_bytes):
+        """Bounds the bytes held by the cached results of all the Modules.
+
+        Per-Module limits (see ``set_cache_policy``) can not keep the total in
+        check when the results are spread over many Modules. This function
+        makes the caches of every Module in the ModuleManager (including
+        Modules added later) share one ``MemoryBudget``. Whenever their total
+        exceeds ``max_bytes``, results are evicted from whichever caches hold
+        the results which are cheapest to recompute per byte they occupy,
+        i.e., large results which were computed quickly go first. The cost of
+        a result is the time its callback took (submodule calls included).
+
+        Calling this function again replaces the budget. Results cached by
+        submodules which are not in the ModuleManager are not counted.
+
+        :param max_bytes: The maximum (estimated) bytes of cached results, or
+                          None to remove the budget.
+        :type max_bytes: int
+        """
+
+        self._budget = None if max_bytes == None else MemoryBudget(max_bytes)
+        for mod in self._modules.values():
+            mod.set_memory_budget(self._budget)
+
+    def memory_report(self):
+        """Estimates the memory held by the Modules.
+
+        For each Module the report lists the (estimated, see
+        ``cache.sizeof``) bytes of its bound inputs and of its cached results,
+        and the number of cached results. Modules which have not been made
+        yet (see ``add_lazy_module``) hold nothing and are not listed.
+
+        The totals count inputs and caches shared by several Modules (e.g.,
+        Modules registered under several keys, or copies made by
+        ``copy_module``) once, and include the budget set by
+        ``set_memory_budget`` (None if there is none).
+
+        :return: ``'modules'`` maps each module key to a dictionary with the
+                 keys ``'inputs'``, ``'cache'``, and ``'entries'``;
+                 ``'total'`` has the same keys, plus ``'budget'``.
+        :rtype: dict(str, dict)
+        """
+
+        rv = {}
+        total = {'inputs' : 0, 'cache' : 0, 'entries' : 0}
+        seen = set()
+        for k, mod in self._modules.items():
+            inputs = mod._state['inputs']
+            cache = mod._cache
+            rv[k] = {'inputs' : sizeof(inputs),
+                     'cache' : cache.nbytes(),
+                     'entries' : len(cache)}
+            if id(inputs) not in seen:
+                seen.add(id(inputs))
+                total['inputs'] += rv[k]['inputs']
+            if id(cache) not in seen:
+                seen.add(id(cache))
+                total['cache'] += rv[k]['cache']
+                total['entries'] += rv[k]['entries']
+        total['budget'] = None if self._budget == None else \
+                          self._budget.max_bytes()
+        return {'modules' : rv, 'total' : total}
 
     def run_as(self, prop_type, mod_key, *args):
         """Runs a module as the specified properyt type.
@@ -211,5 +599,241 @@ class ModuleManager:
 
         :raises KeyError: If ``mod_key`` is not a valid key.
         """
-        self.__assert_has_key(mod_key)
-        return self._modules[mod_key].run_as(prop_type, *args)
+        return self[mod_key].run_as(prop_type, *args)
+
+    def run_as_stream(self, prop_type, mod_key, *args, buffer=0):
+        r"""Runs a module as the specified property type, streaming results.
+
+        This function is a convenience function for grabbing a module and
+        calling its ``run_as_stream`` member.
+
+        :param prop_type: The PropertyType defining how the module should be
+                          run.
+        :type prop_type: PropertyType
+        :param mod_key: The key for the module to be run.
+        :type mod_key: str
+        :param \*args: The positional arguments the ``prop_type`` calls for.
+        :param buffer: How many chunks the module may produce ahead of the
+                       caller (see ``Module.run_stream``).
+        :type buffer: int
+
+        :return: An iterator over the results defined by ``prop_type``, one
+                 item per chunk the module yields.
+        :rtype: iterator
+
+        :raises KeyError: If ``mod_key`` is not a valid key.
+        """
+        return self[mod_key].run_as_stream(prop_type, *args, buffer=buffer)
+
+    def run_as_batch(self, prop_type, mod_key, batch):
+        """Runs a module as the specified property type for a batch of inputs.
+
+        This function is a convenience function for grabbing a module and
+        calling its ``run_as_batch`` member.
+
+        :param prop_type: The PropertyType defining how the module should be
+                          run.
+        :type prop_type: PropertyType
+        :param mod_key: The key for the module to be run.
+        :type mod_key: str
+        :param batch: Either a list of the positional arguments for each call,
+                      or a dictionary from input names to columns of values.
+        :type batch: list(tuple) or dict(str, sequence)
+
+        :return: The results defined by ``prop_type`` for each call.
+
+        :raises KeyError: If ``mod_key`` is not a valid key.
+        """
+        return self[mod_key].run_as_batch(prop_type, batch)
+
+    def submit_as(self, prop_type, mod_key, *args):
+        r"""Schedules a module to run as the specified property type.
+
+        This function is a convenience function for grabbing a module and
+        calling its ``submit_as`` member.
+
+        :param prop_type: The PropertyType defining how the module should be
+                          run.
+        :type prop_type: PropertyType
+        :param mod_key: The key for the module to be run.
+        :type mod_key: str
+        :param \*args: The positional arguments the ``prop_type`` calls for.
+
+        :return: A future for the results defined by ``prop_type``.
+        :rtype: concurrent.futures.Future
+
+        :raises KeyError: If ``mod_key`` is not a valid key.
+        """
+        return self[mod_key].submit_as(prop_type, *args)
+
+    async def run_as_async(self, prop_type, mod_key, *args):
+        r"""Runs a module as the specified property type from asyncio code.
+
+        This function is a convenience function for grabbing a module and
+        awaiting its ``run_as_async`` member.
+
+        :param prop_type: The PropertyType defining how the module should be
+                          run.
+        :type prop_type: PropertyType
+        :param mod_key: The key for the module to be run.
+        :type mod_key: str
+        :param \*args: The positional arguments the ``prop_type`` calls for.
+
+        :return: The results defined by ``prop_type``.
+
+        :raises KeyError: If ``mod_key`` is not a valid key.
+        """
+        return await self[mod_key].run_as_async(prop_type, *args)
+
+    def sweep(self, prop_type, mod_key, grid):
+        """Runs a module as the specified property type over a grid of values.
+
+        ``grid`` maps names to the values each should take. A name is either
+        an input of ``prop_type`` (a call-site argument) or an input bound to
+        the Module (a key which could be given to ``change_input``); the
+        latter are only changed for the sweep, not in the ModuleManager. The
+        Module is run for every combination of the values (the last name
+        varies fastest). Inputs of ``prop_type`` which are not in ``grid``
+        take their default values.
+
+        Points which bind the same inputs run on the same copy of the Module
+        (see ``Module.unlocked_copy``), or on the Module itself if no bound
+        input is swept. The copies call the same submodules, so submodule
+        results are computed once and shared by every point which makes the
+        same submodule call. The points are submitted to the Scheduler (see
+        ``set_scheduler``), so they run concurrently if it allows that.
+
+        :param prop_type: The PropertyType defining how the module should be
+                          run.
+        :type prop_type: PropertyType
+        :param mod_key: The key for the module to be run.
+        :type mod_key: str
+        :param grid: A map from each swept name to its values.
+        :type grid: dict(str, sequence)
+
+        :return: The swept values and the results, column-wise. ``'inputs'``
+                 maps each name in ``grid`` to its value at each point and
+                 ``'results'`` maps each result of ``prop_type`` to its value
+                 at each point.
+        :rtype: dict(str, dict(str, list))
+
+        :raises KeyError: If ``mod_key`` is not a valid key.
+        :raises KeyError: If a name in ``grid`` is neither an input of
+                          ``prop_type`` nor bound to the Module.
+        :raises RuntimeError: If the module does not satisfy ``prop_type``.
+        :raises RuntimeError: If an input of ``prop_type`` without a default
+                              value is not in ``grid``.
+        """
+
+        mod = self[mod_key]
+        if prop_type not in mod.property_types():
+            raise RuntimeError('Does not satisfy property type')
+
+        names = list(grid.keys())
+        pt_inputs = [k for k, _ in prop_type.inputs()]
+        for k in names:
+            if k not in pt_inputs and k not in mod._state['inputs']:
+                raise KeyError("%s is not an input of the module" % str(k))
+        for k, v in prop_type.inputs():
+            if v is None and k not in grid:
+                raise RuntimeError('No default argument for ' + k)
+        bound = [i for i, k in enumerate(names) if k not in pt_inputs]
+
+        points = list(itertools.product(*[range(len(grid[k])) for k in names]))
+        variants = {}
+        futures = []
+        for point in points:
+            values = {k : grid[k][i] for k, i in zip(names, point)}
+            variant_key = tuple(point[i] for i in bound)
+            if variant_key not in variants:
+                variant = mod
+                if len(bound):
+                    variant = mod.unlocked_copy()
+                    for i in bound:
+                        variant.change_input(names[i], values[names[i]])
+                variants[variant_key] = variant
+            args = [values.get(k, v) for k, v in prop_type.inputs()]
+            futures.append(variants[variant_key].submit_as(prop_type, *args))
+
+        result_names = prop_type.results()
+        rv = {'inputs' : {k : [grid[k][p[i]] for p in points]
+                          for i, k in enumerate(names)},
+              'results' : {k : [] for k in result_names}}
+        for future in futures:
+            results = future.result()
+            if len(result_names) == 1:
+                results = [results]
+            for k, v in zip(result_names, results):
+                rv['results'][k].append(v)
+        return rv
+
+    def stats(self):
+        """Collects the runtime statistics of every Module, by module key.
+
+        :return: A map from module key to the statistics of the Module stored
+                 under that key (see ``Module.stats``).
+        :rtype: dict(str, dict)
+        """
+
+        return {k : v.stats() for k, v in self._modules.items()}
+
+    def reset_stats(self):
+        """Forgets the runtime statistics of every Module."""
+
+        for mod in self._modules.values():
+            mod.reset_stats()
+
+    def profile(self):
+        """Summarizes where the time of the Modules' calls went.
+
+        The report lists the Modules which were called, starting from those
+        which are not bound as submodules of other Modules in the
+        ModuleManager, most expensive first. Beneath each Module its callback
+        points are nested, with the number of calls made at that point and the
+        time spent there, followed (recursively) by the breakdown of the
+        submodule bound to that point. Submodules which are not in the
+        ModuleManager are labeled by their callback point only.
+
+        :return: The human-readable report.
+        :rtype: str
+        """
+
+        keys = {id(v) : k for k, v in self._modules.items()}
+        stats = {k : v.stats() for k, v in self._modules.items()}
+        bound = set()
+        for mod in self._modules.values():
+            for v in mod._state['submods'].values():
+                if v != None:
+                    bound.add(id(v))
+
+        lines = []
+
+        def add_submods(mod, s, depth, path):
+            for cb_name, edge in sorted(s['submods'].items(),
+                                        key=lambda x: -x[1]['total_time']):
+                sub = None
+                for (name, _), v in mod._state['submods'].items():
+                    if name == cb_name:
+                        sub = v
+                key = keys.get(id(sub)) if sub != None else None
+                label = str(cb_name) if key == None else \
+                        '%s -> %s' % (cb_name, key)
+                lines.append('%s%s: calls=%d total=%.6fs' %
+                             ('  ' * depth, label, edge['calls'],
+                              edge['total_time']))
+                if sub != None and id(sub) not in path:
+                    add_submods(sub, sub.stats(), depth + 1,
+                                path | {id(sub)})
+
+        roots = [k for k, v in self._modules.items()
+                 if stats[k]['calls'] and id(v) not in bound]
+        for k in sorted(roots, key=lambda x: -stats[x]['total_time']):
+            s = stats[k]
+            lines.append('%s: calls=%d total=%.6fs self=%.6fs '
+                         'callback=%.6fs framework=%.6fs hits=%d misses=%d' %
+                         (k, s['calls'], s['total_time'], s['self_time'],
+                          s['callback_time'], s['framework_time'],
+                          s['cache_hits'], s['cache_misses']))
+            mod = self._modules[k]
+            add_submods(mod, s, 1, {id(mod)})
+        return '\n'.join(lines)
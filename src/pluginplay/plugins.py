@@ -0,0 +1,365 @@
+from .hashing import fingerprint
+from .registry import factory_name, make_module
+import copy
+import importlib.metadata
+import json
+import os
+
+# The entry point group plugin collections advertise their load_modules under
+ENTRY_POINT_GROUP = 'pluginplay.plugins'
+
+# Bumped whenever the layout of the manifest changes
+_MANIFEST_VERSION = 2
+
+# Map from entry point to the ModuleManager its plugin was loaded into (see
+# PluginFactory)
+_loaded = {}
+
+
+def default_cache_path():
+    """The file the plugin manifest is cached in by default.
+
+    :return: ``pluginplay/manifest.json`` inside ``$XDG_CACHE_HOME`` (or
+             ``~/.cache`` if that is not set).
+    :rtype: str
+    """
+
+    root = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'pluginplay', 'manifest.json')
+
+
+def _entry_points(group):
+    """Code factorization for the entry points in ``group``.
+
+    Reading the entry points only reads the metadata of the installed
+    distributions; none of their code is imported.
+    """
+
+    eps = importlib.metadata.entry_points()
+    if hasattr(eps, 'select'):
+        return list(eps.select(group=group))
+    return list(eps.get(group, []))
+
+
+def _signature(eps):
+    """Code factorization for fingerprinting the installed plugins.
+
+    The fingerprint changes whenever a plugin is added, removed, or the
+    distribution providing it changes version.
+    """
+
+    rv = []
+    for ep in eps:
+        dist = getattr(ep, 'dist', None)
+        rv.append((ep.name, ep.value,
+                   None if dist == None else dist.metadata['Name'],
+                   None if dist == None else dist.version))
+    return fingerprint(sorted(rv, key=repr))
+
+
+def _type_name(obj):
+    """Code factorization for the import path of the type of ``obj``."""
+
+    return type(obj).__module__ + ':' + type(obj).__qualname__
+
+
+def _same(lhs, rhs):
+    """Code factorization for whether two input values are the same."""
+
+    try:
+        return fingerprint(lhs) == fingerprint(rhs)
+    except TypeError:
+        return lhs is rhs
+
+
+def _configuration(mod, factory, keys):
+    """Code factorization for how a Module differs from a fresh one.
+
+    Plugins typically configure their Modules after making them (e.g., with
+    ``ModuleManager.change_input`` and ``ModuleManager.change_submod``).
+    Making the Module from its factory alone would lose that, so it is
+    recorded in the manifest.
+
+    :return: The bound inputs which differ from those of a Module fresh from
+             ``factory``, the keys of the Modules bound to callback points
+             (None for points which are unbound, but are bound in the fresh
+             Module), and the memoization flags. None if the configuration
+             can not be recorded (e.g., an input can not be written as JSON,
+             or a submodule is not under a key).
+    :rtype: dict
+    """
+
+    fresh = make_module(factory)
+    inputs = {}
+    for k, v in mod._state['inputs'].items():
+        if k not in fresh._state['inputs'] or \
+           not _same(v, fresh._state['inputs'][k]):
+            inputs[k] = v
+    try:
+        if json.loads(json.dumps(inputs)) != inputs:
+            return None
+    except (TypeError, ValueError):
+        return None
+
+    submods = {}
+    for k, v in mod._state['submods'].items():
+        fresh_v = fresh._state['submods'].get(k)
+        if v != None and id(v) in keys:
+            submods[k[0]] = keys[id(v)]
+        elif v == None and fresh_v != None:
+            submods[k[0]] = None
+        elif v != None and (fresh_v == None or v.state_fingerprint() == None
+                            or v.state_fingerprint() !=
+                            fresh_v.state_fingerprint()):
+            return None
+
+    return {'inputs' : inputs,
+            'submods' : submods,
+            'memoizable' : mod._is_memoizable,
+            'share_in_request' : mod._share_in_request}
+
+
+def describe_module(mod, keys=None):
+    """Summarizes a Module for the plugin manifest.
+
+    :param mod: The Module to describe.
+    :type mod: Module
+    :param keys: A map from the id of each Module of the plugin to its key,
+                 used to record which Modules are bound as submodules.
+    :type keys: dict(int, str)
+
+    :return: The property types the Module satisfies, its callback points
+             (with the property type each is called as), its description,
+             the name of its factory (None if it can not be rebuilt on its
+             own), and how it differs from a Module fresh from the factory
+             (None if that can not be recorded, see ``PluginModule``).
+             Property types are identified by import path.
+    :rtype: dict
+    """
+
+    try:
+        factory = factory_name(mod)
+    except RuntimeError:
+        factory = None
+    config = None
+    if factory != None:
+        config = _configuration(mod, factory, {} if keys == None else keys)
+    return {'property_types' : sorted(_type_name(pt) for pt in
+                                      mod._state['property_types']),
+            'submods' : sorted([cb_name, _type_name(pt)] for cb_name, pt in
+                               mod._state['submods'].keys()),
+            'description' : mod._state['description'],
+            'factory' : factory,
+            'config' : config}
+
+
+def _describe_plugin(ep):
+    """Code factorization for loading a plugin and describing its Modules."""
+
+    from .module_manager import ModuleManager
+
+    mm = ModuleManager()
+    ep.load()(mm)
+    keys = {}
+    for k in mm.keys():
+        keys.setdefault(id(mm[k]), k)
+    return {'entry_point' : ep.value,
+            'modules' : {k : describe_module(mm[k], keys) for k in mm.keys()}}
+
+
+def discover(group=ENTRY_POINT_GROUP, cache_path=None, refresh=False):
+    """Describes every installed plugin collection.
+
+    Plugin collections advertise themselves with an entry point in ``group``
+    whose object is their ``load_modules(mm)`` hook. For example, in the
+    plugin's ``pyproject.toml``:
+
+    .. code-block:: toml
+
+       [project.entry-points."pluginplay.plugins"]
+       geometry = "geometry:load_modules"
+
+    Describing the Modules requires importing the plugins, so the description
+    (the manifest) is cached at ``cache_path``. As long as the installed
+    plugins (and the versions of the distributions providing them) do not
+    change, the cached manifest is used and no plugin code is imported.
+
+    :param group: The entry point group to search.
+    :type group: str
+    :param cache_path: Where to cache the manifest. If None,
+                       ``default_cache_path()`` is used.
+    :type cache_path: str
+    :param refresh: If True the manifest is rebuilt even if it is current.
+    :type refresh: bool
+
+    :return: The manifest, a dictionary whose ``'plugins'`` member maps the
+             name of each plugin to its entry point (``'entry_point'``) and
+             the descriptions of its Modules by module key (``'modules'``,
+             see ``describe_module``).
+    :rtype: dict
+    """
+
+    if cache_path == None:
+        cache_path = default_cache_path()
+
+    eps = _entry_points(group)
+    signature = _signature(eps)
+    if not refresh:
+        try:
+            with open(cache_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == _MANIFEST_VERSION and \
+               manifest.get('group') == group and \
+               manifest.get('signature') == signature:
+                return manifest
+        except (OSError, ValueError):
+            pass
+
+    manifest = {'version' : _MANIFEST_VERSION,
+                'group' : group,
+                'signature' : signature,
+                'plugins' : {ep.name : _describe_plugin(ep) for ep in eps}}
+
+    # Failing to write the cache only costs time on the next start up
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)),
+                    exist_ok=True)
+        tmp = cache_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return manifest
+
+
+def find_modules(manifest, property_type=None):
+    """Lists the Modules in a manifest, optionally filtered by property type.
+
+    :param manifest: A manifest made by ``discover``.
+    :type manifest: dict
+    :param property_type: If given, only Modules satisfying it are listed.
+    :type property_type: PropertyType
+
+    :return: A map from module key to the name of the plugin providing it.
+    :rtype: dict(str, str)
+    """
+
+    pt_name = None if property_type == None else _type_name(property_type)
+    rv = {}
+    for plugin, desc in manifest['plugins'].items():
+        for key, mod in desc['modules'].items():
+            if pt_name == None or pt_name in mod['property_types']:
+                rv[key] = plugin
+    return rv
+
+
+class PluginModule:
+    """Makes a Module of a plugin from its factory and recorded configuration.
+
+    The Module is made by its factory and then given the bound inputs and
+    memoization flags its plugin gave it (see ``describe_module``). The
+    Modules bound to its callback points are identified by key, so they are
+    bound by the ModuleManager once the Module is added (see ``submods``).
+    """
+
+    def __init__(self, factory, config):
+        """Remembers how to make the Module.
+
+        :param factory: The name of the Module's factory.
+        :type factory: str
+        :param config: The configuration recorded in the manifest.
+        :type config: dict
+        """
+
+        self._factory = factory
+        self._config = config
+
+
+    def submods(self):
+        """The keys of the Modules to bind to the Module's callback points.
+
+        :return: A map from callback point to module key.
+        :rtype: dict(str, str)
+        """
+
+        return {k : v for k, v in self._config['submods'].items() if v != None}
+
+
+    def __call__(self):
+        mod = make_module(self._factory)
+        for k, v in self._config['inputs'].items():
+            mod.change_input(k, v)
+        for k, v in self._config['submods'].items():
+            if v == None:
+                mod.change_submod(k, None)
+        if not self._config['memoizable']:
+            mod.turn_off_memoization()
+        if not self._config['share_in_request']:
+            mod.turn_off_request_sharing()
+        return mod
+
+
+class PluginFactory:
+    """Makes one of the Modules of a plugin by loading the whole plugin.
+
+    Used for Modules whose factory (or configuration) could not be recorded
+    when the manifest was built (e.g., Modules whose callback is a plain
+    function). The plugin is loaded once per process, into a scratch
+    ModuleManager. Every Module made this way is an unlocked, deep copy of
+    the Module the plugin made, submodules included, so Modules made for
+    different ModuleManagers do not alias each other (or each other's
+    caches). Submodules which the plugin added under a key are instead bound
+    to the Module under that key by the ModuleManager (see ``submods``).
+    """
+
+    def __init__(self, entry_point, key):
+        """Remembers which plugin to load and which of its Modules to return.
+
+        :param entry_point: The value of the plugin's entry point (e.g.,
+                            ``'geometry:load_modules'``).
+        :type entry_point: str
+        :param key: The key the plugin adds the Module under.
+        :type key: str
+        """
+
+        self._entry_point = entry_point
+        self._key = key
+
+
+    def __plugin(self):
+        """Code factorization for the scratch ModuleManager of the plugin."""
+
+        from .module_manager import ModuleManager
+
+        mm = _loaded.get(self._entry_point)
+        if mm == None:
+            mm = ModuleManager()
+            ep = importlib.metadata.EntryPoint(None, self._entry_point, None)
+            ep.load()(mm)
+            _loaded[self._entry_point] = mm
+        return mm
+
+
+    def submods(self):
+        """The keys of the Modules to bind to the Module's callback points.
+
+        :return: A map from callback point to module key, for the callback
+                 points bound to Modules the plugin added under a key.
+        :rtype: dict(str, str)
+        """
+
+        mm = self.__plugin()
+        keys = {}
+        for k in mm.keys():
+            keys.setdefault(id(mm[k]), k)
+        rv = {}
+        for (cb_name, _), v in mm[self._key]._state['submods'].items():
+            if v is not None and id(v) in keys:
+                rv[cb_name] = keys[id(v)]
+        return rv
+
+
+    def __call__(self):
+        return copy.deepcopy(self.__plugin()[self._key]).unlocked_copy()
@@ -1,4 +1,89 @@
-class PropertyType:
+from operator import itemgetter
+import threading
+
+def _no_values(values):
+    """Unwraps an empty set of names (itemgetter needs at least one name)."""
+
+    return ()
+
+
+def _make_getter(names):
+    """Code factorization for the function pulling ``names`` out of a dict."""
+
+    return itemgetter(*names) if len(names) else _no_values
+
+
+def _make_wrapper(names, defaults):
+    """Generates a function which inserts positional arguments into a dict.
+
+    For ``names = ['a', 'b']`` and ``defaults = {'b' : 42}`` the generated
+    function is equivalent to:
+
+    .. code-block:: py
+
+       def wrap(values, a0, a1=42):
+           values['a'] = a0
+           values['b'] = a1
+
+    so marshalling the arguments is a straight-line sequence of stores, and
+    Python itself checks the number of arguments (raising TypeError).
+
+    :param names: The keys, in the order of the positional arguments.
+    :type names: list(str)
+    :param defaults: The default values of the trailing arguments which have
+                     one.
+    :type defaults: dict(str, obj)
+
+    :return: The generated function.
+    :rtype: callable
+    """
+
+    params = ['values']
+    body   = []
+    env    = {}
+    for i, k in enumerate(names):
+        env['k%d' % i] = k
+        if k in defaults:
+            env['d%d' % i] = defaults[k]
+            params.append('a%d=d%d' % (i, i))
+        else:
+            params.append('a%d' % i)
+        body.append('    values[k%d] = a%d' % (i, i))
+    if len(body) == 0:
+        body.append('    pass')
+    src = 'def wrap(%s):\n%s\n' % (', '.join(params), '\n'.join(body))
+    exec(src, env)
+    return env['wrap']
+
+
+class _Interned(type):
+    """Metaclass making each distinct PropertyType a singleton.
+
+    Property types are created all over the place (e.g.,
+    ``submods[('area', Area())].run_as(Area(), b, h)``). Calling a
+    PropertyType class returns the instance previously made with the same
+    arguments, so the instance (and its marshalling functions and hash) is
+    built once. Calls whose arguments are not hashable make a new instance.
+    """
+
+    _instances = {}
+    _lock      = threading.Lock()
+
+    def __call__(cls, *args, **kwargs):
+        try:
+            key = (cls, args, tuple(sorted(kwargs.items())))
+            rv  = _Interned._instances.get(key)
+        except TypeError:
+            return super().__call__(*args, **kwargs)
+
+        if rv == None:
+            new = super().__call__(*args, **kwargs)
+            with _Interned._lock:
+                rv = _Interned._instances.setdefault(key, new)
+        return rv
+
+
+class PropertyType(metaclass=_Interned):
     """Defines an effective function API for calling a Module.
 
     All Module instances actually are invoked like:
@@ -36,10 +121,16 @@ class PropertyType:
                 return super().__init__(inputs, results)
 
     If applicable the ``None`` values could be replaced with default values.
+
+    Marshalling arguments happens (at least) twice per Module call, so the
+    functions which do it are built once, when the instance is created.
+    Furthermore, instances are interned: ``PTClass() is PTClass()``.
+    Consequently, the inputs and results must not be modified after the ctor.
     """
 
     def __init__(self, inputs = [], results = []):
-        """Simply sets the state to the provided inputs and results."""
+        """Sets the state to the provided inputs and results and builds the
+        functions used to marshal arguments."""
 
         # A list of pairs, 0-th element is name, 1-st is defaul value
         self._inputs = inputs
@@ -47,6 +138,53 @@ class PropertyType:
         # A list of result names
         self._results = results
 
+        self.__compile()
+
+
+    def __compile(self):
+        """Code factorization for building the marshalling functions.
+
+        The wrap functions are generated once per instance (see
+        ``_make_wrapper``). An input may only be omitted if it, and every
+        input after it, has a default, so only the inputs after the last
+        input without a default get defaults in the generated function. The
+        unwrap functions use an ``itemgetter`` over the names (which returns a
+        bare value for one name and a tuple otherwise).
+        """
+
+        names = [k for k, _ in self._inputs]
+        defaults = {}
+        for k, v in reversed(self._inputs):
+            if v is None:
+                break
+            defaults[k] = v
+
+        self._hash          = None
+        self._n_inputs      = len(names)
+        self._n_results     = len(self._results)
+        self._wrap_inputs   = _make_wrapper(names, defaults)
+        self._wrap_results  = _make_wrapper(self._results, {})
+        self._input_getter  = _make_getter(names)
+        self._result_getter = _make_getter(self._results)
+
+
+    def __getstate__(self):
+        # The generated functions can not be pickled, they are rebuilt instead
+        state = dict(self.__dict__)
+        del state['_wrap_inputs']
+        del state['_wrap_results']
+        return state
+
+
+    def __deepcopy__(self, memo):
+        # Property types are immutable singletons
+        return self
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__compile()
+
 
     def inputs(self):
         """Returns the inputs that the derived class set.
@@ -111,21 +249,17 @@ class PropertyType:
         :raises RuntimeError: If the user does not set a value for all
                               positional arguments without default values.
         """
-        max_nargs = len(self.inputs())
-        if len(args) > max_nargs:
-            raise RuntimeError("Expected at most %s arguments." % max_nargs)
-
-        # We were provided arguments for the first len(args) positional args
-        for i in range(len(args)):
-            inputs[self._inputs[i][0]] = args[i]
-
-        # Remaining max_nargs - len(args) args are default initialized
-        for i in range(len(args), max_nargs):
-            k, v = self._inputs[i]
-            if v == None:
-                raise RuntimeError('No default argument for ' + k)
-
-            inputs[k] = v
+        try:
+            self._wrap_inputs(inputs, *args)
+        except TypeError:
+            max_nargs = self._n_inputs
+            if len(args) > max_nargs:
+                raise RuntimeError("Expected at most %s arguments." %
+                                   max_nargs)
+            for k, v in self._inputs[len(args):]:
+                if v is None:
+                    raise RuntimeError('No default argument for ' + k)
+            raise
 
 
     def wrap_results(self, results, *args):
@@ -153,12 +287,13 @@ class PropertyType:
         :raises RuntimeError: If the user passes a different number of results
                               than the derived class defined.
         """
-        max_nargs = len(self._results)
-        if len(args) != max_nargs:
-            raise RuntimeError("Expected exactly %s argument(s)" % max_nargs)
-
-        for k, v in zip(self._results, args):
-            results[k] = v
+        try:
+            self._wrap_results(results, *args)
+        except TypeError:
+            if len(args) != self._n_results:
+                raise RuntimeError("Expected exactly %s argument(s)" %
+                                   self._n_results)
+            raise
 
 
     def unwrap_inputs(self, inputs):
@@ -180,14 +315,11 @@ class PropertyType:
         :raises KeyError: If one of the inputs known to this property type is
                           not in ``inputs``.
         """
-        rv = []
-        for k, _ in self._inputs:
-            if k not in inputs:
-                raise KeyError(k + " is not in the inputs to parse.")
-            rv.append(inputs[k])
-        if len(rv) == 1:
-            return rv[0]
-        return rv
+        try:
+            rv = self._input_getter(inputs)
+        except KeyError as e:
+            raise KeyError(str(e.args[0]) + " is not in the inputs to parse.")
+        return rv if self._n_inputs == 1 else list(rv)
 
 
     def unwrap_results(self, results):
@@ -208,23 +340,20 @@ class PropertyType:
         :raises KeyError: If one of the results known to this property type is
                           not in ``results``.
         """
-        rv = []
-        for k in self._results:
-            if not k in results:
-                raise KeyError(k + " is not in the results to parse.")
-            rv.append(results[k])
-        if len(rv) == 1:
-            return rv[0]
-        return rv
+        try:
+            rv = self._result_getter(results)
+        except KeyError as e:
+            raise KeyError(str(e.args[0]) + " is not in the results to parse.")
+        return rv if self._n_results == 1 else list(rv)
 
 
     def __eq__(self, rhs):
         """Determines if two PropertyTypes are equivalent.
 
-        For the purposes of this mock up, two PropertyType instances are equal
-        if they define the same set of inputs (with the same default values) and
-        the same set of results. In practice the real comparison is polymorphic
-        and also requires that the derived classes have the same type.
+        Two PropertyType instances are equal if they are of the same type and
+        they define the same set of inputs (with the same default values) and
+        the same set of results. Since instances are interned, comparisons
+        are usually between an instance and itself, which is checked first.
 
         :param rhs: The instance we are comparing to.
         :type rhs: PropertyType
@@ -233,7 +362,14 @@ class PropertyType:
                  otherwise.
         :rtype: bool
         """
-        return self._inputs == rhs._inputs and self._results == rhs._results
+        if self is rhs:
+            return True
+        return type(self) is type(rhs) and self._inputs == rhs._inputs and \
+               self._results == rhs._results
 
     def __hash__(self):
-        return hash((tuple(self._inputs), tuple(self._results)))
+        # Computed on first use, so unhashable defaults only matter if hashed
+        if self._hash == None:
+            self._hash = hash((type(self), tuple(self._inputs),
+                               tuple(self._results)))
+        return self._hash
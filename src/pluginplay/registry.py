@@ -0,0 +1,195 @@
+import importlib
+
+# Map from factory name to the callable which makes the Module
+_factories = {}
+
+def register_factory(name, factory):
+    """Registers a callable which makes a Module under the name ``name``.
+
+    Module callbacks are typically closures created in the Module's ``__init__``
+    (see the geometry example), which means Modules can not be pickled and
+    sent to other processes. Instead, a Module is described by the name of the
+    factory which made it plus its configuration (see ``module_spec``), and
+    rebuilt from that description (see ``build_module``).
+
+    Modules which are instances of an importable subclass of Module, whose ctor
+    takes no arguments, do not need to be registered; their factory is the
+    class itself. This function is for all other Modules. Modules made by the
+    factory must record the name (i.e., set ``Module._factory``), which
+    ``make_module`` does automatically.
+
+    :param name: The name to register ``factory`` under.
+    :type name: str
+    :param factory: A callable which takes no arguments and returns a Module.
+    :type factory: callable
+    """
+
+    _factories[name] = factory
+
+
+def resolve_factory(name):
+    """Finds the callable registered (or importable) as ``name``.
+
+    Names are first looked up among the factories added with
+    ``register_factory``. Otherwise the name is treated as an import path of
+    the form ``'package.module:QualifiedName'``.
+
+    :param name: The name of the factory.
+    :type name: str
+
+    :return: The factory.
+    :rtype: callable
+
+    :raises KeyError: If ``name`` is not registered and is not an import path.
+    :raises ImportError: If the module in the import path can not be imported.
+    :raises AttributeError: If the module does not contain the named object.
+    """
+
+    if name in _factories:
+        return _factories[name]
+    if ':' not in name:
+        raise KeyError("No factory registered as: %s." % name)
+
+    mod_name, qual_name = name.split(':', 1)
+    rv = importlib.import_module(mod_name)
+    for attr in qual_name.split('.'):
+        rv = getattr(rv, attr)
+    return rv
+
+
+def make_module(name):
+    """Makes a Module by calling the factory ``name``.
+
+    :param name: The name of the factory (see ``resolve_factory``).
+    :type name: str
+
+    :return: The newly made Module, which remembers the factory which made it.
+    :rtype: Module
+    """
+
+    mod = resolve_factory(name)()
+    mod._factory = name
+    return mod
+
+
+def factory_name(mod):
+    """Determines the name of the factory which can rebuild ``mod``.
+
+    :param mod: The Module whose factory is wanted.
+    :type mod: Module
+
+    :return: The name of the factory.
+    :rtype: str
+
+    :raises RuntimeError: If the factory of ``mod`` can not be determined.
+    """
+
+    if mod._factory != None:
+        return mod._factory
+
+    cls = type(mod)
+    if '<locals>' in cls.__qualname__ or cls.__module__ == 'pluginplay.module':
+        raise RuntimeError("Can not determine how to rebuild the Module. "
+                           "Register a factory for it.")
+    return cls.__module__ + ':' + cls.__qualname__
+
+
+def describe_modules(mods, modules):
+    """Describes Modules, and the Modules they call, by id.
+
+    This is the workhorse of ``module_spec``. Modules which are already in
+    ``modules`` are not described again, so calling this function repeatedly
+    with the same ``modules`` describes every Module once.
+
+    :param mods: The Modules to describe.
+    :type mods: iterable(Module)
+    :param modules: The map from id to description to add the descriptions
+                    to (see ``module_spec``). Modified by this function.
+    :type modules: dict
+
+    :raises RuntimeError: If the factory of any of the Modules can not be
+                          determined.
+    """
+
+    stack = list(mods)
+    while len(stack):
+        m = stack.pop()
+        if id(m) in modules:
+            continue
+        submods = {}
+        for (cb_name, _), v in m._state['submods'].items():
+            submods[cb_name] = None if v == None else id(v)
+            if v != None:
+                stack.append(v)
+        modules[id(m)] = {'factory' : factory_name(m),
+                          'inputs' : dict(m._state['inputs']),
+                          'memoizable' : m._is_memoizable,
+                          'share_in_request' : m._share_in_request,
+                          'submods' : submods}
+
+
+def module_spec(mod):
+    """Describes a Module (and its submodules) without pickling callbacks.
+
+    The description is a dictionary with two keys: ``'root'`` is the id of the
+    top Module and ``'modules'`` maps ids to descriptions of individual
+    Modules. Each of those describes the factory, the bound inputs, whether
+    the Module is memoizable (and shares results within a request), and the
+    ids of the submodules bound to each callback point (None if nothing is
+    bound). Describing submodules by id preserves aliasing: a Module bound to
+    several callback points is rebuilt once and bound to all of them.
+
+    :param mod: The Module to describe.
+    :type mod: Module
+
+    :return: A picklable description of ``mod``.
+    :rtype: dict
+
+    :raises RuntimeError: If the factory of any of the Modules can not be
+                          determined.
+    """
+
+    modules = {}
+    describe_modules([mod], modules)
+    return {'root' : id(mod), 'modules' : modules}
+
+
+def build_modules(modules):
+    """Rebuilds every Module described in ``modules``.
+
+    This is the workhorse of ``build_module``. Each Module is made once and
+    then bound to all of the callback points which call it.
+
+    :param modules: A map from id to description, as made by
+                    ``describe_modules``.
+    :type modules: dict
+
+    :return: A map from id to the rebuilt Module.
+    :rtype: dict
+    """
+
+    built = {k : make_module(v['factory']) for k, v in modules.items()}
+    for k, v in modules.items():
+        mod = built[k]
+        mod._state['inputs'].update(v['inputs'])
+        mod._is_memoizable = v['memoizable']
+        mod._share_in_request = v['share_in_request']
+        for (cb_name, pt) in list(mod._state['submods'].keys()):
+            sub_id = v['submods'].get(cb_name)
+            mod._state['submods'][(cb_name, pt)] = \
+                None if sub_id == None else built[sub_id]
+    return built
+
+
+def build_module(spec):
+    """Rebuilds the Module described by ``spec``.
+
+    :param spec: A description made by ``module_spec``.
+    :type spec: dict
+
+    :return: A Module with the same configuration as the described one.
+    :rtype: Module
+    """
+
+    built = build_modules(spec['modules'])
+    return built[spec['root']]
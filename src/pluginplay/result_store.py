@@ -0,0 +1,161 @@
+import pickle
+import sqlite3
+import threading
+
+class ResultStore:
+    """A persistent, on-disk map from fingerprints to results.
+
+    The Cache of a Module lives in memory and is lost when the process ends.
+    The ResultStore is an optional second tier which sits behind the Cache.
+    Results are keyed by a stable fingerprint of the Module's state and the
+    inputs of the call (see ``Module.set_result_store``), which means a
+    process started later (even on another node sharing the file) can reuse
+    results computed by an earlier process.
+
+    Under the hood the results are pickled into a SQLite database. A single
+    ResultStore instance may be shared by many Modules and used from multiple
+    threads. Copying a Module (with ``Module.unlocked_copy`` or
+    ``copy.deepcopy``) does not copy the store it is attached to; the copy
+    refers to the same store.
+    """
+
+    def __init__(self, path):
+        """Opens (creating it if needed) the store at ``path``.
+
+        :param path: The path to the database file. ``':memory:'`` may be used
+                     for a non-persistent store (mainly useful for testing).
+        :type path: str
+        """
+
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS results '
+                               '(key TEXT PRIMARY KEY, value BLOB)')
+
+
+    def path(self):
+        """The path to the database backing this store.
+
+        :return: The path the store was opened with.
+        :rtype: str
+        """
+
+        return self._path
+
+
+    def __contains__(self, key):
+        """Determines if results are stored under ``key``.
+
+        :param key: The fingerprint to look for.
+        :type key: str
+
+        :return: True if there are results under ``key`` and False otherwise.
+        :rtype: bool
+        """
+
+        with self._lock:
+            cur = self._conn.execute('SELECT 1 FROM results WHERE key = ?',
+                                     (key,))
+            return cur.fetchone() != None
+
+
+    def __getitem__(self, key):
+        """Retrieves the results stored under ``key``.
+
+        :param key: The fingerprint of the results.
+        :type key: str
+
+        :return: The (unpickled) results.
+
+        :raises KeyError: If there are no results stored under ``key``.
+        """
+
+        row = self.__fetch(key)
+        if row == None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+
+    def get(self, key, default=None):
+        """Retrieves the results stored under ``key``, if any.
+
+        Unlike checking ``key in store`` and then reading ``store[key]``, this
+        is a single query, so results which are removed in between (e.g., by
+        another process sharing the file) can not cause a KeyError.
+
+        :param key: The fingerprint of the results.
+        :type key: str
+        :param default: What to return if there are no results under ``key``.
+
+        :return: The (unpickled) results, or ``default``.
+        """
+
+        row = self.__fetch(key)
+        return default if row == None else pickle.loads(row[0])
+
+
+    def __fetch(self, key):
+        """Code factorization for reading the row stored under ``key``."""
+
+        with self._lock:
+            cur = self._conn.execute('SELECT value FROM results WHERE key = ?',
+                                     (key,))
+            return cur.fetchone()
+
+
+    def __setitem__(self, key, value):
+        """Stores ``value`` under ``key``, overwriting any existing value.
+
+        :param key: The fingerprint to store the results under.
+        :type key: str
+        :param value: The results to store. Must be picklable.
+        """
+
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?)',
+                               (key, blob))
+
+
+    def __delitem__(self, key):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM results WHERE key = ?', (key,))
+
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results')\
+                             .fetchone()[0]
+
+
+    def clear(self):
+        """Removes every result from the store."""
+
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM results')
+
+
+    def close(self):
+        """Closes the connection to the database."""
+
+        self._conn.close()
+
+
+    def __deepcopy__(self, memo):
+        # Deep copies of a Module (e.g., those made by plugins.PluginFactory)
+        # share the store it is attached to
+        return self
+
+
+    def __getstate__(self):
+        return {'path' : self._path}
+
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+    def __repr__(self):
+        return 'ResultStore(%s)' % self._path
@@ -0,0 +1,317 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from .cache import Cache
+from .hashing import fingerprint
+from .registry import build_module, module_spec
+from . import transport
+import contextvars
+import threading
+
+class _Task:
+    """A unit of work which runs exactly once, in a worker or in the caller.
+
+    If the thread pool is saturated with callbacks which are waiting on their
+    submodules, the submodule calls would never get a worker and the program
+    would deadlock. To avoid this, a caller which asks for the result of a
+    task that has not started yet runs the task itself.
+    """
+
+    def __init__(self, fxn, args):
+        self._fxn     = fxn
+        self._args    = args
+        self._context = contextvars.copy_context()
+        self._claimed = False
+        self._lock    = threading.Lock()
+        self.future   = _Future(self)
+
+
+    def run(self):
+        """Runs the task, unless it has already been claimed by some thread."""
+
+        with self._lock:
+            if self._claimed:
+                return
+            self._claimed = True
+
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            rv = self._context.run(self._fxn, *self._args)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(rv)
+
+
+class _Future(Future):
+    """A Future which runs its task in the caller if it has not started."""
+
+    def __init__(self, task):
+        super().__init__()
+        self._task = task
+
+
+    def result(self, timeout=None):
+        self._task.run()
+        return super().result(timeout)
+
+
+    def exception(self, timeout=None):
+        self._task.run()
+        return super().exception(timeout)
+
+
+def completed_future(fxn, *args):
+    r"""Runs ``fxn(*args)`` immediately and wraps the outcome in a Future.
+
+    This is used when no scheduler is available, so that callers can use the
+    same future-based code path regardless of whether calls actually run
+    concurrently.
+
+    :param fxn: The function to call.
+    :type fxn: callable
+    :param \*args: The arguments to call ``fxn`` with.
+
+    :return: A completed future holding the return of (or the exception raised
+             by) ``fxn``.
+    :rtype: concurrent.futures.Future
+    """
+
+    rv = Future()
+    try:
+        rv.set_result(fxn(*args))
+    except BaseException as e:
+        rv.set_exception(e)
+    return rv
+
+
+class Scheduler:
+    """Runs Module calls concurrently on a pool of threads.
+
+    Callbacks normally call their submodules one after another. When several
+    of those calls are independent of each other, a callback can instead
+    submit them (via ``Module.submit_as``) and only wait on the results once
+    it needs them:
+
+    .. code-block:: python
+
+       def fxn(inputs, submods):
+           f0 = submods[('area 0', Area())].submit_as(Area(), b0, h0)
+           f1 = submods[('area 1', Area())].submit_as(Area(), b1, h1)
+           return {'area' : f0.result() + f1.result()}
+
+    Submitted calls run on the Scheduler's threads, so independent branches of
+    the call graph run at the same time. This pays off for submodules which
+    release the GIL (e.g., NumPy or I/O heavy ones). Waiting on a call which
+    has not started yet runs it in the waiting thread, so nested submissions
+    can not deadlock the pool.
+
+    Schedulers are attached to Modules with ``Module.set_scheduler`` or, for
+    every Module in a ModuleManager, with ``ModuleManager.set_scheduler``.
+    Copies of a Module share its Scheduler.
+    """
+
+    def __init__(self, max_workers=None):
+        """Creates a Scheduler backed by a thread pool.
+
+        :param max_workers: The maximum number of threads. If None, the
+                            default of ``concurrent.futures.ThreadPoolExecutor``
+                            is used.
+        :type max_workers: int
+        """
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+
+    def submit(self, fxn, *args):
+        r"""Schedules ``fxn(*args)`` to be run.
+
+        The call runs in the context (in the sense of ``contextvars``) of the
+        caller.
+
+        :param fxn: The function to call.
+        :type fxn: callable
+        :param \*args: The arguments to call ``fxn`` with.
+
+        :return: A future for the return of ``fxn``.
+        :rtype: concurrent.futures.Future
+        """
+
+        task = _Task(fxn, args)
+        self._executor.submit(task.run)
+        return task.future
+
+
+    def submit_as(self, mod, prop_type, *args):
+        r"""Schedules ``mod.run_as(prop_type, *args)`` to be run.
+
+        :param mod: The Module to run.
+        :type mod: Module
+        :param prop_type: The PropertyType to run ``mod`` as.
+        :type prop_type: PropertyType
+        :param \*args: The positional arguments for ``prop_type``.
+
+        :return: A future for the result(s) of the call.
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(mod.run_as, prop_type, *args)
+
+
+    def shutdown(self, wait=True):
+        """Releases the threads of the Scheduler.
+
+        :param wait: Whether to wait for pending calls to finish.
+        :type wait: bool
+        """
+
+        self._executor.shutdown(wait=wait)
+
+
+    def __deepcopy__(self, memo):
+        # Deep copies of a Module (e.g., those made by plugins.PluginFactory)
+        # share the Scheduler it is attached to
+        return self
+
+
+# Modules rebuilt by this (worker) process, keyed by the fingerprint of the
+# spec. Only the most recently used configurations are kept.
+_worker_modules = Cache(max_entries=64)
+
+def _run_spec(spec, prop_type, args, key=None, min_bytes=None):
+    """Runs the Module described by ``spec`` in a worker process.
+
+    Recently rebuilt Modules are kept around, so that repeated calls to the
+    same configuration reuse the Module (and its cache). ``key`` is the
+    fingerprint of the spec, if the parent computed it. If ``min_bytes`` is
+    not None, large buffers in the results are handed to the parent through
+    shared memory (see the ``transport`` module).
+    """
+
+    if key == None:
+        try:
+            key = fingerprint(spec)
+        except TypeError:
+            key = None
+
+    mod = _worker_modules.get(key) if key != None else None
+    if mod == None:
+        mod = build_module(spec)
+        if key != None:
+            _worker_modules[key] = mod
+    rv = mod.run_as(prop_type, *args)
+    if min_bytes == None:
+        return rv
+    return transport.share(rv, min_bytes, transfer=True)
+
+
+class ProcessScheduler(Scheduler):
+    """Runs Module calls on a pool of worker processes.
+
+    Pure-Python callbacks do not run concurrently on threads because of the
+    GIL. The ProcessScheduler runs submitted calls in other processes instead.
+    Since callbacks are usually closures, Modules can not be pickled. Instead,
+    the Module's configuration (the factories which made it and its
+    submodules, the bound inputs, and the submodule bindings) is described
+    with ``registry.module_spec`` and the worker rebuilds the Module with
+    ``registry.build_module``. Hence every Module run this way must be
+    rebuildable (see ``registry.register_factory``). The arguments and the
+    results of the calls must be picklable.
+
+    Each worker keeps the Modules it rebuilt most recently, so repeated calls
+    with the same configuration benefit from the worker's cache. The parent's
+    cache is not consulted or updated by these calls.
+
+    Large NumPy arrays and memory views, whether bound inputs, arguments, or
+    results, are not pickled. They are placed in shared memory and only
+    their descriptions are sent (see the ``transport`` module), so the
+    parent and the workers see the same bytes. Buffers allocated with
+    ``transport.empty`` (and results received from a worker) are never
+    copied. Other bound inputs are copied into shared memory once (the
+    Module is locked, so they can not be rebound), and other arguments are
+    copied at every call, so changes made to them between calls are seen.
+
+    The ProcessScheduler is opt-in: attach it to the CPU-bound Modules (with
+    ``Module.set_scheduler``), and have their callers use ``submit_as``.
+    """
+
+    def __init__(self, max_workers=None, mp_context=None,
+                 min_shared_bytes=transport.DEFAULT_MIN_BYTES):
+        """Creates a Scheduler backed by a process pool.
+
+        :param max_workers: The maximum number of processes. If None, the
+                            number of processors on the machine is used.
+        :type max_workers: int
+        :param mp_context: The multiprocessing context used to start the
+                           workers. If None, the default context is used.
+        :param min_shared_bytes: Buffers of at least this many bytes are sent
+                                 through shared memory. None pickles
+                                 everything.
+        :type min_shared_bytes: int
+        """
+
+        self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=mp_context)
+        self._min_bytes = min_shared_bytes
+
+        # What each pending call needs kept alive (future to references)
+        self._pending = {}
+
+
+    def submit(self, fxn, *args):
+        r"""Schedules ``fxn(*args)`` to run in a worker process.
+
+        :param fxn: The function to call. Must be picklable.
+        :type fxn: callable
+        :param \*args: The arguments to call ``fxn`` with. Must be picklable.
+
+        :return: A future for the return of ``fxn``.
+        :rtype: concurrent.futures.Future
+        """
+
+        return self._executor.submit(fxn, *args)
+
+
+    def submit_as(self, mod, prop_type, *args):
+        r"""Schedules ``mod.run_as(prop_type, *args)`` to run in a worker.
+
+        ``mod`` is locked before its configuration is shipped, so that the
+        configuration which runs is the one which was submitted.
+
+        :param mod: The Module to run.
+        :type mod: Module
+        :param prop_type: The PropertyType to run ``mod`` as.
+        :type prop_type: PropertyType
+        :param \*args: The positional arguments for ``prop_type``.
+
+        :return: A future for the result(s) of the call.
+        :rtype: concurrent.futures.Future
+
+        :raises RuntimeError: If any submodule of ``mod`` is not ready.
+        :raises RuntimeError: If ``mod`` (or one of its submodules) can not be
+                              rebuilt in another process.
+        """
+
+        mod.lock()
+        spec = module_spec(mod)
+        sent = args
+        if self._min_bytes != None:
+            spec = transport.share(spec, self._min_bytes, cache=True)
+            sent = transport.share(args, self._min_bytes)
+        try:
+            key = fingerprint(spec)
+        except TypeError:
+            key = None
+        future = self._executor.submit(_run_spec, spec, prop_type, sent, key,
+                                       self._min_bytes)
+
+        # The Module and the arguments (whose buffers may be shared) must
+        # outlive the call
+        self._pending[future] = (mod, args)
+        future.add_done_callback(self.__release)
+        return future
+
+
+    def __release(self, future):
+        """Code factorization for dropping what a finished call kept alive."""
+
+        self._pending.pop(future, None)
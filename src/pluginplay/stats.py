@@ -0,0 +1,179 @@
+import contextvars
+import threading
+import time
+
+# The call currently being run (in this thread or asyncio task)
+_current_call = contextvars.ContextVar('pluginplay_current_call', default=None)
+
+
+class _Call:
+    """Bookkeeping for a single, in progress call to a Module."""
+
+    __slots__ = ('module', 'parent', 'start', 'child_time', 'callback_time',
+                 'hit')
+
+    def __init__(self, module, parent):
+        self.module        = module
+        self.parent        = parent
+        self.start         = time.perf_counter()
+        self.child_time    = 0.0
+        self.callback_time = 0.0
+        self.hit           = False
+
+
+def begin_call(module):
+    """Records that ``module`` has started running.
+
+    :param module: The Module which is starting.
+    :type module: Module
+
+    :return: The bookkeeping for the call and the token needed to end it.
+    :rtype: (_Call, contextvars.Token)
+    """
+
+    call = _Call(module, _current_call.get())
+    return call, _current_call.set(call)
+
+
+def end_call(call, token, ncalls=1):
+    """Records that the call started by ``begin_call`` has finished.
+
+    The elapsed time is added to the statistics of the Module which made the
+    call and, if the call was made from another Module's callback, to that
+    Module's time spent in submodules.
+
+    :param call: The bookkeeping returned by ``begin_call``.
+    :type call: _Call
+    :param token: The token returned by ``begin_call``.
+    :type token: contextvars.Token
+    :param ncalls: How many calls the bookkeeping stands for (more than one
+                   for batches).
+    :type ncalls: int
+    """
+
+    elapsed = time.perf_counter() - call.start
+    _current_call.reset(token)
+    call.module._stats.record(call, elapsed, ncalls)
+
+    parent = call.parent
+    if parent != None:
+        parent.child_time += elapsed
+        cb_name = None
+        for (name, _), v in parent.module._state['submods'].items():
+            if v is call.module:
+                cb_name = name
+                break
+        parent.module._stats.record_child(cb_name, elapsed, ncalls)
+
+
+class ModuleStats:
+    """Runtime statistics collected by a Module.
+
+    Every Module counts how often it is called, how often calls are answered
+    from its cache (or ResultStore), and where the time of its calls goes:
+
+    - *total time* is the wall time of all calls,
+    - *self time* excludes time spent waiting on submodules,
+    - *callback time* is the time spent in the callback (including
+      submodules), and
+    - *framework time* is the rest (validation, input merging, memoization).
+
+    The time spent in submodules is also broken down by callback point. Times
+    are cumulative, so with concurrent calls they can exceed the elapsed wall
+    time.
+    """
+
+    def __init__(self):
+        """Creates statistics for a Module which has not been called yet."""
+
+        self._lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """Forgets all of the statistics collected so far."""
+
+        with self._lock:
+            self._calls         = 0
+            self._hits          = 0
+            self._misses        = 0
+            self._total_time    = 0.0
+            self._child_time    = 0.0
+            self._callback_time = 0.0
+            self._children      = {}
+
+
+    def record(self, call, elapsed, ncalls=1):
+        """Adds a finished call to the statistics.
+
+        :param call: The bookkeeping for the call.
+        :type call: _Call
+        :param elapsed: The wall time of the call in seconds.
+        :type elapsed: float
+        :param ncalls: How many calls the bookkeeping stands for.
+        :type ncalls: int
+        """
+
+        with self._lock:
+            self._calls         += ncalls
+            self._total_time    += elapsed
+            self._child_time    += call.child_time
+            self._callback_time += call.callback_time
+            if call.hit:
+                self._hits += ncalls
+            else:
+                self._misses += ncalls
+
+
+    def record_child(self, cb_name, elapsed, ncalls=1):
+        """Adds a finished submodule call to the statistics.
+
+        :param cb_name: The callback point the submodule is bound to (None if
+                        the submodule is not bound to this Module).
+        :type cb_name: str
+        :param elapsed: The wall time of the submodule call in seconds.
+        :type elapsed: float
+        :param ncalls: How many calls were made.
+        :type ncalls: int
+        """
+
+        with self._lock:
+            child = self._children.setdefault(cb_name, {'calls' : 0,
+                                                        'total_time' : 0.0})
+            child['calls']      += ncalls
+            child['total_time'] += elapsed
+
+
+    def as_dict(self):
+        """Returns a snapshot of the statistics.
+
+        :return: The statistics, keyed by ``'calls'``, ``'cache_hits'``,
+                 ``'cache_misses'``, ``'total_time'``, ``'self_time'``,
+                 ``'callback_time'``, ``'framework_time'``, and
+                 ``'submods'`` (a map from callback point to the number of
+                 calls and total time spent there).
+        :rtype: dict
+        """
+
+        with self._lock:
+            return {'calls' : self._calls,
+                    'cache_hits' : self._hits,
+                    'cache_misses' : self._misses,
+                    'total_time' : self._total_time,
+                    'self_time' : self._total_time - self._child_time,
+                    'callback_time' : self._callback_time,
+                    'framework_time' : self._total_time - self._callback_time,
+                    'submods' : {k : dict(v)
+                                 for k, v in self._children.items()}}
+
+
+    def __getstate__(self):
+        # Locks can not be copied or pickled, so a fresh one is made
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
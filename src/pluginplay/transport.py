@@ -0,0 +1,302 @@
+from .hashing import register_hasher
+import mmap
+import os
+import tempfile
+import threading
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Buffers smaller than this are pickled as usual
+DEFAULT_MIN_BYTES = 1 << 20
+
+_lock = threading.Lock()
+
+# Map from each mapping made by this process to [path, finalizer]. The
+# finalizer unlinks the file once the mapping is gone and is None if this
+# process does not own the segment.
+_mappings = weakref.WeakKeyDictionary()
+
+# Map from the id of an object copied into a segment to its SharedBuffer
+_exported = {}
+
+
+def _directory():
+    """Code factorization for where segments are made.
+
+    On Linux ``/dev/shm`` is backed by memory, so mapping a file there is
+    the same as ``multiprocessing.shared_memory``. Elsewhere the temporary
+    directory is used (the pages are still shared, but may be written back).
+    """
+
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _unlink(path):
+    """Code factorization for removing a segment which may already be gone."""
+
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _map(fd, path, nbytes, owned):
+    """Code factorization for mapping the segment open as ``fd``."""
+
+    try:
+        mm = mmap.mmap(fd, nbytes)
+    finally:
+        os.close(fd)
+    fin = weakref.finalize(mm, _unlink, path) if owned else None
+    _mappings[mm] = [path, fin]
+    return mm
+
+
+def _new_segment(nbytes):
+    """Code factorization for making a segment owned by this process."""
+
+    fd, path = tempfile.mkstemp(prefix='pluginplay-', dir=_directory())
+    try:
+        os.ftruncate(fd, nbytes)
+    except OSError:
+        os.close(fd)
+        _unlink(path)
+        raise
+    return _map(fd, path, nbytes, True)
+
+
+def _meta(obj):
+    """Code factorization for what is needed to rebuild ``obj``'s view."""
+
+    if numpy != None and isinstance(obj, numpy.ndarray):
+        return ('ndarray', obj.dtype, obj.shape)
+    return ('buffer', obj.format, obj.shape)
+
+
+def _view(mm, meta):
+    """Code factorization for viewing a mapping as the shared object.
+
+    Arrays come back as arrays (if NumPy is available) and other buffers as
+    memory views with the original format and shape. Either way the view
+    refers to the mapping, which stays alive as long as the view does.
+    """
+
+    kind, fmt, shape = meta
+    if kind == 'ndarray':
+        if numpy != None:
+            return numpy.frombuffer(mm, dtype=fmt).reshape(shape)
+        return memoryview(mm)
+    try:
+        return memoryview(mm).cast(fmt, shape)
+    except (TypeError, ValueError):
+        return memoryview(mm)
+
+
+def _mapping_of(obj):
+    """Code factorization for the mapping ``obj``'s memory lives in.
+
+    :return: The mapping, or None if ``obj`` is not a view of a whole
+             mapping made by this module.
+    """
+
+    # Arrays compare elementwise, so "is None" is needed here
+    x = obj
+    while not isinstance(x, mmap.mmap):
+        if x is None:
+            return None
+        x = x.obj if isinstance(x, memoryview) else getattr(x, 'base', None)
+    if x not in _mappings:
+        return None
+    return x if memoryview(obj).nbytes == len(x) else None
+
+
+def _shareable(obj, min_bytes):
+    """Code factorization for whether ``obj`` is worth sharing."""
+
+    if not isinstance(obj, memoryview) and \
+       not (numpy != None and isinstance(obj, numpy.ndarray)):
+        return False
+    if numpy != None and isinstance(obj, numpy.ndarray) and obj.dtype.hasobject:
+        return False
+    view = memoryview(obj)
+    return view.c_contiguous and view.nbytes >= max(min_bytes, 1)
+
+
+def empty(shape, dtype=None):
+    """Allocates a buffer in shared memory.
+
+    Results written to such a buffer are shared with other processes without
+    copying them (see ``share``), as are inputs bound to Modules.
+
+    :param shape: The shape of the array, or the number of bytes if
+                  ``dtype`` is None.
+    :type shape: int or tuple(int)
+    :param dtype: The NumPy dtype of the array. If None, a writable memory
+                  view of bytes is made.
+
+    :return: The (zero-filled) buffer.
+    :rtype: numpy.ndarray or memoryview
+
+    :raises ImportError: If ``dtype`` is given, but NumPy is not installed.
+    """
+
+    if dtype == None:
+        return memoryview(_new_segment(shape))
+    if numpy == None:
+        raise ImportError("Allocating shared arrays requires NumPy.")
+    meta = ('ndarray', numpy.dtype(dtype), tuple(numpy.atleast_1d(shape)))
+    nbytes = int(numpy.prod(meta[2])) * meta[1].itemsize
+    return _view(_new_segment(nbytes), meta)
+
+
+class SharedBuffer:
+    """Describes a buffer which has been placed in shared memory.
+
+    Pickling a SharedBuffer only sends its description: the path of the
+    segment, its size, and how to view it. Unpickling maps the segment and
+    produces a view of it (a NumPy array or a memory view), so the receiver
+    sees the same bytes as the sender without a copy.
+
+    A segment is removed when the process which owns it no longer maps it.
+    ``owned`` indicates that ownership passes to the receiver.
+    """
+
+    def __init__(self, path, nbytes, meta, owned):
+        """Describes the segment at ``path``.
+
+        :param path: The file backing the segment.
+        :type path: str
+        :param nbytes: The size of the segment.
+        :type nbytes: int
+        :param meta: How to view the segment (see ``_meta``).
+        :type meta: tuple
+        :param owned: Whether the receiver owns the segment.
+        :type owned: bool
+        """
+
+        self.path   = path
+        self.nbytes = nbytes
+        self.meta   = meta
+        self.owned  = owned
+
+
+    def __reduce__(self):
+        return (_attach, (self.path, self.nbytes, self.meta, self.owned))
+
+
+def _attach(path, nbytes, meta, owned):
+    """Maps the segment described by a SharedBuffer (see its ``__reduce__``)."""
+
+    fd = os.open(path, os.O_RDWR)
+    with _lock:
+        return _view(_map(fd, path, nbytes, owned), meta)
+
+
+# SharedBuffers stand for their segment when fingerprinting a module spec
+register_hasher(SharedBuffer, lambda b : (b.path, b.nbytes, repr(b.meta)))
+
+
+def _forget(obj_id, path):
+    """Code factorization for dropping a segment made by ``share``."""
+
+    with _lock:
+        _exported.pop(obj_id, None)
+    _unlink(path)
+
+
+def _share_one(obj, min_bytes, transfer, cache):
+    """Code factorization for sharing a single object (see ``share``)."""
+
+    if not _shareable(obj, min_bytes):
+        return obj
+
+    meta = _meta(obj)
+    with _lock:
+        mm = _mapping_of(obj)
+        if mm != None:
+            path, fin = _mappings[mm]
+            if not transfer:
+                return SharedBuffer(path, len(mm), meta, False)
+            if fin != None and fin.alive:
+                fin.detach()
+                _mappings[mm][1] = None
+                return SharedBuffer(path, len(mm), meta, True)
+
+        if cache and not transfer and id(obj) in _exported:
+            return _exported[id(obj)]
+
+        view = memoryview(obj)
+        mm = _new_segment(view.nbytes)
+        if meta[0] == 'ndarray':
+            _view(mm, meta)[...] = obj
+        else:
+            try:
+                memoryview(mm)[:] = view.cast('B')
+            except TypeError:
+                return obj
+
+        path, fin = _mappings[mm]
+        fin.detach()
+        _mappings[mm][1] = None
+        if transfer or not cache:
+            return SharedBuffer(path, view.nbytes, meta, True)
+
+        # The copy lives as long as the original, so it is made only once
+        try:
+            weakref.finalize(obj, _forget, id(obj), path)
+        except TypeError:
+            return SharedBuffer(path, view.nbytes, meta, True)
+        rv = SharedBuffer(path, view.nbytes, meta, False)
+        _exported[id(obj)] = rv
+        return rv
+
+
+def share(obj, min_bytes=DEFAULT_MIN_BYTES, transfer=False, cache=False):
+    """Replaces the large buffers in ``obj`` with SharedBuffers.
+
+    NumPy arrays and memory views of at least ``min_bytes`` bytes are
+    replaced, including those nested in dictionaries, lists, and tuples. The
+    result can then be pickled (e.g., sent to a worker process) without
+    copying the buffers: the receiver maps them instead.
+
+    Buffers which already live in shared memory (see ``empty``, and buffers
+    received from another process) are not copied at all. Other buffers are
+    copied into shared memory, and the receiver owns the copy. If ``transfer``
+    is True, the receiver also takes ownership of the buffers which were
+    already shared, which is what is wanted for the results of a call.
+
+    If ``cache`` is True (and ``transfer`` is False), the copy instead
+    belongs to this process and lives as long as the original (or, if the
+    original can not be tracked, belongs to the receiver), so sharing the
+    same object again is free. Since later changes to the original are not
+    copied, this is only for buffers which do not change, such as the inputs
+    bound to a locked Module. The arguments of a call are copied each time.
+
+    The sender must keep ``obj`` alive until the receiver has unpickled it.
+    Segments whose ownership is passed on, but which are never unpickled,
+    are left behind (their files are named ``pluginplay-*``).
+
+    :param obj: The object whose buffers should be shared.
+    :param min_bytes: Buffers smaller than this are left alone.
+    :type min_bytes: int
+    :param transfer: Whether the receiver owns the shared buffers.
+    :type transfer: bool
+    :param cache: Whether copies are made once per original.
+    :type cache: bool
+
+    :return: ``obj`` with its large buffers replaced.
+    """
+
+    if type(obj) == dict:
+        return {k : share(v, min_bytes, transfer, cache)
+                for k, v in obj.items()}
+    if type(obj) in (list, tuple):
+        rv = [share(v, min_bytes, transfer, cache) for v in obj]
+        return rv if type(obj) == list else tuple(rv)
+    return _share_one(obj, min_bytes, transfer, cache)
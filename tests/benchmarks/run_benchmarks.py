@@ -0,0 +1,231 @@
+"""Benchmarks the per-call overhead of the PluginPlay framework.
+
+The unit tests only check that the framework is correct. The benchmarks here
+time the framework itself (callbacks are trivial), so that regressions in the
+per-call overhead are caught. Usage:
+
+.. code-block:: sh
+
+   python3 run_benchmarks.py                      # print the timings
+   python3 run_benchmarks.py --save baseline.json # store them as a baseline
+   python3 run_benchmarks.py --compare baseline.json
+
+When comparing, the script exits with a non-zero status if any benchmark is
+slower than the baseline by more than the tolerance (``--tolerance``).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+my_dir   = os.path.dirname(os.path.realpath(__file__))
+test_dir = os.path.dirname(my_dir)
+root_dir = os.path.dirname(test_dir)
+sys.path.append(os.path.join(root_dir, 'src'))
+sys.path.append(test_dir)
+
+import pluginplay as pp
+from examples import geometry
+
+
+def chain(depth):
+    """Makes a PrismVolumeBySubmod-style chain of ``depth`` Modules.
+
+    Each link runs the next one as an Area and forwards its result. The last
+    link is a Triangle.
+    """
+
+    def fxn(inputs, submods):
+        b, h = geometry.Area().unwrap_inputs(inputs)
+        return {'area' : submods[('area', geometry.Area())].run_as(
+                    geometry.Area(), b, h)}
+
+    mod = geometry.area.Triangle()
+    for _ in range(depth):
+        mod = pp.Module(property_types={geometry.Area()}, callback=fxn,
+                        callback_name='Link',
+                        submods={('area', geometry.Area()) : mod})
+    return mod
+
+
+def fan_out(width):
+    """Makes a Module which calls ``width`` Triangle submodules."""
+
+    submods = {('area %d' % i, geometry.Area()) : geometry.area.Triangle()
+               for i in range(width)}
+
+    def fxn(inputs, submods):
+        b, h = geometry.Area().unwrap_inputs(inputs)
+        total = 0.0
+        for k, v in submods.items():
+            total += v.run_as(geometry.Area(), b, h)
+        return {'area' : total}
+
+    return pp.Module(property_types={geometry.Area()}, callback=fxn,
+                     callback_name='FanOut', submods=submods)
+
+
+def no_memoization(mod):
+    """Turns memoization off for ``mod`` and all of its submodules."""
+
+    mod.turn_off_memoization()
+    for v in mod._state['submods'].values():
+        no_memoization(v)
+    return mod
+
+
+def make_benchmarks(scale):
+    """Makes the benchmarks, sized by ``scale`` (1 is the full size).
+
+    :return: A map from the name of the benchmark to a callable which runs it
+             once.
+    :rtype: dict(str, callable)
+    """
+
+    depth = max(1, int(100 * scale))
+    width = max(1, int(100 * scale))
+    area  = geometry.Area()
+    rv    = {}
+
+    mm = pp.ModuleManager()
+    geometry.load_modules(mm)
+    mm.change_submod('Volume of a prism', 'area', 'Area of a square')
+    for k in ('Area of a triangle', 'Volume of a prism'):
+        no_memoization(mm[k])
+    rv['run_as/triangle'] = \
+        lambda: mm.run_as(area, 'Area of a triangle', 1.2, 3.4)
+    rv['run_as/prism_volume'] = \
+        lambda: mm.run_as(geometry.PrismVolume(), 'Volume of a prism', 1.2,
+                          1.2, 1.2)
+
+    deep = no_memoization(chain(depth))
+    rv['run_as/chain_%d' % depth] = lambda: deep.run_as(area, 1.2, 3.4)
+
+    wide = no_memoization(fan_out(width))
+    rv['run_as/fan_out_%d' % width] = lambda: wide.run_as(area, 1.2, 3.4)
+
+    hit = geometry.area.Triangle()
+    hit.run_as(area, 1.2, 3.4)
+    rv['run_as/cache_hit'] = lambda: hit.run_as(area, 1.2, 3.4)
+
+    deep_hit = chain(depth)
+    deep_hit.run_as(area, 1.2, 3.4)
+    rv['run_as/cache_hit_chain_%d' % depth] = \
+        lambda: deep_hit.run_as(area, 1.2, 3.4)
+
+    tree = chain(depth)
+    tree.run_as(area, 1.2, 3.4)
+    rv['unlocked_copy/chain_%d' % depth] = tree.unlocked_copy
+
+    mm_copy = pp.ModuleManager()
+    mm_copy.add_module('tree', tree)
+    def copy_module():
+        mm_copy.copy_module('tree', 'copy')
+        mm_copy.erase('copy')
+    rv['copy_module/chain_%d' % depth] = copy_module
+
+    rv['property_type/wrap_inputs'] = lambda: area.wrap_inputs({}, 1.2, 3.4)
+    results = {'area' : 1.0}
+    rv['property_type/unwrap_results'] = lambda: area.unwrap_results(results)
+    inputs = {'base' : 1.2, 'height' : 3.4}
+    rv['property_type/unwrap_inputs'] = lambda: area.unwrap_inputs(inputs)
+    return rv
+
+
+def time_benchmark(fxn, repeat, min_time):
+    """Times ``fxn``, returning statistics of the seconds per call.
+
+    The number of calls per measurement is chosen so that each measurement
+    takes at least ``min_time`` seconds. The best of the ``repeat``
+    measurements is the least noisy estimate of the cost of a call.
+    """
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fxn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fxn()
+        samples.append((time.perf_counter() - start) / number)
+    return {'best' : min(samples),
+            'median' : statistics.median(samples),
+            'number' : number,
+            'repeat' : repeat}
+
+
+def compare(results, baseline, tolerance):
+    """Prints how ``results`` compare to ``baseline``.
+
+    :return: The names of the benchmarks which regressed.
+    :rtype: list(str)
+    """
+
+    regressed = []
+    for name, r in sorted(results['benchmarks'].items()):
+        if name not in baseline['benchmarks']:
+            print('%-40s %12.3f us  (not in baseline)' % (name, r['best'] * 1e6))
+            continue
+        ratio = r['best'] / baseline['benchmarks'][name]['best']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressed.append(name)
+        print('%-40s %12.3f us  %6.2fx%s' % (name, r['best'] * 1e6, ratio,
+                                            flag))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller graphs and shorter measurements')
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='measurements per benchmark')
+    parser.add_argument('--save', metavar='FILE',
+                        help='write the results to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare against the baseline stored in FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown vs. the baseline (fraction)')
+    args = parser.parse_args(argv)
+
+    scale    = 0.1 if args.quick else 1.0
+    min_time = 0.01 if args.quick else 0.1
+
+    results = {'python' : platform.python_version(),
+               'platform' : platform.platform(),
+               'benchmarks' : {}}
+    for name, fxn in make_benchmarks(scale).items():
+        if args.filter in name:
+            results['benchmarks'][name] = time_benchmark(fxn, args.repeat,
+                                                         min_time)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return 1 if len(compare(results, baseline, args.tolerance)) else 0
+
+    for name, r in sorted(results['benchmarks'].items()):
+        print('%-40s %12.3f us' % (name, r['best'] * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
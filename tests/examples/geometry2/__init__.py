@@ -1,4 +1,6 @@
-from .modules import circle
+# The modules are registered lazily, so importing this plugin (or loading it
+# into a ModuleManager) does not import the modules themselves. Each module is
+# imported and constructed the first time it is used.
 
 def load_modules(mm):
-    mm.add_module("Area of a circle", circle.Circle())
+    mm.add_lazy_module("Area of a circle", __name__ + ".modules.circle:Circle")
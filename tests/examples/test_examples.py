@@ -3,6 +3,7 @@ import importlib
 import unittest
 import pluginplay as pp
 import math
+import sys
 
 # The first thing a user of PluginPlay does is import the plugins they want to
 # use (here that's the module collection in the provided geometry package), then
@@ -103,8 +104,11 @@ class TestExamples(unittest.TestCase):
         plugin = importlib.import_module(".geometry2", package='examples')
 
         # Now we call the load_modules hook in the plugin which adds the new
-        # modules to our current ModuleManager
+        # modules to our current ModuleManager. This plugin registers its
+        # modules lazily, so the module's code has not been imported yet
         plugin.load_modules(self.mm)
+        self.assertTrue("Area of a circle" in self.mm)
+        self.assertFalse(plugin.__name__ + ".modules.circle" in sys.modules)
 
         # At this point we can call the module just like any other module
         area = self.mm.run_as(geometry.Area(), "Area of a circle", 1.2, 1.2)
@@ -0,0 +1,61 @@
+import pluginplay as pp
+from pluginplay.cache import sizeof
+import gc
+import unittest
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_ctor(self):
+        budget = pp.MemoryBudget(100)
+        self.assertEqual(budget.max_bytes(), 100)
+        self.assertEqual(budget.nbytes(), 0)
+
+
+    def test_add_remove(self):
+        budget = pp.MemoryBudget(10000)
+        cache = pp.Cache()
+        cache['a'] = 'x' * 10
+        cache.set_budget(budget)
+        self.assertTrue(cache.budget() is budget)
+        self.assertEqual(budget.nbytes(), cache.nbytes())
+
+        # Changes to the cache are counted
+        cache['b'] = 'y' * 10
+        self.assertEqual(budget.nbytes(), cache.nbytes())
+        cache.clear()
+        self.assertEqual(budget.nbytes(), 0)
+
+        # Caches stop counting when removed or garbage collected
+        cache['a'] = 'x' * 10
+        cache.set_budget(None)
+        self.assertEqual(budget.nbytes(), 0)
+        cache.set_budget(budget)
+        del cache
+        gc.collect()
+        self.assertEqual(budget.nbytes(), 0)
+
+        # Empty caches made from another's config share its budget
+        cache = pp.Cache(budget=budget)
+        self.assertTrue(pp.Cache(**cache.config()).budget() is budget)
+
+
+    def test_evicts_across_caches(self):
+        big, small = 'x' * 1000, 'y' * 100
+        budget = pp.MemoryBudget(sizeof(big) + 2 * sizeof(small))
+        cache0 = pp.Cache(budget=budget)
+        cache1 = pp.Cache(budget=budget)
+
+        # Cheap results are evicted first, wherever they are
+        cache0.put('cheap', small, cost=0.001)
+        cache1.put('big', big, cost=1.0)
+        cache1.put('dear', small, cost=1.0)
+        cache0.put('new', small, cost=1.0)
+        self.assertEqual(cache0, {'new' : small})
+        self.assertEqual(cache1, {'big' : big, 'dear' : small})
+
+        # For the same cost, the larger result is evicted first
+        cache0.put('more', small, cost=1.0)
+        self.assertEqual(cache0, {'new' : small, 'more' : small})
+        self.assertEqual(cache1, {'dear' : small})
+        self.assertTrue(budget.nbytes() <= budget.max_bytes())
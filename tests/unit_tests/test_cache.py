@@ -0,0 +1,148 @@
+import pluginplay as pp
+from pluginplay.cache import sizeof
+import time
+import unittest
+
+
+class TestCache(unittest.TestCase):
+
+    def test_ctor(self):
+        # Default is an unbounded LRU cache
+        cache = pp.Cache()
+        self.assertEqual(cache.config(), {'policy' : 'lru',
+                                          'max_entries' : None,
+                                          'max_bytes' : None,
+                                          'ttl' : None,
+                                          'budget' : None})
+        self.assertEqual(cache, {})
+        self.assertEqual(cache.nbytes(), 0)
+
+        # Raises an error for an unknown policy
+        self.assertRaises(ValueError, pp.Cache, 'not a policy')
+
+        # TTL policy needs a ttl
+        self.assertRaises(ValueError, pp.Cache, 'ttl')
+
+
+    def test_dict_api(self):
+        cache = pp.Cache()
+        cache['hello'] = 'world'
+        self.assertTrue('hello' in cache)
+        self.assertEqual(cache['hello'], 'world')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache, {'hello' : 'world'})
+        self.assertEqual(cache.nbytes(), sizeof('world'))
+
+        del cache['hello']
+        self.assertFalse('hello' in cache)
+        self.assertEqual(cache.nbytes(), 0)
+        self.assertRaises(KeyError, cache.__getitem__, 'hello')
+        self.assertEqual(cache.get('hello'), None)
+        self.assertEqual(cache.get('hello', 42), 42)
+
+        # Without a byte limit or a budget, sizes are only estimated on demand
+        cache.put('a', [1, 2])
+        self.assertEqual(cache._data['a'].nbytes, None)
+        self.assertEqual(cache.costs(), [('a', 0.0, sizeof([1, 2]))])
+        self.assertEqual(cache._data['a'].nbytes, sizeof([1, 2]))
+        cache.put('b', 'x')
+        self.assertEqual(cache.nbytes(), sizeof([1, 2]) + sizeof('x'))
+        cache.put('c', 'y')
+        self.assertEqual(cache.discard('c'), sizeof('y'))
+        del cache['b']
+        self.assertEqual(cache.nbytes(), sizeof([1, 2]))
+
+
+    def test_lru(self):
+        cache = pp.Cache('lru', max_entries=2)
+        cache['a'] = 1
+        cache['b'] = 2
+
+        # Using 'a' makes 'b' the least recently used
+        cache['a']
+        cache['c'] = 3
+        self.assertEqual(cache, {'a' : 1, 'c' : 3})
+
+
+    def test_lfu(self):
+        cache = pp.Cache('lfu', max_entries=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a']
+        cache['a']
+        cache['b']
+
+        # 'b' was used less than 'a'
+        cache['c'] = 3
+        self.assertEqual(cache, {'a' : 1, 'c' : 3})
+
+
+    def test_ttl(self):
+        # Oldest entry is evicted first, regardless of use
+        cache = pp.Cache('ttl', max_entries=2, ttl=100)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a']
+        cache['c'] = 3
+        self.assertEqual(cache, {'b' : 2, 'c' : 3})
+
+        # Entries expire
+        cache = pp.Cache('ttl', ttl=0.001)
+        cache['a'] = 1
+        time.sleep(0.01)
+        self.assertFalse('a' in cache)
+        self.assertEqual(len(cache), 0)
+
+        # get treats expired entries as absent
+        cache['a'] = 1
+        time.sleep(0.01)
+        self.assertEqual(cache.get('a', 2), 2)
+
+
+    def test_max_bytes(self):
+        value = 'x' * 100
+        nbytes = sizeof(value)
+        cache = pp.Cache(max_bytes=2 * nbytes)
+        cache['a'] = value
+        cache['b'] = value + 'y'
+        self.assertEqual(len(cache), 1)
+        self.assertTrue('b' in cache)
+
+        # Values larger than the budget are not stored at all
+        cache['c'] = 'x' * (3 * nbytes)
+        self.assertFalse('c' in cache)
+        self.assertTrue(cache.nbytes() <= 2 * nbytes)
+
+
+    def test_clear(self):
+        cache = pp.Cache('lfu', max_entries=3)
+        cache['a'] = 1
+        cache.clear()
+        self.assertEqual(cache, {})
+        self.assertEqual(cache.config()['policy'], 'lfu')
+
+
+    def test_tags(self):
+        cache = pp.Cache(max_entries=3)
+        cache.put('a', 1, 'x')
+        cache.put('b', 2, 'x')
+        cache.put('c', 3, 'y')
+        cache['d'] = 4
+        self.assertEqual(cache.tag('c'), 'y')
+        self.assertEqual(cache.tag('d'), None)
+        self.assertRaises(KeyError, cache.tag, 'e')
+        self.assertEqual(cache.tag('e', 'z'), 'z')
+
+        # 'a' was evicted to make room for 'd'
+        self.assertEqual(cache.invalidate('x'), 1)
+        self.assertEqual(cache, {'c' : 3, 'd' : 4})
+        self.assertEqual(cache.invalidate('x'), 0)
+
+
+    def test_sizeof(self):
+        self.assertTrue(sizeof([1.0, 2.0]) > sizeof([]))
+        self.assertTrue(sizeof({'a' : 'x' * 100}) > sizeof({'a' : 'x'}))
+
+        # Aliased objects are only counted once
+        x = 'x' * 100
+        self.assertEqual(sizeof([x, x]) - sizeof([x]), 8)
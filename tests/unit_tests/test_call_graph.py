@@ -0,0 +1,130 @@
+import pluginplay as pp
+import unittest
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+def make_module(*cb_names):
+    """Makes a Module with a callback point for each of ``cb_names``."""
+
+    def fxn(inputs, submods):
+        x = inputs['input 0']
+        for k, v in submods.items():
+            x += v.run_as(PT0(), inputs['input 0'])
+        return {'result 0' : x}
+
+    return pp.Module(callback=fxn, property_types={PT0()},
+                     submods={(cb, PT0()) : None for cb in cb_names})
+
+
+class TestCallGraph(unittest.TestCase):
+
+    def setUp(self):
+        # top -> left -> leaf, top -> right -> leaf
+        self.mm = pp.ModuleManager()
+        self.mm.add_module('top', make_module('a', 'b'))
+        self.mm.add_module('left', make_module('c'))
+        self.mm.add_module('right', make_module('c'))
+        self.mm.add_module('leaf', make_module())
+        self.mm.change_submod('top', 'a', 'left')
+        self.mm.change_submod('top', 'b', 'right')
+        self.mm.change_submod('left', 'c', 'leaf')
+        self.mm.change_submod('right', 'c', 'leaf')
+        self.graph = self.mm.call_graph()
+
+
+    def test_edges(self):
+        self.assertEqual(len(self.graph), 4)
+        self.assertTrue('top' in self.graph)
+        self.assertEqual(self.graph.submods('top'), {'a' : 'left',
+                                                     'b' : 'right'})
+        self.assertEqual(self.graph.submods('leaf'), {})
+        self.assertEqual(self.graph.callers('leaf'), set([('left', 'c'),
+                                                          ('right', 'c')]))
+        self.assertEqual(self.graph.callers('top'), set())
+
+
+    def test_reachability(self):
+        self.assertEqual(self.graph.descendants('top'),
+                         set(['left', 'right', 'leaf']))
+        self.assertEqual(self.graph.ancestors('leaf'),
+                         set(['left', 'right', 'top']))
+        self.assertEqual(self.graph.ancestors('top'), set())
+
+
+    def test_topological_order(self):
+        order = self.graph.topological_order()
+        self.assertEqual(set(order), set(['top', 'left', 'right', 'leaf']))
+        for k in order:
+            for sub in self.graph.submods(k).values():
+                self.assertLess(order.index(sub), order.index(k))
+
+
+    def test_shared(self):
+        self.assertEqual(self.graph.shared(),
+                         {'leaf' : set([('left', 'c'), ('right', 'c')])})
+
+
+    def test_cycles(self):
+        self.assertRaises(RuntimeError, self.mm.change_submod, 'left', 'c',
+                          'top')
+        self.assertRaises(RuntimeError, self.mm.change_submod, 'top', 'a',
+                          'top')
+
+
+    def test_change_submod(self):
+        self.mm.add_module('other', make_module())
+        self.mm.change_submod('left', 'c', 'other')
+        self.assertEqual(self.graph.submods('left'), {'c' : 'other'})
+        self.assertEqual(self.graph.callers('leaf'), set([('right', 'c')]))
+        self.assertEqual(self.graph.callers('other'), set([('left', 'c')]))
+
+
+    def test_erase(self):
+        self.mm.erase('leaf')
+        self.assertFalse('leaf' in self.graph)
+        self.assertEqual(self.graph.submods('left'), {'c' : None})
+
+        # Re-adding the (still bound) Module restores the edges
+        self.mm.add_module('leaf 2', self.mm['left'].submods()['c'])
+        self.assertEqual(self.graph.submods('left'), {'c' : 'leaf 2'})
+        self.assertEqual(self.graph.callers('leaf 2'), set([('left', 'c'),
+                                                            ('right', 'c')]))
+
+
+    def test_aliased_keys(self):
+        self.mm.add_module('leaf alias', self.mm['leaf'])
+        self.mm.erase('leaf')
+        self.assertEqual(self.graph.submods('left'), {'c' : 'leaf alias'})
+
+
+    def test_rename_and_copy(self):
+        self.mm.copy_module('left', 'left copy')
+        # The copy calls the same leaf as the original
+        self.assertEqual(self.graph.submods('left copy'), {'c' : 'leaf'})
+        self.assertEqual(len(self.graph.callers('leaf')), 3)
+
+        self.mm.rename_module('top', 'new top')
+        self.assertFalse('top' in self.graph)
+        self.assertTrue('new top' in self.graph)
+        self.assertEqual(self.graph.callers('left'), set([('new top', 'a')]))
+
+        # Renaming a callee keeps its callers bound to it
+        self.mm.rename_module('leaf', 'new leaf')
+        self.assertEqual(self.graph.submods('left'), {'c' : 'new leaf'})
+
+
+    def test_refresh(self):
+        self.mm.add_module('other', make_module())
+        self.mm['left']._state['submods'][('c', PT0())] = self.mm['other']
+        self.assertEqual(self.graph.submods('left'), {'c' : 'leaf'})
+        self.graph.refresh('left')
+        self.assertEqual(self.graph.submods('left'), {'c' : 'other'})
+        self.assertEqual(self.graph.callers('leaf'), set([('right', 'c')]))
@@ -0,0 +1,104 @@
+import pluginplay as pp
+from pluginplay.hashing import fingerprint, register_hasher
+from collections import OrderedDict, defaultdict, namedtuple
+import array
+import enum
+import unittest
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Opaque:
+    pass
+
+
+class TestHashing(unittest.TestCase):
+
+    def test_scalars(self):
+        values = [None, True, False, 0, 1, 1.0, -0.5, 1j, 'a', b'a', '']
+        fps = [fingerprint(x) for x in values]
+
+        # All distinct (in particular 1, 1.0, and True differ)
+        self.assertEqual(len(set(fps)), len(values))
+
+        # Deterministic
+        self.assertEqual(fps, [fingerprint(x) for x in values])
+
+
+    def test_containers(self):
+        self.assertEqual(fingerprint([1, [2, 3]]), fingerprint([1, [2, 3]]))
+        self.assertNotEqual(fingerprint([1, 2]), fingerprint((1, 2)))
+        self.assertNotEqual(fingerprint(['ab']), fingerprint(['a', 'b']))
+        self.assertNotEqual(fingerprint([[1], 2]), fingerprint([1, [2]]))
+
+        # Dicts and sets do not depend on iteration order
+        self.assertEqual(fingerprint({'a' : 1, 'b' : [2]}),
+                         fingerprint({'b' : [2], 'a' : 1}))
+        self.assertNotEqual(fingerprint({'a' : 1}), fingerprint({'a' : 2}))
+        self.assertEqual(fingerprint(set(['x', 'y'])),
+                         fingerprint(set(['y', 'x'])))
+        self.assertNotEqual(fingerprint(set([1])), fingerprint([1]))
+
+        # Shared (but acyclic) members are fine, cycles are not
+        x = [1]
+        self.assertEqual(fingerprint([x, x]), fingerprint([[1], [1]]))
+        x.append(x)
+        self.assertRaises(TypeError, fingerprint, x)
+        y = {'a' : 1}
+        y['b'] = [y]
+        self.assertRaises(TypeError, fingerprint, y)
+        self.assertRaises(TypeError, fingerprint, {1 : y})
+
+
+    def test_subclasses(self):
+        Pair = namedtuple('Pair', ['a', 'b'])
+        self.assertEqual(fingerprint(Pair(1, [2])), fingerprint(Pair(1, [2])))
+        self.assertNotEqual(fingerprint(Pair(1, 2)), fingerprint(Pair(1, 3)))
+        self.assertNotEqual(fingerprint(Pair(1, 2)), fingerprint((1, 2)))
+
+        ordered = OrderedDict([('a', 1), ('b', 2)])
+        self.assertEqual(fingerprint(ordered),
+                         fingerprint(OrderedDict([('a', 1), ('b', 2)])))
+        self.assertNotEqual(fingerprint(ordered), fingerprint(dict(ordered)))
+        self.assertEqual(fingerprint(defaultdict(list, {'a' : [1]})),
+                         fingerprint(defaultdict(list, {'a' : [1]})))
+
+        Color = enum.IntEnum('Color', ['RED', 'GREEN'])
+        self.assertNotEqual(fingerprint(Color.RED), fingerprint(Color.GREEN))
+        self.assertNotEqual(fingerprint(Color.RED), fingerprint(1))
+
+
+    def test_buffers(self):
+        a = array.array('d', [1.0, 2.0, 3.0])
+        self.assertEqual(fingerprint(a), fingerprint(array.array('d', a)))
+        self.assertNotEqual(fingerprint(a),
+                            fingerprint(array.array('d', [1.0, 2.0, 4.0])))
+
+        # Same bytes, different element type
+        self.assertNotEqual(fingerprint(array.array('b', [1, 2])),
+                            fingerprint(array.array('B', [1, 2])))
+
+        # Shape is part of the fingerprint
+        view = memoryview(bytes(range(12)))
+        self.assertNotEqual(fingerprint(view.cast('B', (3, 4))),
+                            fingerprint(view.cast('B', (4, 3))))
+
+        # Non-contiguous buffers work too
+        self.assertEqual(fingerprint(view[::2]),
+                         fingerprint(memoryview(bytes(range(0, 12, 2)))))
+
+
+    def test_register_hasher(self):
+        self.assertRaises(TypeError, fingerprint, Point(1, 2))
+        self.assertRaises(TypeError, fingerprint, [Opaque()])
+
+        register_hasher(Point, lambda p : (p.x, p.y))
+        self.assertEqual(fingerprint(Point(1, 2)), fingerprint(Point(1, 2)))
+        self.assertNotEqual(fingerprint(Point(1, 2)), fingerprint(Point(2, 1)))
+
+        # The type is part of the fingerprint
+        self.assertNotEqual(fingerprint(Point(1, 2)), fingerprint((1, 2)))
@@ -1,4 +1,8 @@
 import pluginplay as pp
+import asyncio
+import collections
+import threading
+import time
 import unittest
 
 class PT0(pp.PropertyType):
@@ -12,10 +16,24 @@ class PT0(pp.PropertyType):
 
 
 
+class Elementwise:
+    """A value which, like a NumPy array, compares elementwise."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __eq__(self, rhs):
+        return Elementwise([v == rhs for v in self.values])
+
+    def __bool__(self):
+        raise ValueError("The truth value is ambiguous.")
+
+
 class TestModule(unittest.TestCase):
     def setUp(self):
         self.default_state = {'callback_name' : None,
                               'callback' : None,
+                              'batch_callback' : None,
                               'citations' : [],
                               'description' : None,
                               'inputs' : {},
@@ -82,6 +100,59 @@ class TestModule(unittest.TestCase):
         self.assertEqual(mod, a_copy)
 
 
+    def test_unlocked_copy_is_copy_on_write(self):
+        fxn = lambda inputs, submods : {'result 0' : inputs['input 0'] +
+                                                     inputs['input x']}
+        sub_key = ('callback 0', PT0())
+        mod = pp.Module(callback=fxn, property_types=set([PT0()]),
+                        inputs={'input x' : 1},
+                        submods={sub_key : self.ready_submod})
+        self.assertEqual(mod.run_as(PT0(), 1), 2)
+
+        # Everything is shared until it is changed
+        a_copy = mod.unlocked_copy()
+        self.assertTrue(a_copy._state['inputs'] is mod._state['inputs'])
+        self.assertTrue(a_copy.submods()['callback 0'] is self.ready_submod)
+        self.assertTrue(a_copy._cache is mod._cache)
+        self.assertEqual(a_copy.run_as(PT0(), 1), 2)
+        self.assertEqual(a_copy.stats()['cache_hits'], 1)
+
+        a_copy = mod.unlocked_copy()
+        a_copy.change_input('input x', 2)
+        self.assertEqual(mod.inputs()['input x'], 1)
+        self.assertFalse(a_copy._cache is mod._cache)
+        self.assertEqual(len(a_copy._cache), 0)
+        self.assertEqual(len(mod._cache), 1)
+        self.assertTrue(a_copy.submods() == mod.submods())
+
+        other = pp.Module(callback=self.ready_submod._state['callback'],
+                          callback_name='other',
+                          property_types=set([PT0()]))
+        a_copy.change_submod('callback 0', other)
+        self.assertTrue(mod.submods()['callback 0'] is self.ready_submod)
+        self.assertEqual(a_copy.run_as(PT0(), 1), 3)
+        self.assertEqual(mod.run_as(PT0(), 1), 2)
+
+        # Resetting the cache of a copy leaves the original's alone
+        a_copy = mod.unlocked_copy()
+        a_copy.reset_cache()
+        self.assertEqual(len(mod._cache), 1)
+
+        # A copy changed before anything ran does not fill the original's
+        fresh = pp.Module(callback=fxn, property_types=set([PT0()]),
+                          inputs={'input x' : 1},
+                          submods={sub_key : self.ready_submod})
+        a_copy = fresh.unlocked_copy()
+        a_copy.change_input('input x', 3)
+        self.assertFalse(a_copy._cache is fresh._cache)
+        self.assertEqual(a_copy.run_as(PT0(), 1), 4)
+        self.assertEqual(len(fresh._cache), 0)
+        a_copy = fresh.unlocked_copy()
+        a_copy.change_submod('callback 0', other)
+        self.assertEqual(a_copy.run_as(PT0(), 1), 2)
+        self.assertEqual(len(fresh._cache), 0)
+
+
     def test_has_module(self):
         mod = pp.Module()
         self.assertFalse(mod.has_module())
@@ -177,6 +248,25 @@ class TestModule(unittest.TestCase):
         self.assertEqual(mod._cache, {})
 
 
+    def test_set_cache_policy(self):
+        mod = pp.Module()
+        self.assertRaises(RuntimeError, mod.set_cache_policy)
+
+        mod0 = self.ready_submod
+        mod0.run({'input 0' : 1})
+        mod0.run({'input 0' : 2})
+        mod0.set_cache_policy('lru', max_entries=1)
+        self.assertEqual(mod0._cache.config()['max_entries'], 1)
+        self.assertEqual(len(mod0._cache), 1)
+
+        # Can be changed even when locked
+        self.assertTrue(mod0.locked())
+        mod0.set_cache_policy('lfu')
+        self.assertEqual(mod0._cache.config()['policy'], 'lfu')
+
+        self.assertRaises(ValueError, mod0.set_cache_policy, 'not a policy')
+
+
     def test_is_memoizable(self):
         # Default module raises an exception
         mod = pp.Module()
@@ -231,6 +321,75 @@ class TestModule(unittest.TestCase):
         self.ready_submod.lock()
         self.assertTrue(self.ready_submod.locked())
 
+        # Locking locks the submodules too, after which the fingerprint of the
+        # state is computed once
+        sub = pp.Module(inputs={'input x' : 1}, property_types=set([PT0()]),
+                        callback=lambda inputs, submods : {})
+        mod = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods : {},
+                        submods={('callback 0', PT0()) : sub})
+        fp = mod.state_fingerprint()
+        self.assertEqual(mod._state_fp, None)
+        mod.lock()
+        self.assertTrue(sub.locked())
+        self.assertEqual(mod.state_fingerprint(), fp)
+        self.assertEqual(mod._state_fp[0], fp)
+
+        # Changing a Module drops the cached fingerprints
+        copy = sub.unlocked_copy()
+        copy.change_input('input x', 2)
+        self.assertNotEqual(copy.state_fingerprint(), sub.state_fingerprint())
+        self.assertEqual(mod.state_fingerprint(), fp)
+
+        # but only its own and those of the Modules calling it
+        other = mod.unlocked_copy()
+        other.lock()
+        cached = other.state_fingerprint()
+        self.assertEqual(other._state_fp[0], cached)
+        top = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods : {},
+                        submods={('callback 0', PT0()) : mod})
+        top.lock()
+        top_fp = top.state_fingerprint()
+        self.assertEqual(top._state_fp[0], top_fp)
+        mod._unlocked = True
+        mod.change_submod('callback 0', copy)
+        self.assertEqual(mod._state_fp, None)
+        self.assertEqual(top._state_fp, None)
+        self.assertEqual(sub._state_fp[0], sub.state_fingerprint())
+        self.assertEqual(other._state_fp[0], cached)
+        self.assertEqual(list(sub._callers.values()), [other])
+
+
+    def test_lock_locks_submodules(self):
+        leaf = pp.Module(inputs={'input x' : 1}, property_types=set([PT0()]),
+                         callback=lambda inputs, submods :
+                             {'result 0' : inputs['input x']})
+        key = ('callback 0', PT0())
+        fxn = lambda inputs, submods : {'result 0' :
+                                        submods[key].run_as(PT0(), 0)}
+        mid = pp.Module(property_types=set([PT0()]), callback=fxn,
+                        submods={key : leaf})
+        top = pp.Module(property_types=set([PT0()]), callback=fxn,
+                        submods={key : mid})
+        self.assertEqual(top.run_as(PT0(), 0), 1)
+
+        # Running (which locks) a Module locks the whole tree
+        self.assertTrue(mid.locked())
+        self.assertTrue(leaf.locked())
+        self.assertRaises(RuntimeError, leaf.change_input, 'input x', 2)
+        self.assertRaises(RuntimeError, mid.change_submod, 'callback 0', leaf)
+
+        # Changes are made to unlocked copies instead
+        new_leaf = leaf.unlocked_copy()
+        new_leaf.change_input('input x', 2)
+        new_mid = mid.unlocked_copy()
+        new_mid.change_submod('callback 0', new_leaf)
+        new_top = top.unlocked_copy()
+        new_top.change_submod('callback 0', new_mid)
+        self.assertEqual(new_top.run_as(PT0(), 0), 2)
+        self.assertEqual(top.run_as(PT0(), 0), 1)
+
 
     def test_results(self):
         mod = pp.Module()
@@ -249,6 +408,30 @@ class TestModule(unittest.TestCase):
         corr = {'input 0' : None, 'input x' : None }
         self.assertEqual(mod0.inputs(), corr)
 
+        # The inputs are a read-only view which does not copy the values
+        big = list(range(100))
+        mod1 = self.ready_submod
+        mod1._state['inputs']['input y'] = big
+        with self.assertRaises(TypeError):
+            mod1.inputs()['input y'] = 1
+        self.assertTrue(mod1.inputs()['input y'] is big)
+
+        # Once locked, the same table is reused
+        mod1.lock()
+        table = mod1._defaults
+        mod1.run({'input 0' : 1})
+        self.assertTrue(mod1._defaults is table)
+        self.assertTrue(mod1.inputs()['input y'] is big)
+
+        # Values are checked for being set without comparing them
+        mod2 = self.not_ready_submod.unlocked_copy()
+        mod2.change_input('input x', Elementwise([1, 2]))
+        self.assertEqual(mod2.list_not_ready(),
+                         {'Inputs' : set(['input 0']), 'Submodules' : set()})
+        self.assertTrue(mod2.ready(PT0()))
+        self.assertTrue(isinstance(mod2.inputs()['input x'], Elementwise))
+        self.assertEqual(mod2.run_as(PT0(), 3), 3)
+
 
     def test_submods(self):
         mod = pp.Module()
@@ -262,6 +445,9 @@ class TestModule(unittest.TestCase):
         corr = {'callback 0' : self.ready_submod}
         self.assertEqual(mod0.submods(), corr)
 
+        # Submodules are not copied
+        self.assertTrue(mod0.submods()['callback 0'] is self.ready_submod)
+
 
     def test_property_types(self):
         mod = pp.Module()
@@ -375,6 +561,407 @@ class TestModule(unittest.TestCase):
         self.assertRaises(RuntimeError, mod1.run, inputs)
 
 
+    def test_run_caches_readiness(self):
+        nchecks = []
+        sub = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : inputs['input 0']})
+        ready = sub.ready
+        def counting_ready(pt):
+            nchecks.append(pt)
+            return ready(pt)
+        sub.ready = counting_ready
+
+        key = ('callback 0', PT0())
+        mod = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : submods[key].run_as(PT0(), 1)},
+                        submods={key : sub})
+        mod.turn_off_memoization()
+
+        # First call walks the submodules (once for ready and once for lock)
+        mod.run({'input 0' : 1})
+        self.assertEqual(len(nchecks), 2)
+
+        # Subsequent calls with the same inputs do not
+        mod.run({'input 0' : 2})
+        mod.run({'input 0' : 3})
+        self.assertEqual(len(nchecks), 2)
+
+        # Calls with a different set of inputs are checked (but not re-locked)
+        self.assertRaises(RuntimeError, mod.run, {})
+        self.assertEqual(len(nchecks), 3)
+
+
+    def test_run_memoization(self):
+        ncalls = []
+        def fxn(inputs, submods):
+            ncalls.append(inputs['input 0'])
+            return {'result 0' : inputs['input 0']}
+
+        mod = pp.Module(property_types=set([PT0()]), callback=fxn)
+
+        # Second call with the same inputs comes from the cache
+        self.assertEqual(mod.run({'input 0' : 42}), {'result 0' : 42})
+        self.assertEqual(mod.run({'input 0' : 42}), {'result 0' : 42})
+        self.assertEqual(ncalls, [42])
+
+        # Different inputs are a cache miss
+        self.assertEqual(mod.run({'input 0' : 3}), {'result 0' : 3})
+        self.assertEqual(ncalls, [42, 3])
+
+        # Unhashable, but fingerprintable, inputs are memoized
+        self.assertEqual(mod.run({'input 0' : [1]}), {'result 0' : [1]})
+        self.assertEqual(mod.run({'input 0' : [1]}), {'result 0' : [1]})
+        self.assertEqual(ncalls, [42, 3, [1]])
+
+        # Inputs which can not be fingerprinted are not memoized, but still run
+        x = object()
+        self.assertEqual(mod.run({'input 0' : x}), {'result 0' : x})
+        self.assertEqual(mod.run({'input 0' : x}), {'result 0' : x})
+        self.assertEqual(ncalls, [42, 3, [1], x, x])
+
+        # ... which includes inputs that contain themselves
+        y = [1]
+        y.append(y)
+        self.assertIs(mod.run({'input 0' : y})['result 0'], y)
+        self.assertIs(mod.run({'input 0' : y})['result 0'], y)
+        self.assertEqual(ncalls, [42, 3, [1], x, x, y, y])
+        del ncalls[-2:]
+
+        # Turning off memoization always runs the callback
+        mod.turn_off_memoization()
+        mod.run({'input 0' : 42})
+        self.assertEqual(ncalls, [42, 3, [1], x, x, 42])
+
+        # Resetting the cache forgets the results
+        mod.turn_on_memoization()
+        mod.reset_cache()
+        mod.run({'input 0' : 42})
+        self.assertEqual(ncalls, [42, 3, [1], x, x, 42, 42])
+
+        # Instances of subclasses of builtins, e.g., namedtuples, are memoized
+        pair = collections.namedtuple('Pair', ['a', 'b'])
+        self.assertEqual(mod.run({'input 0' : pair(1, 2)}),
+                         {'result 0' : (1, 2)})
+        self.assertEqual(mod.run({'input 0' : pair(1, 2)}),
+                         {'result 0' : (1, 2)})
+        self.assertEqual(ncalls, [42, 3, [1], x, x, 42, 42, (1, 2)])
+
+        # Callbacks which do not return results are run, but not memoized
+        pt = pp.PropertyType([('input 0', None)], [])
+        mod = pp.Module(property_types=set([pt]),
+                        callback=lambda inputs, submods : ncalls.append(0))
+        self.assertEqual(mod.run({'input 0' : 1}), None)
+        self.assertEqual(mod.run({'input 0' : 1}), None)
+        self.assertEqual(ncalls[-2:], [0, 0])
+        self.assertEqual(len(mod._cache), 0)
+
+
+    def test_run_request_sharing(self):
+        ncalls = []
+        def shared(inputs, submods):
+            ncalls.append(inputs['input 0'])
+            return {'result 0' : inputs['input 0'] * 2}
+
+        provider = pp.Module(property_types=set([PT0()]), callback=shared)
+        provider.turn_off_memoization()
+
+        def consumer(inputs, submods):
+            sub = submods[('callback 0', PT0())]
+            return {'result 0' : sub.run_as(PT0(), inputs['input 0'])}
+
+        key = ('callback 0', PT0())
+        c0 = pp.Module(property_types=set([PT0()]), callback=consumer,
+                       callback_name='c0', submods={key : provider})
+        c1 = pp.Module(property_types=set([PT0()]), callback=consumer,
+                       callback_name='c1', submods={key : provider})
+        for c in (c0, c1):
+            c.turn_off_memoization()
+
+        def fxn(inputs, submods):
+            x = inputs['input 0']
+            return {'result 0' : c0.run_as(PT0(), x) + c1.run_as(PT0(), x) +
+                                 provider.run_as(PT0(), x + 1)}
+
+        top = pp.Module(property_types=set([PT0()]), callback=fxn)
+        top.turn_off_memoization()
+
+        # Identical calls within one request run once
+        self.assertEqual(top.run_as(PT0(), 1), 8)
+        self.assertEqual(ncalls, [1, 2])
+
+        # but every request recomputes them
+        self.assertEqual(top.run_as(PT0(), 1), 8)
+        self.assertEqual(ncalls, [1, 2, 1, 2])
+
+        # unless sharing is turned off
+        provider.turn_off_request_sharing()
+        self.assertEqual(top.run_as(PT0(), 1), 8)
+        self.assertEqual(ncalls, [1, 2, 1, 2, 1, 1, 2])
+        provider.turn_on_request_sharing()
+        self.assertRaises(RuntimeError, pp.Module().turn_off_request_sharing)
+
+        # Results are shared per Module, not among Modules with equal states
+        c1._unlocked = True
+        c1.change_submod('callback 0', provider.unlocked_copy())
+        self.assertEqual(top.run_as(PT0(), 1), 8)
+        self.assertEqual(ncalls, [1, 2, 1, 2, 1, 1, 2, 1, 1, 2])
+
+        # Copies made (and dropped) during a request do not inherit the
+        # results of earlier copies, even if they reuse their address
+        scaled = pp.Module(property_types=set([PT0()]), inputs={'k' : 1},
+                           callback=lambda inputs, submods :
+                               {'result 0' : inputs['input 0'] * inputs['k']})
+        scaled.turn_off_memoization()
+
+        def run_copy(k, x):
+            mod = scaled.unlocked_copy()
+            mod.change_input('k', k)
+            return mod.run_as(PT0(), x)
+
+        def copies(inputs, submods):
+            x = inputs['input 0']
+            return {'result 0' : [run_copy(k, x) for k in (1, 2, 3)]}
+
+        top = pp.Module(property_types=set([PT0()]), callback=copies)
+        self.assertEqual(top.run_as(PT0(), 10), [10, 20, 30])
+
+
+    def test_run_memoization_submods(self):
+        sub = pp.Module(inputs={'input x' : 1}, property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : inputs['input x']})
+
+        def fxn(inputs, submods):
+            sub = submods[('callback 0', PT0())]
+            return {'result 0' : sub.run_as(PT0(), inputs['input 0'])}
+
+        mod = pp.Module(property_types=set([PT0()]),
+                        callback=fxn,
+                        submods={('callback 0', PT0()) : sub})
+
+        self.assertEqual(mod.run_as(PT0(), 0), 1)
+
+        # Changing the state of the submodule invalidates the cached result
+        sub._unlocked = True
+        sub.change_input('input x', 2)
+        self.assertEqual(mod.run_as(PT0(), 0), 2)
+
+
+    def test_submit_as(self):
+        pt = PT0()
+
+        # Without a scheduler the call runs immediately
+        mod0 = self.ready_submod
+        self.assertEqual(mod0.submit_as(pt, 42).result(), 42)
+
+        # Errors surface when the result is requested
+        mod1 = self.not_ready_submod
+        self.assertRaises(RuntimeError, mod1.submit_as(pt, 42).result)
+
+        scheduler = pp.Scheduler(max_workers=1)
+        mod0.set_scheduler(scheduler)
+        self.assertEqual(mod0.submit_as(pt, 3).result(), 3)
+        scheduler.shutdown()
+
+
+    def test_run_async(self):
+        inputs = {'input 0' : 42}
+        corr = {'result 0' : 42}
+
+        # Raises an error if no callback
+        mod = pp.Module()
+        self.assertRaises(RuntimeError, asyncio.run, mod.run_async(inputs))
+
+        # Synchronous callbacks run off of the event loop's thread
+        threads = []
+        def fxn(inputs, submods):
+            threads.append(threading.get_ident())
+            return {'result 0' : inputs['input 0']}
+        mod0 = pp.Module(property_types=set([PT0()]), callback=fxn)
+        self.assertEqual(asyncio.run(mod0.run_async(inputs)), corr)
+        self.assertNotEqual(threads, [threading.get_ident()])
+
+        # Results are memoized
+        self.assertEqual(asyncio.run(mod0.run_as_async(PT0(), 42)), 42)
+        self.assertEqual(len(threads), 1)
+
+        # Raises an error if not ready
+        mod1 = self.not_ready_submod
+        self.assertRaises(RuntimeError, asyncio.run, mod1.run_async(inputs))
+
+        # Raises an error if it does not satisfy the property type
+        mod0._state['property_types'] = set()
+        self.assertRaises(RuntimeError, asyncio.run,
+                          mod0.run_as_async(PT0(), 42))
+
+
+    def test_run_stream(self):
+        produced = []
+        def fxn(inputs, submods):
+            for i in range(inputs['input 0']):
+                produced.append(i)
+                yield {'result 0' : i}
+        mod = pp.Module(property_types=set([PT0()]), callback=fxn)
+
+        # Chunks are only produced when they are requested
+        chunks = mod.run_as_stream(PT0(), 3)
+        self.assertEqual(produced, [])
+        self.assertEqual(next(chunks), 0)
+        self.assertEqual(produced, [0])
+        self.assertEqual(list(chunks), [1, 2])
+        self.assertEqual(mod.stats()['calls'], 1)
+
+        # run gathers the chunks
+        self.assertEqual(mod.run_as(PT0(), 3), [0, 1, 2])
+
+        # With a buffer the callback runs ahead, but only so far
+        produced.clear()
+        chunks = mod.run_stream({'input 0' : 10}, buffer=2)
+        self.assertEqual(next(chunks), {'result 0' : 0})
+        time.sleep(0.05)
+        self.assertLessEqual(len(produced), 4)
+        self.assertEqual([c['result 0'] for c in chunks], list(range(1, 10)))
+
+        # Closing the stream early stops the callback
+        produced.clear()
+        chunks = mod.run_as_stream(PT0(), 100, buffer=2)
+        self.assertEqual(next(chunks), 0)
+        chunks.close()
+        time.sleep(0.3)
+        n = len(produced)
+        self.assertLessEqual(n, 5)
+        time.sleep(0.2)
+        self.assertEqual(len(produced), n)
+
+        # Errors reach the consumer
+        def bad(inputs, submods):
+            yield {'result 0' : 1}
+            raise ValueError('bad chunk')
+        mod = pp.Module(property_types=set([PT0()]), callback=bad)
+        for buffer in (0, 1):
+            chunks = mod.run_as_stream(PT0(), 1, buffer=buffer)
+            self.assertEqual(next(chunks), 1)
+            self.assertRaises(ValueError, next, chunks)
+
+        # Other callbacks are a single (memoized) chunk
+        mod0 = self.ready_submod
+        self.assertEqual(list(mod0.run_as_stream(PT0(), 42)), [42])
+        self.assertEqual(list(mod0.run_as_stream(PT0(), 42)), [42])
+        self.assertEqual(mod0.stats()['cache_hits'], 1)
+
+        # Validation happens up front
+        self.assertRaises(RuntimeError, self.not_ready_submod.run_stream,
+                          {'input 0' : 42})
+
+
+    def test_coroutine_callbacks(self):
+        async def leaf(inputs, submods):
+            await asyncio.sleep(0)
+            return {'result 0' : inputs['input 0'] + 1}
+
+        sub = pp.Module(property_types=set([PT0()]), callback=leaf)
+        key = ('callback 0', PT0())
+
+        async def fxn(inputs, submods):
+            x = inputs['input 0']
+            a, b = await asyncio.gather(submods[key].run_as_async(PT0(), x),
+                                        submods[key].run_as_async(PT0(), x))
+            return {'result 0' : a + b}
+
+        mod = pp.Module(property_types=set([PT0()]), callback=fxn,
+                        submods={key : sub})
+        self.assertEqual(asyncio.run(mod.run_as_async(PT0(), 1)), 4)
+
+        # Coroutine callbacks also work synchronously, outside an event loop
+        self.assertEqual(mod.run_as(PT0(), 2), 6)
+
+        # But not synchronously from inside an event loop
+        async def run_sync():
+            return mod.run_as(PT0(), 3)
+        self.assertRaises(RuntimeError, asyncio.run, run_sync())
+
+
+    def test_run_as_batch(self):
+        pt = PT0()
+
+        # Raises an error if no callback
+        mod = pp.Module()
+        self.assertRaises(RuntimeError, mod.run_as_batch, pt, [(1,)])
+
+        # Row-wise
+        mod0 = self.ready_submod
+        self.assertEqual(mod0.run_as_batch(pt, [(1,), (2,), (3,)]), [1, 2, 3])
+        self.assertEqual(mod0.run_as_batch(pt, []), [])
+
+        # Column-wise
+        self.assertEqual(mod0.run_as_batch(pt, {'input 0' : [1, 2]}), [1, 2])
+
+        # Raises an error if not ready
+        mod1 = self.not_ready_submod
+        self.assertRaises(RuntimeError, mod1.run_as_batch, pt, [(1,)])
+
+        # Raises an error if it does not satisfy the property type
+        mod0._state['property_types'] = set()
+        self.assertRaises(RuntimeError, mod0.run_as_batch, pt, [(1,)])
+
+
+    def test_run_batch(self):
+        ncalls = []
+        def fxn(inputs, submods):
+            ncalls.append(inputs['input 0'])
+            return {'result 0' : inputs['input 0'] + inputs['input x']}
+
+        mod = pp.Module(property_types=set([PT0()]),
+                        inputs={'input x' : 10},
+                        callback=fxn)
+
+        # Rows are memoized individually
+        rows = [{'input 0' : 1}, {'input 0' : 2}, {'input 0' : 1}]
+        corr = [{'result 0' : 11}, {'result 0' : 12}, {'result 0' : 11}]
+        self.assertEqual(mod.run_batch(rows), corr)
+        self.assertEqual(ncalls, [1, 2])
+
+        # Columns
+        corr = {'result 0' : [11, 13]}
+        self.assertEqual(mod.run_batch({'input 0' : [1, 3]}), corr)
+        self.assertEqual(ncalls, [1, 2, 3])
+
+        # Columns must be the same length
+        self.assertRaises(ValueError, mod.run_batch, {'input 0' : [1],
+                                                      'input x' : [1, 2]})
+
+        # Not ready if any row is missing an input
+        self.assertRaises(RuntimeError, mod.run_batch, [{'input 0' : 1}, {}])
+
+
+    def test_run_batch_callback(self):
+        nbatches = []
+        def batch_fxn(inputs, submods):
+            nbatches.append(len(inputs['input 0']))
+            x = inputs['input x']
+            return {'result 0' : [v + x for v in inputs['input 0']]}
+
+        mod = pp.Module(property_types=set([PT0()]),
+                        inputs={'input x' : 10},
+                        callback=lambda inputs, submods : None,
+                        batch_callback=batch_fxn)
+
+        # The batch callback is called once for all rows
+        rows = [{'input 0' : 1}, {'input 0' : 2}]
+        corr = [{'result 0' : 11}, {'result 0' : 12}]
+        self.assertEqual(mod.run_batch(rows), corr)
+        self.assertEqual(nbatches, [2])
+
+        # Columns are forwarded as is
+        cols = {'input 0' : (1, 2, 3)}
+        self.assertEqual(mod.run_batch(cols), {'result 0' : [11, 12, 13]})
+        self.assertEqual(nbatches, [2, 3])
+
+        self.assertEqual(mod.run_as_batch(PT0(), [(1,), (5,)]), [11, 15])
+
+
     def test_comparisons(self):
         lhs, rhs = pp.Module(), pp.Module()
 
@@ -1,4 +1,7 @@
 import pluginplay as pp
+import asyncio
+import os
+import tempfile
 import unittest
 
 class PT0(pp.PropertyType):
@@ -47,6 +50,92 @@ class TestModuleManager(unittest.TestCase):
         self.assertRaises(KeyError, mm.add_module, 'Module 0', None)
 
 
+    def test_add_lazy_module(self):
+        mm = self.mm
+        made = []
+        def factory():
+            made.append(1)
+            return pp.Module(property_types=set([PT0()]),
+                             callback=lambda inputs, submods :
+                                 {'result 0' : inputs['input 0'] + 1})
+
+        mm.add_lazy_module('Lazy', factory)
+        self.assertTrue('Lazy' in mm)
+        self.assertEqual(set(mm.keys()), set(['Module 0', 'Module 1', 'Lazy']))
+        self.assertRaises(KeyError, mm.add_module, 'Lazy', self.mod0)
+        self.assertRaises(KeyError, mm.add_lazy_module, 'Module 0', factory)
+
+        # Copying and renaming do not make the Module
+        mm.copy_module('Lazy', 'Lazy copy')
+        mm.rename_module('Lazy copy', 'Lazy 2')
+        self.assertFalse('Lazy copy' in mm)
+        self.assertEqual(made, [])
+
+        # The Module is made once, on first use
+        self.assertEqual(mm.run_as(PT0(), 'Lazy', 1), 2)
+        self.assertEqual(mm.run_as(PT0(), 'Lazy', 2), 3)
+        self.assertEqual(made, [1])
+
+        # Binding it as a submodule makes it too
+        mm.change_submod('Module 1', 'callback 0', 'Lazy 2')
+        self.assertEqual(made, [1, 1])
+        self.assertTrue(mm['Module 1'].submods()['callback 0'] is mm['Lazy 2'])
+
+        # Erasing a Module which has not been made forgets it
+        mm.add_lazy_module('Never made', factory)
+        mm.erase('Never made')
+        self.assertFalse('Never made' in mm)
+        self.assertEqual(made, [1, 1])
+
+
+    def test_add_lazy_module_by_name(self):
+        mm = self.mm
+        mm.add_lazy_module('Lazy', 'unit_tests.test_registry:Scale')
+        self.assertEqual(mm['Lazy']._factory, 'unit_tests.test_registry:Scale')
+
+        mm.add_lazy_module('Missing', 'not_a_package.not_a_module:Missing')
+        self.assertRaises(ImportError, mm.__getitem__, 'Missing')
+        self.assertTrue('Missing' in mm)
+
+
+    def test_snapshot(self):
+        from unit_tests import test_registry as reg
+
+        mm = pp.ModuleManager()
+        mm.add_module('Scale', reg.Scale())
+        mm.add_module('Sum', reg.Sum())
+        mm.add_module('Alias', mm['Scale'])
+        mm.add_lazy_module('Lazy', 'unit_tests.test_registry:Scale')
+        mm.add_lazy_module('Lazy class', reg.Scale)
+        mm.change_input('Scale', 'factor', 10)
+        mm.change_submod('Sum', 'lhs', 'Scale')
+        mm.change_submod('Sum', 'rhs', 'Alias')
+
+        restored = pp.ModuleManager()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'config.pkl')
+            mm.save(path)
+            restored.load(path)
+
+        self.assertEqual(set(restored.keys()), set(mm.keys()))
+        self.assertTrue('Lazy' in restored._lazy)
+        self.assertEqual(restored._lazy['Lazy class'],
+                         'unit_tests.test_registry:Scale')
+        self.assertEqual(restored.run_as(reg.PT0(), 'Lazy class', 1), 2)
+        self.assertTrue(restored['Scale'] is restored['Alias'])
+        self.assertFalse(restored['Scale'] is mm['Scale'])
+        self.assertEqual(restored.run_as(reg.PT0(), 'Sum', 1), 20)
+        self.assertEqual(restored.call_graph().submods('Sum'),
+                         {'lhs' : 'Scale', 'rhs' : 'Scale'})
+
+        # Modules without a factory can not be described
+        self.assertRaises(RuntimeError, self.mm.snapshot)
+
+        # ... and neither can lazy factories which can not be imported
+        mm.add_lazy_module('Lambda', lambda : reg.Scale())
+        self.assertRaises(RuntimeError, mm.snapshot)
+
+
     def test_getitem(self):
         mm = self.mm
         self.assertEqual(mm['Module 0'], self.mod0)
@@ -107,6 +196,44 @@ class TestModuleManager(unittest.TestCase):
         self.assertEqual(mm['Module 1'].inputs()['input x'], 42)
 
 
+    def test_change_forgets_old_state(self):
+        mm = self.mm
+        leaf = pp.Module(property_types=set([PT0()]),
+                         inputs={'factor' : 2},
+                         callback=lambda inputs, submods :
+                             {'result 0' : inputs['input 0'] * inputs['factor']})
+        sub_key = ('callback 0', PT0())
+        top = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : submods[sub_key].run_as(PT0(),
+                                                   inputs['input 0']) + 1},
+                        submods={sub_key : leaf})
+        mm.add_module('leaf', leaf)
+        mm.add_module('top', top)
+        mm.run_as(PT0(), 'top', 1)
+        mm.run_as(PT0(), 'top', 2)
+        mm.run_as(PT0(), 'Module 0', 3)
+
+        # The copies share the cached results
+        mm.copy_module('leaf', 'leaf 2')
+        mm.copy_module('top', 'top 2')
+        self.assertEqual(len(mm['top 2']._cache), 2)
+
+        # A copy gets its own cache once it is changed, even if its state is
+        # the same as before
+        mm.change_submod('top 2', 'callback 0', 'leaf 2')
+        self.assertEqual(len(mm['top 2']._cache), 0)
+        self.assertEqual(len(mm['top']._cache), 2)
+
+        # Changing the leaf only forgets its own results
+        mm.change_input('leaf 2', 'factor', 3)
+        self.assertEqual(len(mm['leaf 2']._cache), 0)
+        self.assertEqual(len(mm['top']._cache), 2)
+        self.assertEqual(len(mm['leaf']._cache), 2)
+        self.assertEqual(len(mm['Module 0']._cache), 1)
+        self.assertEqual(mm.run_as(PT0(), 'top 2', 1), 4)
+
+
     def test_change_submod(self):
         mm = self.mm
 
@@ -129,6 +256,89 @@ class TestModuleManager(unittest.TestCase):
         self.assertEqual(mm['Module 1']._state['submods'][submod_key], corr)
 
 
+    def test_set_cache_policy(self):
+        mm = self.mm
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.set_cache_policy, 'not a key')
+
+        mm.set_cache_policy('Module 0', 'lfu', max_entries=2)
+        corr = {'policy' : 'lfu', 'max_entries' : 2, 'max_bytes' : None,
+                'ttl' : None, 'budget' : None}
+        self.assertEqual(mm['Module 0']._cache.config(), corr)
+
+
+    def test_set_memory_budget(self):
+        mm = self.mm
+        mm.set_memory_budget(1000)
+        budget = mm['Module 0']._cache.budget()
+        self.assertEqual(budget.max_bytes(), 1000)
+        self.assertTrue(mm['Module 1']._cache.budget() is budget)
+
+        # Modules added later share it, as do caches made by set_cache_policy
+        mm.copy_module('Module 0', 'Module 2')
+        mm.add_module('Module 3', pp.Module(property_types=set([PT0()]),
+                                            callback=lambda i, s : {}))
+        mm.set_cache_policy('Module 3', max_entries=2)
+        self.assertTrue(mm['Module 3']._cache.budget() is budget)
+
+        # Results of all Modules count against the budget
+        for i in range(50):
+            mm.run_as(PT0(), 'Module 0', 'x' * i)
+        self.assertTrue(mm['Module 0']._cache.nbytes() <= 1000)
+        self.assertTrue(len(mm['Module 0']._cache) < 50)
+
+        mm.set_memory_budget(None)
+        self.assertEqual(mm['Module 0']._cache.budget(), None)
+
+
+    def test_memory_report(self):
+        mm = self.mm
+        mm.run_as(PT0(), 'Module 0', 'x' * 100)
+        mm.copy_module('Module 0', 'Module 2')
+        mm.add_lazy_module('Lazy', lambda : self.mod0)
+
+        report = mm.memory_report()
+        mods = report['modules']
+        self.assertEqual(set(mods), {'Module 0', 'Module 1', 'Module 2'})
+        self.assertEqual(mods['Module 0']['entries'], 1)
+        self.assertTrue(mods['Module 0']['cache'] > 100)
+        self.assertTrue(mods['Module 1']['inputs'] > 0)
+
+        # The copy shares the cache and inputs, which are counted once
+        self.assertEqual(mods['Module 2'], mods['Module 0'])
+        total = report['total']
+        self.assertEqual(total['cache'], mods['Module 0']['cache'])
+        self.assertEqual(total['entries'], 1)
+        self.assertEqual(total['inputs'],
+                         mods['Module 0']['inputs'] + mods['Module 1']['inputs'])
+        self.assertEqual(total['budget'], None)
+
+
+    def test_set_result_store(self):
+        mm = self.mm
+        store = pp.ResultStore(':memory:')
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.set_result_store, 'not a key', store)
+
+        mm.set_result_store('Module 0', store)
+        self.assertTrue(mm['Module 0']._store is store)
+
+
+    def test_set_scheduler(self):
+        mm = self.mm
+        scheduler = pp.Scheduler(max_workers=1)
+
+        mm.set_scheduler(scheduler)
+        self.assertTrue(mm['Module 0']._scheduler is scheduler)
+
+        # Modules added later also get the scheduler
+        mm.add_module('Module 2', pp.Module())
+        self.assertTrue(mm['Module 2']._scheduler is scheduler)
+        scheduler.shutdown()
+
+
     def test_run_as(self):
         mm = self.mm
 
@@ -139,3 +349,104 @@ class TestModuleManager(unittest.TestCase):
 
         # Can actually be run
         self.assertEqual(mm.run_as(pt, 'Module 0', 42), 42)
+
+
+    def test_run_as_stream(self):
+        mm = self.mm
+
+        pt = PT0()
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.run_as_stream, pt, 'not a key', None)
+
+        # Can actually be run
+        self.assertEqual(list(mm.run_as_stream(pt, 'Module 0', 42)), [42])
+        self.assertEqual(list(mm.run_as_stream(pt, 'Module 0', 42, buffer=1)),
+                         [42])
+
+
+    def test_run_as_batch(self):
+        mm = self.mm
+
+        pt = PT0()
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.run_as_batch, pt, 'not a key', [(1,)])
+
+        # Can actually be run
+        self.assertEqual(mm.run_as_batch(pt, 'Module 0', [(1,), (2,)]), [1, 2])
+        self.assertEqual(mm.run_as_batch(pt, 'Module 0', {'input 0' : [3]}),
+                         [3])
+
+
+    def test_submit_as(self):
+        mm = self.mm
+
+        pt = PT0()
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.submit_as, pt, 'not a key', None)
+
+        # Can actually be run
+        self.assertEqual(mm.submit_as(pt, 'Module 0', 42).result(), 42)
+
+
+    def test_run_as_async(self):
+        mm = self.mm
+
+        pt = PT0()
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, asyncio.run,
+                          mm.run_as_async(pt, 'not a key', None))
+
+        # Can actually be run
+        self.assertEqual(asyncio.run(mm.run_as_async(pt, 'Module 0', 42)), 42)
+
+
+    def test_sweep(self):
+        mm = self.mm
+        pt = PT0()
+        calls = []
+
+        def leaf_fxn(inputs, submods):
+            calls.append(inputs['input 0'])
+            return {'result 0' : inputs['input 0'] ** 2}
+
+        sub_key = ('callback 0', pt)
+        leaf = pp.Module(property_types=set([pt]), callback=leaf_fxn)
+        top = pp.Module(property_types=set([pt]),
+                        inputs={'scale' : 1},
+                        callback=lambda inputs, submods :
+                            {'result 0' : inputs['scale'] *
+                             submods[sub_key].run_as(pt, inputs['input 0'])},
+                        submods={sub_key : leaf})
+        mm.add_module('leaf', leaf)
+        mm.add_module('top', top)
+
+        # Raises an error if module key is not valid
+        self.assertRaises(KeyError, mm.sweep, pt, 'not a key', {})
+
+        # Raises an error if a name is not an input
+        self.assertRaises(KeyError, mm.sweep, pt, 'top', {'not an input' : [1]})
+
+        # Raises an error if a call-site input is missing
+        self.assertRaises(RuntimeError, mm.sweep, pt, 'top', {'scale' : [1]})
+
+        rv = mm.sweep(pt, 'top', {'scale' : [1, 10], 'input 0' : [1, 2, 3]})
+        self.assertEqual(rv['inputs'], {'scale' : [1, 1, 1, 10, 10, 10],
+                                        'input 0' : [1, 2, 3, 1, 2, 3]})
+        self.assertEqual(rv['results'], {'result 0' : [1, 4, 9, 10, 40, 90]})
+
+        # The submodule ran once per distinct call, and top is unchanged
+        self.assertEqual(sorted(calls), [1, 2, 3])
+        self.assertEqual(mm['top'].inputs()['scale'], 1)
+
+        # Points can be run by the scheduler
+        scheduler = pp.Scheduler(max_workers=2)
+        mm.set_scheduler(scheduler)
+        rv = mm.sweep(pt, 'top', {'input 0' : [3, 4]})
+        scheduler.shutdown()
+        self.assertEqual(rv['results'], {'result 0' : [9, 16]})
+        self.assertEqual(sorted(calls), [1, 2, 3, 4])
+
@@ -0,0 +1,190 @@
+import pluginplay as pp
+from pluginplay import plugins
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unit_tests import test_registry
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class PT1(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+# Number of times load_modules has been called
+n_loads = 0
+
+
+def load_modules(mm):
+    """The hook of the fake plugin."""
+
+    global n_loads
+    n_loads += 1
+
+    fxn = lambda inputs, submods : {'result 0' : inputs['input 0'] + 1}
+    mm.add_module('Add one', pp.Module(callback=fxn,
+                                       property_types={PT1()},
+                                       submods={('helper', PT0()) : None}))
+    mm.add_lazy_module('Scale', 'unit_tests.test_registry:Scale')
+    mm.change_input('Scale', 'factor', 10)
+    mm.add_module('Sum', test_registry.Sum())
+    mm.change_submod('Sum', 'lhs', 'Scale')
+    mm.change_submod('Sum', 'rhs', 'Scale')
+    mm['Sum'].turn_off_request_sharing()
+
+    # Binding a Module the plugin did not add under a key makes the
+    # configuration impossible to record
+    hidden = test_registry.Scale()
+    hidden.change_input('factor', 3)
+    hidden.set_result_store(pp.ResultStore(':memory:'))
+    hidden.set_scheduler(pp.Scheduler(max_workers=1))
+    mm.add_module('Mixed sum', test_registry.Sum())
+    mm['Mixed sum'].change_submod('lhs', hidden)
+    mm.change_submod('Mixed sum', 'rhs', 'Scale')
+
+
+class TestPlugins(unittest.TestCase):
+
+    group = 'pluginplay.test_plugins'
+
+    def setUp(self):
+        # Installs a fake distribution advertising the hook above
+        self.dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.dir, 'cache', 'manifest.json')
+        self.install('1.0')
+        sys.path.append(self.dir)
+
+
+    def tearDown(self):
+        plugins._loaded.clear()
+        sys.path.remove(self.dir)
+        shutil.rmtree(self.dir)
+        importlib.invalidate_caches()
+
+
+    def install(self, version):
+        """(Re)installs version ``version`` of the fake distribution."""
+
+        for f in os.listdir(self.dir):
+            if f.endswith('.dist-info'):
+                shutil.rmtree(os.path.join(self.dir, f))
+        info = os.path.join(self.dir, 'fake_plugin-%s.dist-info' % version)
+        os.mkdir(info)
+        with open(os.path.join(info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.1\nName: fake-plugin\n')
+            f.write('Version: %s\n' % version)
+        with open(os.path.join(info, 'entry_points.txt'), 'w') as f:
+            f.write('[%s]\n' % self.group)
+            f.write('fake = unit_tests.test_plugins:load_modules\n')
+        importlib.invalidate_caches()
+
+
+    def test_discover(self):
+        global n_loads
+        n_loads = 0
+        manifest = plugins.discover(self.group, self.cache_path)
+        self.assertEqual(n_loads, 1)
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        mods = manifest['plugins']['fake']['modules']
+        self.assertEqual(set(mods),
+                         set(['Add one', 'Scale', 'Sum', 'Mixed sum']))
+        self.assertEqual(mods['Add one']['property_types'],
+                         ['unit_tests.test_plugins:PT1'])
+        self.assertEqual(mods['Add one']['submods'],
+                         [['helper', 'unit_tests.test_plugins:PT0']])
+        self.assertEqual(mods['Add one']['factory'], None)
+        self.assertEqual(mods['Add one']['config'], None)
+        self.assertEqual(mods['Scale']['factory'],
+                         'unit_tests.test_registry:Scale')
+        self.assertEqual(mods['Scale']['config'],
+                         {'inputs' : {'factor' : 10}, 'submods' : {},
+                          'memoizable' : True, 'share_in_request' : True})
+        self.assertEqual(mods['Sum']['config'],
+                         {'inputs' : {},
+                          'submods' : {'lhs' : 'Scale', 'rhs' : 'Scale'},
+                          'memoizable' : True, 'share_in_request' : False})
+        self.assertEqual(mods['Mixed sum']['config'], None)
+
+        # The cached manifest is used until the installed plugins change
+        self.assertEqual(plugins.discover(self.group, self.cache_path),
+                         manifest)
+        self.assertEqual(n_loads, 1)
+        self.install('1.1')
+        plugins.discover(self.group, self.cache_path)
+        self.assertEqual(n_loads, 2)
+        plugins.discover(self.group, self.cache_path, refresh=True)
+        self.assertEqual(n_loads, 3)
+
+
+    def test_find_modules(self):
+        manifest = plugins.discover(self.group, self.cache_path)
+        self.assertEqual(plugins.find_modules(manifest),
+                         {'Add one' : 'fake', 'Scale' : 'fake',
+                          'Sum' : 'fake', 'Mixed sum' : 'fake'})
+        self.assertEqual(plugins.find_modules(manifest, PT1()),
+                         {'Add one' : 'fake'})
+
+
+    def test_load_plugins(self):
+        global n_loads
+        plugins.discover(self.group, self.cache_path)
+        n_loads = 0
+
+        mm = pp.ModuleManager()
+        mm.load_plugins(self.group, self.cache_path)
+        self.assertEqual(set(mm.keys()),
+                         set(['Add one', 'Scale', 'Sum', 'Mixed sum']))
+        self.assertEqual(n_loads, 0)
+
+        # Modules are configured (and wired) as the plugin configured them
+        self.assertEqual(mm.run_as(test_registry.PT0(), 'Scale', 1), 10)
+        self.assertEqual(mm.run_as(test_registry.PT0(), 'Sum', 1), 20)
+        self.assertIs(mm['Sum'].submods()['lhs'], mm['Scale'])
+        self.assertFalse(mm['Sum']._share_in_request)
+        self.assertEqual(n_loads, 0)
+        self.assertEqual(mm['Add one'].property_types(), {PT1()})
+        self.assertEqual(n_loads, 1)
+
+        # The plugin is loaded once, however many ModuleManagers use it
+        mm2 = pp.ModuleManager()
+        mm2.load_plugins(self.group, self.cache_path)
+        self.assertEqual(mm2['Add one'].property_types(), {PT1()})
+        self.assertIsNot(mm2['Add one'], mm['Add one'])
+        self.assertEqual(n_loads, 1)
+
+        # Modules copied from the plugin do not share submodules, except
+        # those bound by key, which are the ModuleManager's
+        for m in (mm, mm2):
+            self.assertEqual(m.run_as(test_registry.PT0(), 'Mixed sum', 1), 13)
+            self.assertIs(m['Mixed sum'].submods()['rhs'], m['Scale'])
+        self.assertIsNot(mm['Mixed sum'].submods()['lhs'],
+                         mm2['Mixed sum'].submods()['lhs'])
+        self.assertIsNot(mm['Mixed sum'].submods()['lhs']._cache,
+                         mm2['Mixed sum'].submods()['lhs']._cache)
+
+        # but the copies share the store and the Scheduler of the original
+        lhs = [m['Mixed sum'].submods()['lhs'] for m in (mm, mm2)]
+        self.assertIs(lhs[0]._store, lhs[1]._store)
+        self.assertIs(lhs[0]._scheduler, lhs[1]._scheduler)
+        self.assertTrue(isinstance(lhs[0]._store, pp.ResultStore))
+        self.assertEqual(n_loads, 1)
+
+        self.assertRaises(KeyError, mm.load_plugins, self.group,
+                          self.cache_path)
@@ -1,4 +1,6 @@
 from pluginplay import property_type
+import copy
+import pickle
 import unittest
 
 # Define some example property types for unit testing purposes
@@ -29,6 +31,15 @@ class PT2(property_type.PropertyType):
         return super().__init__(inputs, results)
 
 
+class PT3(property_type.PropertyType):
+    """Effective signature: (input0 = 1, input1 = None)"""
+
+    def __init__(self):
+        inputs = [('input 0', 1), ('input 1', None)]
+        results = []
+        return super().__init__(inputs, results)
+
+
 class TestPropertyType(unittest.TestCase):
 
     def test_ctor(self):
@@ -95,6 +106,14 @@ class TestPropertyType(unittest.TestCase):
         inputs = {}
         self.assertRaises(RuntimeError, pt0.wrap_inputs, inputs)
 
+        # A default before an input without one does not help
+        pt3 = PT3()
+        self.assertRaises(RuntimeError, pt3.wrap_inputs, {})
+        self.assertRaises(RuntimeError, pt3.wrap_inputs, {}, 2)
+        inputs = {}
+        pt3.wrap_inputs(inputs, 2, 3)
+        self.assertEqual(inputs, {'input 0' : 2, 'input 1' : 3})
+
 
     def test_wrap_results(self):
         pt0 = PT0()
@@ -160,15 +179,47 @@ class TestPropertyType(unittest.TestCase):
         # Raises an error if a key is not in the inputs
         self.assertRaises(KeyError, pt0.unwrap_results, {})
 
+        # No results unwraps to an empty list
+        self.assertEqual(PT3().unwrap_results(inputs), [])
+
+    def test_pickle(self):
+        pt2 = pickle.loads(pickle.dumps(PT2()))
+        self.assertEqual(pt2, PT2())
+        self.assertEqual(pt2.unwrap_inputs({'input 0' : 0, 'input 1' : 1}),
+                         [0, 1])
+        self.assertEqual(pt2.unwrap_results({'result 0' : 0, 'result 1' : 1}),
+                         [0, 1])
+
+    def test_interning(self):
+        self.assertTrue(PT0() is PT0())
+        self.assertFalse(PT0() is PT1())
+        self.assertTrue(copy.deepcopy(PT0()) is PT0())
+        self.assertEqual(hash(PT0()), hash(PT0()))
+
+        # Unhashable ctor arguments make a new instance
+        pt = property_type.PropertyType([('input 0', None)], ['result 0'])
+        self.assertFalse(pt is property_type.PropertyType([('input 0', None)],
+                                                          ['result 0']))
+        self.assertEqual(pt, property_type.PropertyType([('input 0', None)],
+                                                        ['result 0']))
+
     def test_comparisons(self):
         pt0 = PT0()
         self.assertEqual(pt0, PT0())
 
-        #Different initial value
-        diff_default = PT0()
-        diff_default._inputs[0] = ('input 0', 42)
+        #Different initial value (PT0() is interned, so it can't be modified)
+        diff_default = copy.copy(pt0)
+        diff_default._inputs = [('input 0', 42)]
         self.assertNotEqual(pt0, diff_default)
 
+        # Same inputs and results, but a different type
+        class PT0Too(property_type.PropertyType):
+            def __init__(self):
+                super().__init__([('input 0', None)], ['result 0'])
+
+        self.assertNotEqual(pt0, PT0Too())
+        self.assertNotEqual(pt0, None)
+
         # Different inputs
         pt1 = PT1()
         self.assertNotEqual(pt0, pt1)
@@ -0,0 +1,153 @@
+import pluginplay as pp
+from pluginplay import registry, scheduler
+import os
+import unittest
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class Scale(pp.Module):
+    """Multiplies input 0 by a bound factor."""
+
+    def __init__(self):
+        def fxn(inputs, _):
+            return {'result 0' : inputs['input 0'] * inputs['factor']}
+
+        super().__init__(property_types=set([PT0()]),
+                         inputs={'factor' : 2},
+                         callback=fxn,
+                         callback_name='Scale')
+
+
+class Pid(pp.Module):
+    """Returns the id of the process it ran in."""
+
+    def __init__(self):
+        def fxn(inputs, _):
+            return {'result 0' : os.getpid()}
+
+        super().__init__(property_types=set([PT0()]),
+                         callback=fxn,
+                         callback_name='Pid')
+
+
+class Sum(pp.Module):
+    """Adds the results of two submodules."""
+
+    def __init__(self):
+        keys = [('lhs', PT0()), ('rhs', PT0())]
+        def fxn(inputs, submods):
+            x = inputs['input 0']
+            return {'result 0' : sum(submods[k].run_as(PT0(), x)
+                                     for k in keys)}
+
+        super().__init__(property_types=set([PT0()]),
+                         callback=fxn,
+                         callback_name='Sum',
+                         submods={k : None for k in keys})
+
+
+def make_scale_by_3():
+    mod = Scale()
+    mod.change_input('factor', 3)
+    return mod
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_factory_name(self):
+        self.assertEqual(registry.factory_name(Scale()),
+                         __name__ + ':Scale')
+
+        # Plain Modules can not be rebuilt
+        mod = pp.Module(callback=lambda inputs, submods : {})
+        self.assertRaises(RuntimeError, registry.factory_name, mod)
+
+        # Unless they say where they came from
+        mod._factory = 'my factory'
+        self.assertEqual(registry.factory_name(mod), 'my factory')
+
+
+    def test_resolve_factory(self):
+        self.assertTrue(registry.resolve_factory(__name__ + ':Scale') is Scale)
+        self.assertRaises(KeyError, registry.resolve_factory, 'not a factory')
+        self.assertRaises(AttributeError, registry.resolve_factory,
+                          __name__ + ':NotAClass')
+
+        registry.register_factory('scale by 3', make_scale_by_3)
+        mod = registry.make_module('scale by 3')
+        self.assertEqual(mod._factory, 'scale by 3')
+        self.assertEqual(mod.run_as(PT0(), 2), 6)
+
+
+    def test_round_trip(self):
+        lhs = Scale()
+        lhs.change_input('factor', 10)
+        mod = Sum()
+        mod.change_submod('lhs', lhs)
+        mod.change_submod('rhs', lhs)
+
+        spec = registry.module_spec(mod)
+        self.assertEqual(len(spec['modules']), 2)
+
+        rebuilt = registry.build_module(spec)
+        self.assertEqual(type(rebuilt), Sum)
+        self.assertEqual(rebuilt.run_as(PT0(), 1), 20)
+
+        # Bound inputs and aliasing are preserved
+        subs = rebuilt._state['submods']
+        self.assertEqual(subs[('lhs', PT0())].inputs()['factor'], 10)
+        self.assertTrue(subs[('lhs', PT0())] is subs[('rhs', PT0())])
+
+
+class TestProcessScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = pp.ProcessScheduler(max_workers=2)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+
+    def test_submit_as(self):
+        mod = Sum()
+        mod.change_submod('lhs', Scale())
+        mod.change_submod('rhs', Pid())
+        mod.set_scheduler(self.scheduler)
+
+        rv = mod.submit_as(PT0(), 1).result(timeout=30)
+        self.assertNotEqual(rv - 2, os.getpid())
+        self.assertTrue(mod.locked())
+
+        # Modules which can not be rebuilt are rejected
+        bad = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : inputs['input 0']})
+        bad.set_scheduler(self.scheduler)
+        self.assertRaises(RuntimeError, bad.submit_as, PT0(), 1)
+
+        # Once the calls are done, the scheduler no longer holds onto them
+        self.scheduler.shutdown()
+        self.assertEqual(self.scheduler._pending, {})
+
+        # Rebuilt Modules are reused, but only so many are kept
+        spec = registry.module_spec(mod)
+        self.assertEqual(scheduler._run_spec(spec, PT0(), (1,)),
+                         os.getpid() + 2)
+        n = len(scheduler._worker_modules)
+        self.assertEqual(scheduler._run_spec(spec, PT0(), (1,)),
+                         os.getpid() + 2)
+        self.assertEqual(len(scheduler._worker_modules), n)
+        self.assertEqual(scheduler._worker_modules.config()['max_entries'], 64)
+
+
+    def test_submit(self):
+        f = self.scheduler.submit(os.getpid)
+        self.assertNotEqual(f.result(timeout=30), os.getpid())
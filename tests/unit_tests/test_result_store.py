@@ -0,0 +1,115 @@
+import pluginplay as pp
+import copy
+import os
+import pickle
+import tempfile
+import unittest
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'results.db')
+        self.store = pp.ResultStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+
+    def test_dict_api(self):
+        store = self.store
+        self.assertEqual(store.path(), self.path)
+        self.assertFalse('a' in store)
+        self.assertRaises(KeyError, store.__getitem__, 'a')
+        self.assertEqual(store.get('a'), None)
+        self.assertEqual(store.get('a', 42), 42)
+
+        store['a'] = {'result 0' : [1, 2, 3]}
+        self.assertTrue('a' in store)
+        self.assertEqual(store['a'], {'result 0' : [1, 2, 3]})
+        self.assertEqual(store.get('a', 42), {'result 0' : [1, 2, 3]})
+        self.assertEqual(len(store), 1)
+
+        del store['a']
+        self.assertFalse('a' in store)
+
+        store['b'] = 1
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+
+    def test_persistence(self):
+        self.store['a'] = 42
+        self.store.close()
+
+        self.store = pp.ResultStore(self.path)
+        self.assertEqual(self.store['a'], 42)
+
+
+    def test_copy_and_pickle(self):
+        # Copies share the store
+        self.assertTrue(copy.deepcopy(self.store) is self.store)
+
+        # Pickling reopens the same file
+        self.store['a'] = 42
+        other = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(other['a'], 42)
+        other.close()
+
+
+    def test_module_uses_store(self):
+        ncalls = []
+        def make_module():
+            def fxn(inputs, submods):
+                ncalls.append(inputs['input 0'])
+                return {'result 0' : inputs['input 0'] * inputs['input x']}
+            return pp.Module(property_types=set([PT0()]),
+                             callback=fxn,
+                             callback_name='fxn',
+                             inputs={'input x' : 2})
+
+        mod = make_module()
+        mod.set_result_store(self.store)
+        self.assertEqual(mod.run_as(PT0(), 3), 6)
+        self.assertEqual(ncalls, [3])
+
+        # A "restarted" module (new instance, empty cache) reuses the result
+        mod = make_module()
+        mod.set_result_store(self.store)
+        self.assertEqual(mod.run_as(PT0(), 3), 6)
+        self.assertEqual(ncalls, [3])
+
+        # Different bound inputs mean a different fingerprint
+        mod = make_module()
+        mod.change_input('input x', 3)
+        mod.set_result_store(self.store)
+        self.assertEqual(mod.run_as(PT0(), 3), 9)
+        self.assertEqual(ncalls, [3, 3])
+
+        # No store is used if memoization is off
+        mod = make_module()
+        mod.set_result_store(self.store)
+        mod.turn_off_memoization()
+        mod.run_as(PT0(), 3)
+        self.assertEqual(ncalls, [3, 3, 3])
+
+
+    def test_module_without_name(self):
+        # Modules without a callback name can not be fingerprinted
+        mod = pp.Module(property_types=set([PT0()]),
+                        callback=lambda inputs, submods :
+                            {'result 0' : inputs['input 0']})
+        mod.set_result_store(self.store)
+        self.assertEqual(mod.run_as(PT0(), 3), 3)
+        self.assertEqual(len(self.store), 0)
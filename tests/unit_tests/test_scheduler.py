@@ -0,0 +1,76 @@
+import pluginplay as pp
+import copy
+import threading
+import unittest
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = pp.Scheduler(max_workers=2)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+
+    def test_submit(self):
+        f = self.scheduler.submit(lambda x, y : x + y, 1, 2)
+        self.assertEqual(f.result(), 3)
+
+        # Errors are raised when the result is requested
+        f = self.scheduler.submit(lambda : 1 / 0)
+        self.assertRaises(ZeroDivisionError, f.result)
+
+
+    def test_concurrent(self):
+        # Each task waits on the other, so they must run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        f0 = self.scheduler.submit(barrier.wait)
+        f1 = self.scheduler.submit(barrier.wait)
+        self.assertEqual(set([f0.result(), f1.result()]), set([0, 1]))
+
+
+    def test_nested_does_not_deadlock(self):
+        scheduler = pp.Scheduler(max_workers=1)
+
+        # The only worker waits on a task which can not get a worker
+        def outer():
+            return scheduler.submit(lambda : 42).result()
+
+        self.assertEqual(scheduler.submit(outer).result(timeout=5), 42)
+        scheduler.shutdown()
+
+
+    def test_deepcopy(self):
+        self.assertTrue(copy.deepcopy(self.scheduler) is self.scheduler)
+
+
+    def test_submodules(self):
+        barrier = threading.Barrier(2, timeout=5)
+        def leaf(inputs, submods):
+            barrier.wait()
+            return {'result 0' : inputs['input 0']}
+
+        subs = [pp.Module(property_types=set([PT0()]), callback=leaf)
+                for _ in range(2)]
+        for sub in subs:
+            sub.set_scheduler(self.scheduler)
+
+        keys = [('callback 0', PT0()), ('callback 1', PT0())]
+        def fxn(inputs, submods):
+            fs = [submods[k].submit_as(PT0(), inputs['input 0'] + i)
+                  for i, k in enumerate(keys)]
+            return {'result 0' : sum(f.result() for f in fs)}
+
+        mod = pp.Module(property_types=set([PT0()]), callback=fxn,
+                        submods={k : v for k, v in zip(keys, subs)})
+        self.assertEqual(mod.run_as(PT0(), 1), 3)
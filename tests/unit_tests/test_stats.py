@@ -0,0 +1,138 @@
+import pluginplay as pp
+import copy
+import time
+import unittest
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        def leaf(inputs, submods):
+            time.sleep(0.01)
+            return {'result 0' : inputs['input 0'] * 2}
+
+        def root(inputs, submods):
+            x = submods[('sub', PT0())].run_as(PT0(), inputs['input 0'])
+            return {'result 0' : x + 1}
+
+        self.leaf = pp.Module(callback=leaf, property_types={PT0()})
+        self.root = pp.Module(callback=root, property_types={PT0()},
+                              submods={('sub', PT0()) : self.leaf})
+
+
+    def test_defaults(self):
+        s = pp.ModuleStats().as_dict()
+        self.assertEqual(s['calls'], 0)
+        self.assertEqual(s['cache_hits'], 0)
+        self.assertEqual(s['cache_misses'], 0)
+        self.assertEqual(s['total_time'], 0.0)
+        self.assertEqual(s['submods'], {})
+
+
+    def test_calls_and_hits(self):
+        self.assertEqual(self.root.run_as(PT0(), 1), 3)
+        self.assertEqual(self.root.run_as(PT0(), 1), 3)
+        self.assertEqual(self.root.run_as(PT0(), 2), 5)
+
+        s = self.root.stats()
+        self.assertEqual(s['calls'], 3)
+        self.assertEqual(s['cache_hits'], 1)
+        self.assertEqual(s['cache_misses'], 2)
+
+        s = self.leaf.stats()
+        self.assertEqual(s['calls'], 2)
+        self.assertEqual(s['cache_misses'], 2)
+
+
+    def test_times(self):
+        self.root.run_as(PT0(), 1)
+        root = self.root.stats()
+        leaf = self.leaf.stats()
+
+        self.assertGreaterEqual(leaf['total_time'], 0.01)
+        self.assertGreaterEqual(leaf['callback_time'], 0.01)
+        self.assertAlmostEqual(leaf['self_time'], leaf['total_time'])
+
+        # The leaf's time is charged to the root's callback point
+        self.assertEqual(root['submods']['sub']['calls'], 1)
+        self.assertAlmostEqual(root['submods']['sub']['total_time'],
+                               leaf['total_time'])
+        self.assertGreaterEqual(root['total_time'], leaf['total_time'])
+        self.assertLess(root['self_time'], leaf['total_time'])
+        self.assertAlmostEqual(root['framework_time'] + root['callback_time'],
+                               root['total_time'])
+
+
+    def test_batch(self):
+        self.leaf.run_as_batch(PT0(), [(1,), (2,), (1,)])
+        s = self.leaf.stats()
+        self.assertEqual(s['calls'], 3)
+        self.assertEqual(s['cache_hits'], 1)
+
+
+    def test_errors_are_counted(self):
+        mod = pp.Module(callback=lambda i, s : 1 / 0, property_types={PT0()})
+        self.assertRaises(ZeroDivisionError, mod.run_as, PT0(), 1)
+        self.assertEqual(mod.stats()['calls'], 1)
+
+
+    def test_reset(self):
+        self.root.run_as(PT0(), 1)
+        self.root.reset_stats()
+        self.assertEqual(self.root.stats()['calls'], 0)
+        self.assertEqual(self.root.stats()['submods'], {})
+
+
+    def test_copies(self):
+        self.root.run_as(PT0(), 1)
+        self.assertEqual(copy.deepcopy(self.root).stats()['calls'], 1)
+        self.assertEqual(self.root.unlocked_copy().stats()['calls'], 0)
+
+
+class TestModuleManagerStats(unittest.TestCase):
+
+    def setUp(self):
+        def leaf(inputs, submods):
+            return {'result 0' : inputs['input 0'] * 2}
+
+        def root(inputs, submods):
+            x = submods[('sub', PT0())].run_as(PT0(), inputs['input 0'])
+            return {'result 0' : x + 1}
+
+        self.mm = pp.ModuleManager()
+        self.mm.add_module('leaf', pp.Module(callback=leaf,
+                                             property_types={PT0()}))
+        self.mm.add_module('root', pp.Module(callback=root,
+                                             property_types={PT0()},
+                                             submods={('sub', PT0()) : None}))
+        self.mm.change_submod('root', 'sub', 'leaf')
+
+
+    def test_stats(self):
+        self.mm.run_as(PT0(), 'root', 1)
+        s = self.mm.stats()
+        self.assertEqual(set(s.keys()), set(['leaf', 'root']))
+        self.assertEqual(s['root']['calls'], 1)
+        self.assertEqual(s['leaf']['calls'], 1)
+
+        self.mm.reset_stats()
+        self.assertEqual(self.mm.stats()['root']['calls'], 0)
+
+
+    def test_profile(self):
+        self.assertEqual(self.mm.profile(), '')
+
+        self.mm.run_as(PT0(), 'root', 1)
+        lines = self.mm.profile().split('\n')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('root: calls=1 '))
+        self.assertTrue(lines[1].startswith('  sub -> leaf: calls=1 '))
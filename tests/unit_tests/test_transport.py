@@ -0,0 +1,185 @@
+import pluginplay as pp
+from pluginplay import transport
+import gc
+import os
+import pickle
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PT0(pp.PropertyType):
+    """Effective signature: result0 (input0)"""
+
+    def __init__(self):
+        inputs = [('input 0', None)]
+        results = ['result 0']
+        return super().__init__(inputs, results)
+
+
+class Fill(pp.Module):
+    """Makes a buffer of ``input 0`` bytes, each set to the bound value."""
+
+    def __init__(self):
+        def fxn(inputs, _):
+            rv = memoryview(bytearray([inputs['value']]) * inputs['input 0'])
+            return {'result 0' : rv}
+
+        super().__init__(property_types=set([PT0()]),
+                         inputs={'value' : 1},
+                         callback=fxn,
+                         callback_name='Fill')
+
+
+class Total(pp.Module):
+    """Sums the bytes of a bound buffer, plus ``input 0``."""
+
+    def __init__(self):
+        def fxn(inputs, _):
+            return {'result 0' : sum(inputs['data']) + inputs['input 0']}
+
+        super().__init__(property_types=set([PT0()]),
+                         inputs={'data' : None},
+                         callback=fxn,
+                         callback_name='Total')
+
+
+class SumBytes(pp.Module):
+    """Sums the bytes of ``input 0``."""
+
+    def __init__(self):
+        def fxn(inputs, _):
+            return {'result 0' : sum(inputs['input 0'])}
+
+        super().__init__(property_types=set([PT0()]),
+                         callback=fxn,
+                         callback_name='SumBytes')
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_share(self):
+        buf = transport.empty(1024)
+        buf[:3] = b'abc'
+        small = b'small'
+        obj = {'a' : buf, 'b' : [small, 1, 'one']}
+        shared = transport.share(obj, min_bytes=64)
+        self.assertTrue(isinstance(shared['a'], transport.SharedBuffer))
+        self.assertTrue(shared['b'][0] is small)
+        self.assertEqual(shared['b'][1:], [1, 'one'])
+
+        # The receiver sees the same bytes
+        received = pickle.loads(pickle.dumps(shared))
+        self.assertEqual(bytes(received['a'][:3]), b'abc')
+        received['a'][0] = ord('A')
+        self.assertEqual(bytes(buf[:3]), b'Abc')
+
+
+    def test_copies_are_made_once(self):
+        data = memoryview(bytearray(b'x' * 1024))
+        first = transport.share(data, min_bytes=64, cache=True)
+        self.assertTrue(transport.share(data, min_bytes=64, cache=True)
+                        is first)
+        self.assertFalse(first.owned)
+        self.assertTrue(os.path.exists(first.path))
+        self.assertEqual(bytes(pickle.loads(pickle.dumps(first))[:2]), b'xx')
+
+        # The copy goes away with the original
+        del data
+        gc.collect()
+        self.assertFalse(os.path.exists(first.path))
+
+
+    def test_copies_are_made_each_time(self):
+        data = memoryview(bytearray(b'z' * 1024))
+        first = transport.share(data, min_bytes=64)
+        self.assertTrue(first.owned)
+        data[0] = ord('Z')
+        second = transport.share(data, min_bytes=64)
+        self.assertNotEqual(first.path, second.path)
+        self.assertEqual(bytes(pickle.loads(pickle.dumps(first))[:2]), b'zz')
+        self.assertEqual(bytes(pickle.loads(pickle.dumps(second))[:2]), b'Zz')
+
+
+    def test_transfer(self):
+        data = memoryview(bytearray(b'y' * 1024))
+        shared = transport.share(data, min_bytes=64, transfer=True)
+        self.assertTrue(shared.owned)
+
+        # The receiver removes the segment once it is done with it
+        received = pickle.loads(pickle.dumps(shared))
+        self.assertEqual(bytes(received[:2]), b'yy')
+        self.assertTrue(os.path.exists(shared.path))
+        del received
+        gc.collect()
+        self.assertFalse(os.path.exists(shared.path))
+
+        # Buffers already in shared memory are handed over without a copy
+        buf = transport.empty(1024)
+        shared = transport.share(buf, min_bytes=64, transfer=True)
+        self.assertEqual(shared.path, transport._mappings[buf.obj][0])
+        received = pickle.loads(pickle.dumps(shared))
+        received[0] = 7
+        self.assertEqual(buf[0], 7)
+
+
+class TestProcessSchedulerTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = pp.ProcessScheduler(max_workers=1,
+                                             min_shared_bytes=64)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+
+    def test_results(self):
+        mod = Fill()
+        mod.change_input('value', 2)
+        mod.set_scheduler(self.scheduler)
+        rv = mod.submit_as(PT0(), 1024).result(timeout=30)
+        self.assertEqual(len(rv), 1024)
+        self.assertEqual(bytes(rv[:2]), bytes([2, 2]))
+        self.assertTrue(rv.obj in transport._mappings)
+
+
+    def test_bound_inputs(self):
+        data = transport.empty(1024)
+        data[:] = b'\x01' * 1024
+        mod = Total()
+        mod.change_input('data', data)
+        mod.set_scheduler(self.scheduler)
+        self.assertEqual(mod.submit_as(PT0(), 1).result(timeout=30), 1025)
+        self.assertEqual(mod.submit_as(PT0(), 2).result(timeout=30), 1026)
+
+
+    def test_arguments_are_sent_as_they_are(self):
+        buf = memoryview(bytearray(1024))
+        mod = SumBytes()
+        mod.set_scheduler(self.scheduler)
+        self.assertEqual(mod.submit_as(PT0(), buf).result(timeout=30), 0)
+        buf[:] = b'\x01' * 1024
+        self.assertEqual(mod.submit_as(PT0(), buf).result(timeout=30), 1024)
+        self.assertEqual(mod.run_as(PT0(), buf), 1024)
+
+
+    @unittest.skipIf(numpy == None, "NumPy is not installed")
+    def test_arrays(self):
+        data = numpy.ones(256, dtype=numpy.int64)
+        mod = Total()
+        mod.change_input('data', data)
+        self.assertEqual(mod.run_as(PT0(), 1), 257)
+        mod = mod.unlocked_copy()
+        mod.set_scheduler(self.scheduler)
+        self.assertEqual(mod.submit_as(PT0(), 2).result(timeout=30), 258)
+
+        mod = SumBytes()
+        self.assertEqual(mod.run_as(PT0(), data), 256)
+        mod.set_scheduler(self.scheduler)
+        self.assertEqual(mod.submit_as(PT0(), data).result(timeout=30), 256)
+        self.assertEqual(mod.submit_as(PT0(), data * 2).result(timeout=30),
+                         512)
+